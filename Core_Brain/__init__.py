@@ -1,7 +1,10 @@
 import logging
+import os
 from .speech_to_text import SpeechToText 
 from .text_to_speech import TextToSpeech 
 from .memory_manager import MemoryManager
+from .memory_store import KEEP_TURNS, SQLiteMemoryStore
+from .memory_recall import RecallIndex
 from .nlp_engine.nlp_engine import NLPEngine
 
 # Configure logging for the core brain
@@ -39,7 +42,13 @@ def _initialize_components():
         components['nlp'] = None
     
     try:
-        components['memory'] = MemoryManager()
+        # MEMORY_DB (plus MEMORY_KEY or MEMORY_KEY_FILE) keeps memory across restarts and workers;
+        # MEMORY_RECALL=1 adds relevant older turns to each turn's context
+        memory_db = os.getenv('MEMORY_DB')
+        recall = RecallIndex() if os.getenv('MEMORY_RECALL') == '1' else None
+        keep_turns = recall.max_turns if recall else KEEP_TURNS
+        store = SQLiteMemoryStore(memory_db, keep_turns=keep_turns) if memory_db else None
+        components['memory'] = MemoryManager(store=store, recall=recall)
         logger.info("Memory Manager initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize Memory Manager: {e}")
@@ -62,6 +71,8 @@ __all__ = [
     'TextToSpeech', 
     'NLPEngine',
     'MemoryManager',
+    'SQLiteMemoryStore',
+    'RecallIndex',
     'stt',
     'tts',
     'nlp', 
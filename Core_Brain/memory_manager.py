@@ -1,53 +1,535 @@
 from cryptography.fernet import Fernet
-import uuid
+import base64
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
+
+# Turns kept word for word per session; older ones are folded into that session's rolling summary
+MAX_HISTORY = 5
+SUMMARY_MAX_WORDS = 120        # cap on a session summary; the oldest gists are dropped first
+SUMMARY_WORDS_PER_SIDE = 16    # words kept from each side of a folded turn
+SUMMARY_SEPARATOR = " / "
+# Session used by calls that don't pass a session_id
+DEFAULT_SESSION = "default"
+# Decrypted context kept for recently active sessions (0 sessions disables it)
+CONTEXT_CACHE_SIZE = 1024      # sessions
+CONTEXT_CACHE_TTL = 300        # seconds a session's plaintext may stay in memory after its last use
+# Session eviction (None disables either); evicted sessions are reloaded from the store if there is one
+SESSION_IDLE_TTL = 6 * 3600    # seconds without a turn or fetch before a session is dropped from memory
+MEMORY_MAX_BYTES = 512 * 2 ** 20  # resident turns + summaries; least recently used sessions go first
+# Labels of the context's summary line and recalled-turns block; nlp_engine.prompt_builder matches them
+SUMMARY_LABEL = "Earlier in this conversation:"
+RECALL_LABEL = "Relevant earlier turns:"
+# Where a shared Fernet key comes from when none is passed in
+MEMORY_KEY_ENV = "MEMORY_KEY"            # the key itself
+MEMORY_KEY_FILE_ENV = "MEMORY_KEY_FILE"  # path of a file holding it (created with a new key if missing)
+
+
+def _clip(text, words=SUMMARY_WORDS_PER_SIDE):
+    parts = text.split()
+    return " ".join(parts[:words]) + (" ..." if len(parts) > words else "")
+
+
+def fold_turn(summary, user, echo):
+    """Add one turn's gist to the summary without regenerating it (no LLM call)."""
+    gists = summary.split(SUMMARY_SEPARATOR) if summary else []
+    gists.append(f'User: "{_clip(user)}" Echo: "{_clip(echo)}"')
+    while len(gists) > 1 and sum(len(g.split()) for g in gists) > SUMMARY_MAX_WORDS:
+        gists.pop(0)
+    return SUMMARY_SEPARATOR.join(gists)
+
+
+def load_key(key = None, key_file = None):
+    """The Fernet key from `key`, `key_file`, $MEMORY_KEY or $MEMORY_KEY_FILE (in that order); None if none is set.
+
+    A missing key file is created with a new key, readable by its owner only;
+    workers racing to create it all end up with the one that was written first.
+    """
+    if key:
+        return key
+    key = os.getenv(MEMORY_KEY_ENV)
+    if key:
+        return key.encode()
+    key_file = key_file or os.getenv(MEMORY_KEY_FILE_ENV)
+    if not key_file:
+        return None
+    try:
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "wb") as f:
+            f.write(Fernet.generate_key())
+    with open(key_file, "rb") as f:
+        return f.read().strip()
+
+
+class TurnRecord:
+    """One stored turn: raw Fernet tokens (bytes, not their base64 text) and a Unix timestamp."""
+
+    __slots__ = ("user", "echo", "timestamp")
+
+    def __init__(self, user, echo, timestamp):
+        self.user = user
+        self.echo = echo
+        self.timestamp = timestamp
+
+    def nbytes(self):
+        return (sys.getsizeof(self) + sys.getsizeof(self.user) + sys.getsizeof(self.echo)
+                + sys.getsizeof(self.timestamp))
+
+    def to_dict(self, session_id):
+        """The turn in its text form (base64 tokens, ISO timestamp)."""
+        return {
+            "session": session_id,
+            "user": base64.urlsafe_b64encode(self.user).decode(),
+            "echo": base64.urlsafe_b64encode(self.echo).decode(),
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat()
+        }
+
+
+class _PlainContext:
+    """Decrypted (user, echo) turns and summary of one session, plus the turns rendered as text."""
+
+    __slots__ = ("turns", "summary", "text", "expires")
+
+    def __init__(self, turns, summary, expires):
+        self.turns = deque(turns)
+        self.summary = summary
+        self.text = None
+        self.expires = expires
+
+
+class ContextCache:
+    """Bounded LRU of sessions' plaintext context; entries expire `ttl` seconds after last use."""
+
+    def __init__(self, max_sessions=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, session_id):
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry.expires <= now:
+            del self._entries[session_id]
+            self.expired += 1
+            return None
+        entry.expires = now + self.ttl
+        self._entries.move_to_end(session_id)
+        return entry
+
+    def put(self, session_id, turns, summary):
+        if self.max_sessions <= 0:
+            return None
+        entry = self._entries[session_id] = _PlainContext(turns, summary, time.monotonic() + self.ttl)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+        return entry
+
+    def pop(self, session_id):
+        self._entries.pop(session_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class MemoryManager:
-    def __init__(self , key = None):
+    """Encrypted conversation memory, indexed by session.
+
+    Each session keeps its last `max_turns` turns in its own deque, so
+    appending and fetching a session's context cost the same however many
+    sessions are active. Safe to share between threads.
+
+    Recently active sessions also keep their decrypted context in a bounded,
+    short-lived ContextCache that add_memory extends in place, so a turn
+    only decrypts history on a cache miss. `context_cache_size=0` keeps no
+    plaintext at all.
+
+    With a `store` (e.g. memory_store.SQLiteMemoryStore) every change is also
+    queued for durable storage, and a session that isn't in memory is loaded
+    from the store on first use (outside the lock, so other sessions aren't
+    held up), so memory survives restarts. The key comes from load_key();
+    without a store a random key is fine, with one it must be the same on
+    every start. Workers may share a store, but each session must stick to one
+    worker: a session already in memory is never re-read, so turns another
+    worker adds to it aren't seen, and the summary written last wins.
+
+    Turns are TurnRecords. Sessions idle for `session_ttl` seconds are
+    dropped from memory, and once turns and summaries take more than
+    `max_bytes` the least recently used sessions are dropped too (the context
+    cache and recall index are bounded separately); without a store, an
+    evicted session's memory is gone.
+
+    With a `recall` index (memory_recall.RecallIndex) every turn is also
+    indexed, and get_context_text(query=...) adds the session's past turns most
+    similar to the query that are no longer in the recent window. A session
+    loaded from a store re-indexes up to recall.max_turns stored turns, so give
+    the store a keep_turns at least that large. Reloaded turns don't count
+    towards document frequencies again; after a restart these warm up from
+    new turns.
+    """
+
+    def __init__(self , key = None, summarizer = None, max_turns = MAX_HISTORY,
+                 context_cache_size = CONTEXT_CACHE_SIZE, context_cache_ttl = CONTEXT_CACHE_TTL,
+                 store = None, key_file = None, recall = None, session_ttl = SESSION_IDLE_TTL,
+                 max_bytes = MEMORY_MAX_BYTES):
+        key = load_key(key, key_file)
         if key is None:
+            if store is not None:
+                raise ValueError(f"A memory store needs a persistent key: pass key/key_file or set "
+                                 f"{MEMORY_KEY_ENV} or {MEMORY_KEY_FILE_ENV}")
             key = Fernet.generate_key()
         self.fernet = Fernet(key)
+        self.store = store
+        self.recall = recall
+
+        self.max_turns = max_turns
+        # session -> deque of its most recent turns (oldest first), least recently used session first
+        self.sessions = OrderedDict()
+        # session -> encrypted rolling summary (raw token) of the turns that left its deque
+        self.summaries = {}
+        self.session_ttl = session_ttl
+        self.max_bytes = max_bytes
+        # session -> time.monotonic() of its last use, and resident bytes of its turns and summary
+        self.last_used = {}
+        self.session_bytes = {}
+        self.resident_bytes = 0
+        self.evictions = {"idle": 0, "lru": 0}
+        self.evicted_turns = 0
+        self.evicted_bytes = 0
+        # summarizer(previous_summary, user, echo) -> new summary, called once per evicted turn
+        self.summarizer = summarizer or fold_turn
+        self.context_cache = ContextCache(context_cache_size, context_cache_ttl)
+        self._lock = threading.RLock()
+        # session -> lock held while it is read from the store
+        self._loading = {}
+        # Bumped by clear_memory() (per session, and for every session); a load that read the store
+        # before a clear landed must not install what it read
+        self._clear_generation = 0
+        self._session_clears = {}
+        self.decrypts = 0
+        self.decrypt_seconds = 0.0
+
+    def _encrypt(self, text):
+        return base64.urlsafe_b64decode(self.fernet.encrypt(text.encode()))
+
+    def _decrypt(self, token):
+        start = time.perf_counter()
+        text = self.fernet.decrypt(base64.urlsafe_b64encode(token)).decode()
+        self.decrypt_seconds += time.perf_counter() - start
+        self.decrypts += 1
+        return text
+
+    def _load(self, session_id):
+        """Bring the session in from the store if it isn't in memory (call without the lock).
+
+        The store is read and the turns decrypted outside the manager's lock;
+        concurrent calls for the same session wait for a single load. What
+        was read is dropped if the session was cleared meanwhile.
+        """
+        if self.store is None:
+            return
+        with self._lock:
+            if session_id in self.sessions:
+                return
+            guard = self._loading.setdefault(session_id, threading.Lock())
+        try:
+            with guard:
+                with self._lock:
+                    if session_id in self.sessions:
+                        return
+                    generation = (self._clear_generation, self._session_clears.get(session_id, 0))
+                depth = self.max_turns if self.recall is None else max(self.max_turns, self.recall.max_turns)
+                rows, summary = self.store.load(session_id, depth)
+                stored = [TurnRecord(*row) for row in rows]
+                plain = [self._decrypt(record.user) for record in stored] if self.recall is not None else []
+                with self._lock:
+                    if session_id in self.sessions or not (stored or summary):
+                        return
+                    if generation != (self._clear_generation, self._session_clears.get(session_id, 0)):
+                        return
+                    self._install(session_id, stored, summary)
+                    if self.recall is not None:
+                        self.recall.drop(session_id)
+                        # Already counted when first added (document frequencies aren't stored)
+                        for user, record in zip(plain, stored):
+                            self.recall.add(session_id, user, record, learn=False)
+        finally:
+            with self._lock:
+                if self._loading.get(session_id) is guard:
+                    del self._loading[session_id]
+
+    def _install(self, session_id, stored, summary):
+        turns = self.sessions[session_id] = deque(stored[-self.max_turns:])
+        self.last_used[session_id] = time.monotonic()
+        self.session_bytes[session_id] = 0
+        self._account(session_id, sum(record.nbytes() for record in turns))
+        if summary:
+            self._set_summary(session_id, summary)
+        return turns
+
+    def _session_turns(self, session_id, create = False):
+        """The session's turn deque in memory (call under the lock, after _load).
+
+        Marks the session as just used.
+        """
+        turns = self.sessions.get(session_id)
+        if turns is not None:
+            self.sessions.move_to_end(session_id)
+            self.last_used[session_id] = time.monotonic()
+            return turns
+        return self._install(session_id, [], None) if create else ()
+
+    def _account(self, session_id, delta):
+        self.session_bytes[session_id] += delta
+        self.resident_bytes += delta
+
+    def _set_summary(self, session_id, token):
+        previous = self.summaries.get(session_id)
+        self.summaries[session_id] = token
+        self._account(session_id, sys.getsizeof(token) - (sys.getsizeof(previous) if previous else 0))
+
+    def _evict(self, session_id, reason):
+        turns = self.sessions.pop(session_id)
+        self.summaries.pop(session_id, None)
+        self.last_used.pop(session_id)
+        freed = self.session_bytes.pop(session_id)
+        self.resident_bytes -= freed
+        self.context_cache.pop(session_id)
+        if self.recall is not None:
+            self.recall.drop(session_id)
+        self.evictions[reason] += 1
+        self.evicted_turns += len(turns)
+        self.evicted_bytes += freed
 
-        self.history = []
+    def _enforce_limits(self, keep = None):
+        """Evict idle sessions, then least recently used ones while over max_bytes (never `keep`)."""
+        if self.session_ttl is not None:
+            cutoff = time.monotonic() - self.session_ttl
+            while self.sessions:
+                session_id = next(iter(self.sessions))
+                if session_id == keep or self.last_used[session_id] > cutoff:
+                    break
+                self._evict(session_id, "idle")
+        if self.max_bytes is not None:
+            while self.resident_bytes > self.max_bytes and len(self.sessions) > 1:
+                session_id = next(iter(self.sessions))
+                if session_id == keep:
+                    break
+                self._evict(session_id, "lru")
+
+    @property
+    def history(self):
+        """Every turn in memory as a dict, session by session (oldest first within a session)."""
+        with self._lock:
+            return [record.to_dict(session_id) for session_id, turns in self.sessions.items() for record in turns]
 
     def add_memory(self, user ,echo , session_id = None):
-        if not session_id:
-            session_id = str(uuid.uuid4())
+        session_id = session_id or DEFAULT_SESSION
+
+        record = TurnRecord(self._encrypt(user), self._encrypt(echo), time.time())
+        self._load(session_id)
+        with self._lock:
+            turns = self._session_turns(session_id, create=True)
+            turns.append(record)
+            self._account(session_id, record.nbytes())
+            writes = [("turn", session_id, record)]
+            if self.recall is not None:
+                self.recall.add(session_id, user, record)
+            plain = self.context_cache.get(session_id)
+            if plain is not None:
+                plain.turns.append((user, echo))
+                plain.text = None
+            if len(turns) > self.max_turns:
+                evicted = turns.popleft()
+                self._account(session_id, -evicted.nbytes())
+                if plain is not None:
+                    plain.summary = self._fold_into_summary(session_id, evicted, plain.turns.popleft(),
+                                                            plain.summary)
+                else:
+                    self._fold_into_summary(session_id, evicted)
+                writes.append(("summary", session_id, self.summaries[session_id], record.timestamp))
+            if self.store is not None:
+                # Queued, not written: the store's writer thread commits it in the background
+                self.store.write(writes)
+            self._enforce_limits(keep=session_id)
+
+    def _fold_into_summary(self, session_id, record, plain_turn = None, previous = None):
+        """Update the session summary with an evicted turn incrementally; returns the new plaintext summary.
+
+        `plain_turn` / `previous` are the turn's and old summary's plaintext when already known.
+        """
+        if previous is None:
+            previous = self.summaries.get(session_id)
+            previous = self._decrypt(previous) if previous else ""
+        user, echo = plain_turn or (self._decrypt(record.user), self._decrypt(record.echo))
+        summary = self.summarizer(previous, user, echo)
+        self._set_summary(session_id, self._encrypt(summary))
+        return summary
+
+    def get_summary(self, session_id = None):
+        session_id = session_id or DEFAULT_SESSION
+        self._load(session_id)
+        with self._lock:
+            self._session_turns(session_id)
+            summary = self.summaries.get(session_id)
+        return self._decrypt(summary) if summary else ""
+
+    def _plain_context(self, session_id):
+        """The session's decrypted context, from the cache or decrypted (and cached) now."""
+        plain = self.context_cache.get(session_id)
+        if plain is not None:
+            self.context_cache.hits += 1
+            return plain
+        self.context_cache.misses += 1
+        turns = [(self._decrypt(record.user), self._decrypt(record.echo))
+                 for record in self._session_turns(session_id)]
+        summary = self.summaries.get(session_id)
+        summary = self._decrypt(summary) if summary else ""
+        return self.context_cache.put(session_id, turns, summary) or _PlainContext(turns, summary, 0.0)
+
+
+    def get_context_text(self , session_id = None, query = None):
+        """The session's summary line, then past turns recalled for `query`, then its recent turns."""
+        session_id = session_id or DEFAULT_SESSION
+        self._load(session_id)
+        with self._lock:
+            self._enforce_limits(keep=session_id)
+            plain = self._plain_context(session_id)
+            if plain.text is None:
+                plain.text = "\n".join(f"User: {user}\nEcho: {echo}" for user, echo in plain.turns)
+            # Older turns come first as a one-line summary
+            summary = f"{SUMMARY_LABEL} {plain.summary}" if plain.summary else ""
+            recalled = self._recall_text(session_id, query) if query and self.recall is not None else ""
+            return "\n".join(part for part in (summary, recalled, plain.text) if part)
+
+    def recall_turns(self, session_id = None, query = "", k = None):
+        """[(user, echo)] of past turns most relevant to `query` that are no longer in the recent window."""
+        if self.recall is None:
+            return []
+        session_id = session_id or DEFAULT_SESSION
+        self._load(session_id)
+        with self._lock:
+            return self._recall(session_id, query, k)
+
+    def _recall(self, session_id, query, k = None):
+        recent = {id(record) for record in self._session_turns(session_id)}
+        hits = self.recall.search(session_id, query, k, exclude=recent)
+        # In conversation order
+        records = sorted((record for _, record in hits), key=lambda record: record.timestamp)
+        return [(self._decrypt(record.user), self._decrypt(record.echo)) for record in records]
+
+    def _recall_text(self, session_id, query):
+        turns = self._recall(session_id, query)
+        if not turns:
+            return ""
+        # Indented, so the block reads (and is trimmed) as one unit rather than as recent turns
+        return "\n".join([RECALL_LABEL] + [f"  User: {user}\n  Echo: {echo}" for user, echo in turns])
 
-        encrypted_user = self.fernet.encrypt(user.encode()).decode()
-        encrypted_echo = self.fernet.encrypt(echo.encode()).decode()
 
-        self.history.append({
-            "session": session_id,
-            "user": encrypted_user,
-            "echo": encrypted_echo,
-            "timestamp": datetime.now().isoformat()
-            })
-            
-        if len(self.history) > 5:
-            self.history.pop(0)
-
-
-    def get_context_text(self , session_id = None):
-        session_history = [
-            msg for msg in self.history if msg["session"] == session_id
-        ]
-
-        return "\n".join([
-            f"User: {self.fernet.decrypt(msg['user'].encode()).decode()}\n"
-            f"Echo: {self.fernet.decrypt(msg['echo'].encode()).decode()}"
-            for msg in session_history
-        ])
-
-        
     # Inside MemoryManager class
     def clear_memory(self , session_id = None):
-        if session_id:
-            self.history = [
-                msg for msg in self.history if msg["session"] != session_id
-            ]
-        else:
-            self.history = []
+        with self._lock:
+            if session_id:
+                self._session_clears[session_id] = self._session_clears.get(session_id, 0) + 1
+                self.sessions.pop(session_id, None)
+                self.summaries.pop(session_id, None)
+                self.last_used.pop(session_id, None)
+                self.resident_bytes -= self.session_bytes.pop(session_id, 0)
+                self.context_cache.pop(session_id)
+                if self.recall is not None:
+                    self.recall.drop(session_id)
+            else:
+                self._clear_generation += 1
+                self._session_clears = {}
+                self.sessions = OrderedDict()
+                self.summaries = {}
+                self.last_used = {}
+                self.session_bytes = {}
+                self.resident_bytes = 0
+                self.context_cache.clear()
+                if self.recall is not None:
+                    self.recall.drop()
+            if self.store is not None:
+                self.store.write([("clear", session_id or None)])
+
+    def session_stats(self, session_id = None):
+        """Turn count and approximate resident bytes (turns + summary) of one session."""
+        session_id = session_id or DEFAULT_SESSION
+        with self._lock:
+            turns = list(self.sessions.get(session_id, ()))
+            summary = self.summaries.get(session_id)
+            last_used = self.last_used.get(session_id)
+        turn_bytes = sum(record.nbytes() for record in turns)
+        summary_bytes = sys.getsizeof(summary) if summary else 0
+        return {
+            "turns": len(turns),
+            "turn_bytes": turn_bytes,
+            "summary_bytes": summary_bytes,
+            "bytes": turn_bytes + summary_bytes,
+            "last_active": datetime.fromtimestamp(turns[-1].timestamp).isoformat() if turns else None,
+            "idle_s": round(time.monotonic() - last_used, 1) if last_used is not None else None
+        }
+
+    def stats(self):
+        """Totals over all sessions in memory; `bytes` is the approximate resident size of turns and summaries."""
+        cache = self.context_cache
+        with self._lock:
+            sessions = len(self.sessions)
+            turns = sum(len(session_turns) for session_turns in self.sessions.values())
+            eviction = {
+                "session_ttl": self.session_ttl,
+                "max_bytes": self.max_bytes,
+                "idle": self.evictions["idle"],
+                "lru": self.evictions["lru"],
+                "evicted_turns": self.evicted_turns,
+                "evicted_bytes": self.evicted_bytes
+            }
+            lookups = cache.hits + cache.misses
+            context_cache = {
+                "sessions": len(cache),
+                "max_sessions": cache.max_sessions,
+                "ttl": cache.ttl,
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "expired": cache.expired,
+                "hit_ratio": round(cache.hits / lookups, 4) if lookups else 0.0,
+                "decrypts": self.decrypts,
+                "decrypt_ms": round(self.decrypt_seconds * 1000, 3),
+                "avg_decrypt_us": round(self.decrypt_seconds / self.decrypts * 1e6, 1) if self.decrypts else 0.0
+            }
+            total_bytes = self.resident_bytes
+        return {
+            "sessions": sessions,
+            "turns": turns,
+            "max_turns": self.max_turns,
+            "bytes": total_bytes,
+            "avg_session_bytes": round(total_bytes / sessions, 1) if sessions else 0.0,
+            "avg_turn_bytes": round(total_bytes / turns, 1) if turns else 0.0,
+            "eviction": eviction,
+            "context_cache": context_cache,
+            "store": self.store.stats() if self.store is not None else None,
+            "recall": self.recall.stats() if self.recall is not None else None
+        }
+
+    def close(self):
+        """Commit queued writes to the store and stop its writer."""
+        if self.store is not None:
+            self.store.close()
 
 
 #     def get_content(self):
-#         return self.history
\ No newline at end of file
+#         return self.history
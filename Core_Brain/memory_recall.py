@@ -0,0 +1,223 @@
+# Long-term recall for MemoryManager: hashed TF-IDF vectors of past turns, searched per session (NumPy only)
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+RECALL_DIM = 2 ** 20       # hashed feature buckets; vectors are sparse, so this only costs the idf table
+RECALL_MAX_TURNS = 500     # turns indexed per session; the oldest are dropped first
+RECALL_TOP_K = 3           # past turns injected into a turn's context
+RECALL_MIN_SCORE = 0.05    # cosine similarity below which a past turn is not worth injecting
+RECALL_NORM_REFRESH = 1.25  # a session's turn norms are recomputed once the corpus grows by this factor
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Too common in chat to say what a turn is about; short turns would otherwise match on them
+STOPWORDS = frozenset("""
+a about after again all am an and any are as at be been but by can could d did do does doing don for from
+had has have he her him his how i if in into is it its just ll m me more my no not now of on or our out
+re really s she so some t than that the their them then there they this to too up ve very was we were what
+when where which who why will with would you your
+""".split())
+
+
+class HashedTfidf:
+    """Word unigrams and bigrams (stopwords left out) hashed into `dim` buckets, with running document frequencies.
+
+    Document frequencies are counted over every turn added, across sessions.
+    Turn vectors hold sublinear tf only and idf is applied when scoring, so
+    turns added while the corpus was small are weighted like later ones.
+    """
+
+    def __init__(self, dim=RECALL_DIM):
+        self.dim = dim
+        self.doc_freq = np.zeros(dim, dtype=np.int32)
+        self.docs = 0
+
+    def terms(self, text, learn=False):
+        """(sorted unique buckets as uint32, sublinear tf as float32) of `text`; `learn` counts its frequencies."""
+        words = [word for word in _TOKEN.findall(text.lower()) if word not in STOPWORDS]
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        buckets = np.fromiter((zlib.crc32(g.encode("utf-8")) % self.dim for g in grams), dtype=np.uint32,
+                              count=len(grams))
+        cols, counts = np.unique(buckets, return_counts=True)
+        if learn and cols.size:
+            self.doc_freq[cols] += 1
+            self.docs += 1
+        return cols, (1.0 + np.log(counts)).astype(np.float32)
+
+    def idf(self, cols):
+        return (np.log((1.0 + self.docs) / (1.0 + self.doc_freq[cols])) + 1.0).astype(np.float32)
+
+
+class _SessionIndex:
+    """One session's tf vectors as a sparse (turn, bucket, tf) matrix, plus idf-weighted norms and items.
+
+    Turns are numbered from 0; only the last max_turns (from `first`) are
+    live. Entries of dropped turns are squeezed out when the arrays fill up.
+    """
+
+    __slots__ = ("max_turns", "turns", "cols", "vals", "nnz", "first", "count", "norms", "items", "norms_docs")
+
+    def __init__(self, max_turns, docs, capacity=64):
+        self.max_turns = max_turns
+        self.turns = np.zeros(capacity, dtype=np.int32)
+        self.cols = np.zeros(capacity, dtype=np.uint32)
+        self.vals = np.zeros(capacity, dtype=np.float32)
+        self.nnz = 0
+        self.first = 0
+        self.count = 0
+        # ring buffers indexed by turn % max_turns, grown up to max_turns slots
+        self.norms = np.zeros(min(8, max_turns), dtype=np.float32)
+        self.items = [None] * len(self.norms)
+        # corpus size the norms were computed at
+        self.norms_docs = docs
+
+    @property
+    def size(self):
+        return self.count - self.first
+
+    def add(self, cols, vals, norm, item):
+        if self.size == self.max_turns:
+            self.first += 1
+        elif self.count == len(self.items):
+            slots = min(self.max_turns, 2 * self.count)
+            self.norms = np.concatenate([self.norms, np.zeros(slots - self.count, dtype=np.float32)])
+            self.items.extend([None] * (slots - self.count))
+        if self.nnz + cols.size > self.turns.size:
+            self._squeeze(cols.size)
+        end = self.nnz + cols.size
+        self.turns[self.nnz:end] = self.count
+        self.cols[self.nnz:end] = cols
+        self.vals[self.nnz:end] = vals
+        self.nnz = end
+        self.norms[self.count % self.max_turns] = norm
+        self.items[self.count % self.max_turns] = item
+        self.count += 1
+
+    def _squeeze(self, extra):
+        live = self.turns[:self.nnz] >= self.first
+        nnz = int(live.sum())
+        capacity = self.turns.size
+        while nnz + extra > capacity // 2:
+            capacity *= 2
+        for name in ("turns", "cols", "vals"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:nnz] = old[:self.nnz][live]
+            setattr(self, name, new)
+        self.nnz = nnz
+
+    def live(self):
+        """(turn offsets from `first`, cols, vals) of the live entries."""
+        turns = self.turns[:self.nnz]
+        live = turns >= self.first
+        return turns[live] - self.first, self.cols[:self.nnz][live], self.vals[:self.nnz][live]
+
+    def ordered(self, ring):
+        """A ring buffer's live slots in turn order (oldest first)."""
+        slots = np.arange(self.first, self.count) % self.max_turns
+        return ring[slots] if isinstance(ring, np.ndarray) else [ring[slot] for slot in slots]
+
+    def refresh_norms(self, vectorizer):
+        offsets, cols, vals = self.live()
+        weighted = vals * vectorizer.idf(cols)
+        norms = np.sqrt(np.bincount(offsets, weighted * weighted, minlength=self.size))
+        self.norms[np.arange(self.first, self.count) % self.max_turns] = norms
+        self.norms_docs = vectorizer.docs
+
+    def memory_bytes(self):
+        return self.turns.nbytes + self.cols.nbytes + self.vals.nbytes + self.norms.nbytes
+
+
+class RecallIndex:
+    """Per-session similarity index over past turns, for recalling relevant ones beyond the recent window.
+
+    `item` is whatever the caller wants back from search(); MemoryManager
+    stores each turn's encrypted record, so no plaintext is kept here, only
+    hashed term weights. Index the user's side of a turn: it is what later
+    messages refer back to. Safe to share between threads.
+    """
+
+    def __init__(self, dim=RECALL_DIM, max_turns=RECALL_MAX_TURNS, top_k=RECALL_TOP_K, min_score=RECALL_MIN_SCORE):
+        self.vectorizer = HashedTfidf(dim)
+        self.max_turns = max_turns
+        self.top_k = top_k
+        self.min_score = min_score
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def add(self, session_id, text, item, learn=True):
+        """Index `text` under the session; `learn=False` leaves document frequencies alone (re-added turns)."""
+        with self._lock:
+            cols, vals = self.vectorizer.terms(text, learn=learn)
+            weighted = vals * self.vectorizer.idf(cols)
+            index = self.sessions.get(session_id)
+            if index is None:
+                index = self.sessions[session_id] = _SessionIndex(self.max_turns, self.vectorizer.docs)
+            index.add(cols, vals, np.sqrt(weighted @ weighted), item)
+
+    def search(self, session_id, query, k=None, exclude=()):
+        """[(score, item)] of the session's `k` turns most similar to `query`, best first.
+
+        Turns scoring under min_score and items whose id() is in `exclude`
+        (e.g. turns already in the recent context) are skipped.
+        """
+        k = self.top_k if k is None else k
+        start = time.perf_counter()
+        with self._lock:
+            index = self.sessions.get(session_id)
+            if index is None or not index.size or k <= 0:
+                return []
+            query_cols, query_vals = self.vectorizer.terms(query)
+            if not query_cols.size:
+                return []
+            if self.vectorizer.docs > index.norms_docs * RECALL_NORM_REFRESH:
+                index.refresh_norms(self.vectorizer)
+            query_idf = self.vectorizer.idf(query_cols)
+            query_weights = query_vals * query_idf * query_idf
+            query_norm = np.sqrt((query_vals * query_idf) @ (query_vals * query_idf))
+
+            # Only entries in the query's buckets contribute to the dot products
+            offsets, cols, vals = index.live()
+            hit = np.isin(cols, query_cols)
+            positions = np.searchsorted(query_cols, cols[hit])
+            dots = np.bincount(offsets[hit], vals[hit] * query_weights[positions], minlength=index.size)
+            norms = index.ordered(index.norms) * query_norm
+            scores = np.divide(dots, norms, out=np.zeros(index.size), where=norms > 0)
+            items = index.ordered(index.items)
+            self.queries += 1
+
+        results = []
+        for row in np.argsort(-scores, kind="stable"):
+            if scores[row] < self.min_score or len(results) == k:
+                break
+            if id(items[row]) not in exclude:
+                results.append((float(scores[row]), items[row]))
+        self.query_seconds += time.perf_counter() - start
+        return results
+
+    def drop(self, session_id=None):
+        """Forget one session's turns, or every session's (document frequencies are kept)."""
+        with self._lock:
+            if session_id is None:
+                self.sessions = {}
+            else:
+                self.sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            turns = sum(index.size for index in self.sessions.values())
+            index_bytes = sum(index.memory_bytes() for index in self.sessions.values())
+            return {
+                "sessions": len(self.sessions),
+                "turns": turns,
+                "index_bytes": index_bytes,
+                "bytes_per_turn": round(index_bytes / turns, 1) if turns else 0.0,
+                "idf_bytes": self.vectorizer.doc_freq.nbytes,
+                "queries": self.queries,
+                "avg_query_ms": round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0.0
+            }
@@ -0,0 +1,363 @@
+# Durable storage for MemoryManager: encrypted turns in SQLite, written behind the request path
+import atexit
+import base64
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+FLUSH_INTERVAL = 0.05      # seconds the writer waits to gather a batch
+FLUSH_BATCH = 256          # write units per transaction
+MAX_PENDING = 10000        # queued write units before writes are dropped (write() never blocks)
+WRITE_RETRIES = 3          # attempts per batch (e.g. another worker holding the lock) before it is dropped
+COMPACT_INTERVAL = 600     # seconds between background compactions (0 disables them)
+KEEP_TURNS = 5             # turns compaction keeps per session; match MemoryManager's max_turns
+BUSY_TIMEOUT = 30          # seconds a connection waits on another worker's write lock
+LOAD_WAIT = 1.0            # seconds load() waits for the session's own queued writes before reading
+FLUSH_TIMEOUT = 30         # seconds flush() waits for queued writes by default
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    user TEXT NOT NULL,
+    echo TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_session ON turns (session, id);
+CREATE INDEX IF NOT EXISTS turns_timestamp ON turns (timestamp);
+CREATE TABLE IF NOT EXISTS summaries (
+    session TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+"""
+
+
+def _text(token):
+    return base64.urlsafe_b64encode(token).decode()
+
+
+def _raw(text):
+    return base64.urlsafe_b64decode(text)
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+class SQLiteMemoryStore:
+    """Encrypted turns and summaries of every session in one SQLite file.
+
+    MemoryManager hands it already-encrypted rows, so the file holds no
+    plaintext. write() only queues a unit of operations; a writer thread
+    commits queued units in batches, one transaction each, so a crash loses
+    at most the last FLUSH_INTERVAL of turns and never half a unit.
+
+    The database runs in WAL mode, so several worker processes can share one
+    file, but each session must be served by one worker at a time (route
+    requests by session id). A worker reads a session only when it first
+    needs it, so it doesn't see turns another worker adds later, and the
+    summary written last wins.
+
+    A store is any object with write(ops), load(session_id, max_turns),
+    flush(), compact(), stats() and close(); this is the SQLite one.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH, max_pending=MAX_PENDING,
+                 compact_interval=COMPACT_INTERVAL, keep_turns=KEEP_TURNS, retention=None, load_wait=LOAD_WAIT):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_interval = compact_interval
+        self.keep_turns = keep_turns
+        # seconds after which idle turns and summaries are deleted by compaction (None keeps them)
+        self.retention = retention
+        self.load_wait = load_wait
+        self.logger = logging.getLogger(__name__)
+
+        self.recovered = False
+        self._recover()
+        self._read = self._connect()
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        # session -> queued units touching it; None counts queued clears of every session
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # notified whenever queued units are committed or dropped
+        self._settled = threading.Condition(self._pending_lock)
+        self._closed = False
+
+        self.units = 0
+        self.rows = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self.flush_seconds = 0.0
+        self.compactions = 0
+        self.compacted_rows = 0
+        self.stale_loads = 0
+
+        self._writer = threading.Thread(target=self._write_loop, name="memory-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _recover(self):
+        """Create the schema; a file that fails its integrity check is moved aside and started afresh.
+
+        Transactions cut off by a crash are rolled back by SQLite itself when the file is next opened.
+        """
+        deadline = time.monotonic() + BUSY_TIMEOUT
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                ok = conn.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+                break
+            except sqlite3.OperationalError:
+                # Locked by another worker opening the same file (switching to WAL is not retried by SQLite)
+                if conn is not None:
+                    conn.close()
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(self.flush_interval)
+            except sqlite3.DatabaseError as e:
+                self.logger.error(f"Memory store {self.path} is unreadable: {e}")
+                ok = False
+                break
+        if not ok:
+            if conn is not None:
+                conn.close()
+            aside = f"{self.path}.corrupt-{int(time.time())}"
+            os.replace(self.path, aside)
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.replace(self.path + suffix, aside + suffix)
+            self.logger.error(f"Memory store {self.path} failed its integrity check; moved to {aside}")
+            self.recovered = True
+            conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def write(self, ops):
+        """Queue one unit of operations, applied atomically and in order; never blocks.
+
+        ops are ("turn", session_id, record), ("summary", session_id, token,
+        timestamp) and ("clear", session_id or None for every session); records
+        and tokens are MemoryManager's (raw Fernet tokens, Unix timestamps).
+        """
+        if self._closed:
+            self.dropped += 1
+            self.logger.warning("Memory store is closed; dropping a write")
+            return
+        sessions = [op[1] for op in ops]
+        with self._pending_lock:
+            for session_id in sessions:
+                self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        try:
+            self._queue.put_nowait((ops, sessions))
+        except queue.Full:
+            self._settle(sessions)
+            self.dropped += 1
+            self.logger.warning("Memory store queue full; dropping a write")
+
+    def _settle(self, sessions):
+        with self._settled:
+            for session_id in sessions:
+                self._pending[session_id] -= 1
+                if not self._pending[session_id]:
+                    del self._pending[session_id]
+            self._settled.notify_all()
+
+    def _write_loop(self):
+        conn = self._connect()
+        next_compaction = time.monotonic() + self.compact_interval
+        while True:
+            try:
+                unit = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                unit = None
+            if unit is None and self._closed:
+                break
+            batch = [unit] if unit is not None else []
+            deadline = time.monotonic() + self.flush_interval
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._commit(conn, batch)
+                except Exception as e:
+                    # Never let the writer die: flush() and load() would wait on it forever
+                    self.errors += 1
+                    self.logger.error(f"Memory store writer error: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+            if self.compact_interval and time.monotonic() >= next_compaction:
+                next_compaction = time.monotonic() + self.compact_interval
+                try:
+                    self._compact(conn)
+                except sqlite3.Error as e:
+                    self.logger.error(f"Memory store compaction failed: {e}")
+        conn.close()
+
+    def _commit(self, conn, batch):
+        start = time.perf_counter()
+        try:
+            try:
+                rows = self._transact(conn, batch)
+            except Exception as e:
+                # A unit that can't be applied (not a lock or I/O error): commit the others one by one
+                self.logger.error(f"Memory store batch failed, writing its units separately: {e}")
+                rows = 0
+                for unit in batch:
+                    try:
+                        rows += self._transact(conn, [unit])
+                    except Exception as e:
+                        self.errors += 1
+                        self.dropped += 1
+                        self.logger.error(f"Memory store dropped a write it could not apply: {e}")
+        finally:
+            for _, sessions in batch:
+                self._settle(sessions)
+        self.units += len(batch)
+        self.rows += rows
+        self.batches += 1
+        self.flush_seconds += time.perf_counter() - start
+
+    def _transact(self, conn, batch):
+        """Apply units in one transaction, retrying database errors; rows written (0 if dropped)."""
+        for attempt in range(WRITE_RETRIES):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = sum(self._apply(conn, ops) for ops, _ in batch)
+                conn.execute("COMMIT")
+                return rows
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self.errors += 1
+                self.logger.error(f"[Attempt {attempt+1}] Memory store write failed: {e}")
+                time.sleep(self.flush_interval * 2 ** attempt)
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        self.dropped += len(batch)
+        return 0
+
+    @staticmethod
+    def _apply(conn, ops):
+        for op in ops:
+            if op[0] == "turn":
+                _, session_id, record = op
+                conn.execute("INSERT INTO turns (session, timestamp, user, echo) VALUES (?, ?, ?, ?)",
+                             (session_id, _iso(record.timestamp), _text(record.user), _text(record.echo)))
+            elif op[0] == "summary":
+                _, session_id, token, timestamp = op
+                conn.execute("INSERT OR REPLACE INTO summaries (session, summary, timestamp) VALUES (?, ?, ?)",
+                             (session_id, _text(token), _iso(timestamp)))
+            elif op[1] is None:
+                conn.execute("DELETE FROM turns")
+                conn.execute("DELETE FROM summaries")
+            else:
+                conn.execute("DELETE FROM turns WHERE session = ?", (op[1],))
+                conn.execute("DELETE FROM summaries WHERE session = ?", (op[1],))
+        return len(ops)
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Wait until every queued write is committed (or `timeout` seconds pass); returns whether it was.
+
+        A `timeout` of None waits as long as the writer is running.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks and self._writer.is_alive():
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(self.flush_interval / 5)
+        return not self._queue.unfinished_tasks
+
+    def load(self, session_id, max_turns):
+        """([(user token, echo token, timestamp)] of the last `max_turns` turns oldest first, summary token or None).
+
+        Tokens are raw bytes and timestamps Unix times, as MemoryManager keeps them.
+
+        Waits up to load_wait seconds for this session's queued writes (not
+        other sessions') first, so a reload sees them; after that it reads
+        what has been committed.
+        """
+        with self._settled:
+            settled = self._settled.wait_for(lambda: session_id not in self._pending and None not in self._pending,
+                                             timeout=self.load_wait)
+        if not settled:
+            self.stale_loads += 1
+            self.logger.warning(f"Memory store: loading session {session_id} before its queued writes landed")
+        with self._read_lock:
+            rows = self._read.execute(
+                "SELECT user, echo, timestamp FROM turns WHERE session = ? ORDER BY id DESC LIMIT ?",
+                (session_id, max_turns)
+            ).fetchall()
+            summary = self._read.execute("SELECT summary FROM summaries WHERE session = ?",
+                                         (session_id,)).fetchone()
+        turns = [(_raw(user), _raw(echo), datetime.fromisoformat(timestamp).timestamp())
+                 for user, echo, timestamp in reversed(rows)]
+        return turns, _raw(summary[0]) if summary else None
+
+    def compact(self):
+        """Delete turns already folded into summaries (and expired ones), then shrink the WAL."""
+        self.flush()
+        with self._read_lock:
+            return self._compact(self._read)
+
+    def _compact(self, conn):
+        deleted = conn.execute(
+            "DELETE FROM turns WHERE id IN (SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+            "(PARTITION BY session ORDER BY id DESC) AS newer FROM turns) WHERE newer > ?)",
+            (self.keep_turns,)
+        ).rowcount
+        if self.retention is not None:
+            cutoff = (datetime.now() - timedelta(seconds=self.retention)).isoformat()
+            deleted += conn.execute("DELETE FROM turns WHERE timestamp < ?", (cutoff,)).rowcount
+            deleted += conn.execute("DELETE FROM summaries WHERE timestamp < ?", (cutoff,)).rowcount
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.compactions += 1
+        self.compacted_rows += deleted
+        return deleted
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": self._queue.qsize(),
+            "units": self.units,
+            "rows": self.rows,
+            "batches": self.batches,
+            "avg_batch": round(self.units / self.batches, 1) if self.batches else 0.0,
+            "flush_ms": round(self.flush_seconds * 1000, 3),
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "compactions": self.compactions,
+            "compacted_rows": self.compacted_rows,
+            "stale_loads": self.stale_loads,
+            "recovered": self.recovered
+        }
+
+    def close(self):
+        """Commit everything queued and stop the writer; safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        self._writer.join()
+        self._read.close()
+        atexit.unregister(self.close)
@@ -0,0 +1,372 @@
+# asyncio variant of NLPEngine: one worker process serving many conversations concurrently
+import asyncio
+import functools
+import json
+import time
+
+from .config import ASYNC_DISCONNECT_POLL, CLASSIFICATION_TEMPERATURE
+from .nlp_engine import NLPEngine
+from .rate_limiter import PRIORITY_REPLY, PRIORITY_CLASSIFICATION, estimate_request_tokens
+from .retry import RETRYABLE_STATUSES, astream_within_deadline, remaining_time, turn_deadline
+from .singleflight import AsyncSingleFlight
+
+
+class AsyncNLPEngine(NLPEngine):
+    """NLPEngine whose upstream calls are coroutines on a shared aiohttp connection pool.
+
+    call_groq_model, detect_intent, detect_emotion, classify, analyze_only,
+    generate_reply, analyze_fused, analyze and analyze_stream take the same
+    arguments and return the same results as in NLPEngine, but must be
+    awaited; stream_groq_model and generate_reply_stream return async
+    iterators (`async for`). Prompts, the label cache, local tier, cascade,
+    rate limiter, circuit breaker and get_stats() work as in the sync engine.
+    Backoff sleeps with asyncio.sleep; cancelling the awaiting task (see
+    cancel_on_disconnect) aborts the call, its in-flight request and any
+    retries. MemoryManager calls run in the loop's default executor, since
+    they lock, decrypt and may read the store.
+
+    Micro-batching and hedging are thread-based and not available here.
+    """
+
+    def __init__(self, model_name="llama3-8b-8192", http_client=None, **kwargs):
+        if kwargs.get("batch_classification") or kwargs.get("hedge_requests"):
+            raise ValueError("AsyncNLPEngine does not support batch_classification or hedge_requests")
+        if http_client is None:
+            from .async_http_client import AsyncHTTPClient
+            http_client = AsyncHTTPClient()
+        super().__init__(model_name, http_client=http_client, **kwargs)
+        self.inflight = AsyncSingleFlight()
+
+    async def aclose(self):
+        await self.http.close()
+
+    @staticmethod
+    async def _in_thread(func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def cancel_on_disconnect(self, coro, is_disconnected, poll=ASYNC_DISCONNECT_POLL):
+        """Await `coro`, cancelling it once `await is_disconnected()` is true.
+
+        `is_disconnected` is e.g. Starlette's `request.is_disconnected`. Raises
+        asyncio.CancelledError when the client went away; nothing is written to
+        memory for a cancelled turn.
+        """
+        task = asyncio.ensure_future(coro)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=poll)
+                if done:
+                    return task.result()
+                if await is_disconnected():
+                    break
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        self.metrics.incr("disconnect_cancellations")
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        raise asyncio.CancelledError("client disconnected")
+
+    async def call_groq_model(self, messages, max_tokens=200, temperature=0.7, coalesce=None,
+                              priority=PRIORITY_REPLY, task=None, model=None, json_mode=False):
+        """NLPEngine.call_groq_model as a coroutine (identical deterministic calls are coalesced too)."""
+        model = model or self.model_for(task)
+        if coalesce is None:
+            coalesce = temperature == 0
+
+        start = time.perf_counter()
+        if not coalesce:
+            result = await self._request_completion_async(messages, max_tokens, temperature, priority, model,
+                                                          json_mode)
+        else:
+            key = json.dumps([model, messages, max_tokens, temperature, json_mode], sort_keys=True)
+            result, shared = await self.inflight.do(
+                key, lambda: self._request_completion_async(messages, max_tokens, temperature, priority, model,
+                                                            json_mode)
+            )
+            if shared:
+                self.metrics.incr("coalesced_calls")
+        if task is not None:
+            self.metrics.incr(f"task_{task}_calls")
+            self.metrics.observe(f"task_{task}", time.perf_counter() - start)
+        return result
+
+    async def _before_attempt_async(self, tokens=0, priority=PRIORITY_REPLY) -> bool:
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            self.metrics.incr("deadline_exceeded")
+            return False
+        if self.rate_limiter is not None and not await self.rate_limiter.acquire_async(tokens, priority,
+                                                                                       timeout=remaining):
+            self.metrics.incr("rate_limited")
+            return False
+        if not self.breaker.allow_request():
+            self.metrics.incr("circuit_rejections")
+            return False
+        return True
+
+    async def _request_completion_async(self, messages, max_tokens, temperature, priority=PRIORITY_REPLY,
+                                        model=None, json_mode=False):
+        payload = self._completion_payload(messages, max_tokens, temperature, model or self.model_name,
+                                           json_mode=json_mode)
+        estimated_tokens = estimate_request_tokens(messages, max_tokens)
+        attempts = 0
+        for attempt in range(self.retry_policy.max_attempts):
+            if not await self._before_attempt_async(estimated_tokens, priority):
+                break
+            attempts += 1
+            try:
+                with self.metrics.timer("llm_call"):
+                    response = await self.http.post(self.api_url, headers=self.headers, json=payload,
+                                                    timeout=self._attempt_timeout())
+            except asyncio.CancelledError:
+                # Not the upstream's fault; just don't leave a half-open probe hanging
+                self.metrics.incr("cancelled_calls")
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                self.logger.error(f"[Attempt {attempt+1}] Request Error: {e}")
+                self.breaker.record_failure()
+                response = None
+            else:
+                content, retryable = self._read_completion(response, attempt, estimated_tokens)
+                if content is not None:
+                    return content
+                if not retryable:
+                    break
+
+            delay = self._retry_delay(attempt, response)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+
+        if attempts == 0:
+            return "[Groq Error]: Upstream unavailable (circuit open or deadline exceeded)"
+        return f"[Groq Error]: Failed after {attempts} attempts"
+
+    async def stream_groq_model(self, messages, max_tokens=200, temperature=0.7, model=None):
+        """NLPEngine.stream_groq_model as an async generator."""
+        payload = self._completion_payload(messages, max_tokens, temperature, model or self.model_for("reply"),
+                                           stream=True)
+        estimated_tokens = estimate_request_tokens(messages, max_tokens)
+        for attempt in range(self.retry_policy.max_attempts):
+            if not await self._before_attempt_async(estimated_tokens, PRIORITY_REPLY):
+                break
+            start = time.perf_counter()
+            received = False
+            error = None
+            try:
+                async with self.http.stream(self.api_url, headers=self.headers, json=payload,
+                                            timeout=self._attempt_timeout()) as response:
+                    if response.status_code != 200:
+                        error = await response.read()
+                    else:
+                        async for line in response.lines():
+                            delta = self._stream_delta(line, response, estimated_tokens)
+                            if delta is None:
+                                break
+                            if delta:
+                                if not received:
+                                    received = True
+                                    self.metrics.observe("llm_first_token", time.perf_counter() - start)
+                                yield delta
+            except asyncio.CancelledError:
+                self.metrics.incr("cancelled_calls")
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                self.logger.error(f"[Stream attempt {attempt+1}] Error: {e}")
+
+            if received:
+                self.breaker.record_success()
+                self.metrics.observe("llm_stream", time.perf_counter() - start)
+                return
+            if error is not None:
+                self.logger.warning(f"[Stream attempt {attempt+1}] HTTP {error.status_code}: {error.text}")
+                self._record_health(error)
+                self._after_response(error, estimated_tokens)
+                if error.status_code not in RETRYABLE_STATUSES:
+                    break
+            else:
+                self.breaker.record_failure()
+            delay = self._retry_delay(attempt, error)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+
+        self.logger.error("[Stream] No reply received from model")
+
+    async def _classify_with_cascade(self, task, messages, max_tokens, parse, json_mode=False):
+        for tier, model in enumerate(self._cascade_models(task)):
+            if tier:
+                self.metrics.incr(f"task_{task}_escalations")
+            result = await self.call_groq_model(messages, max_tokens=max_tokens,
+                                                temperature=CLASSIFICATION_TEMPERATURE,
+                                                priority=PRIORITY_CLASSIFICATION, task=task, model=model,
+                                                json_mode=json_mode and self._json_mode_for(model))
+            if result.startswith("[Groq Error]"):
+                return None
+            label = self._accept_label(task, model, result, parse)
+            if label is not None:
+                return label
+        return None
+
+    async def _detect_intent_llm(self, user_input: str) -> str:
+        intent = await self._classify_with_cascade("intent", self._intent_messages(user_input), 10,
+                                                   self._parse_intent)
+        if intent is not None:
+            self._remember_intent(user_input, intent)
+            return intent
+        return "unknown"
+
+    async def _detect_emotion_llm(self, user_input: str) -> dict:
+        emotion_data = await self._classify_with_cascade("emotion", self._emotion_messages(user_input), 50,
+                                                         self._parse_emotion, json_mode=True)
+        if emotion_data is not None:
+            self._remember_emotion(user_input, emotion_data)
+            return emotion_data
+        return {"emotion": "neutral", "sentiment": "neutral"}
+
+    async def detect_intent(self, user_input: str) -> str:
+        intent, _ = self._lookup_intent(user_input)
+        if intent is not None:
+            return intent
+        return await self._detect_intent_llm(user_input)
+
+    async def detect_emotion(self, user_input: str) -> dict:
+        emotion_data, _ = self._lookup_emotion(user_input)
+        if emotion_data is not None:
+            return emotion_data
+        return await self._detect_emotion_llm(user_input)
+
+    async def _classify(self, user_input: str):
+        intent, intent_source = self._lookup_intent(user_input)
+        emotion_data, emotion_source = self._lookup_emotion(user_input)
+        self.metrics.incr("classified_turns")
+        if intent is not None and emotion_data is not None:
+            self._count_turn_without_llm(intent_source, emotion_source)
+            return intent, emotion_data
+
+        if intent is None and emotion_data is None and self.concurrent_detection:
+            return await asyncio.gather(self._detect_intent_llm(user_input), self._detect_emotion_llm(user_input))
+
+        if intent is None:
+            intent = await self._detect_intent_llm(user_input)
+        if emotion_data is None:
+            emotion_data = await self._detect_emotion_llm(user_input)
+        return intent, emotion_data
+
+    async def classify(self, user_input: str) -> dict:
+        with turn_deadline(self.retry_policy.turn_deadline):
+            intent, emotion_data = await self._classify(user_input)
+        return {
+            "intent": intent,
+            "emotion": emotion_data.get("emotion", "neutral"),
+            "sentiment": emotion_data.get("sentiment", "neutral")
+        }
+
+    async def analyze_only(self, user_input: str, memory_manager=None, session_id=None) -> dict:
+        context = ""
+        if memory_manager:
+            context = await self._in_thread(memory_manager.get_context_text, session_id, query=user_input)
+        analysis = await self.classify(user_input)
+        analysis["context"] = context
+        return analysis
+
+    async def generate_reply(self, user_input: str, analysis: dict, persona_prompt=None,
+                             max_tokens=150, temperature=0.8, persona_key=None) -> str:
+        messages = self._persona_messages(user_input, analysis, persona_prompt, persona_key)
+        with turn_deadline(self.retry_policy.turn_deadline):
+            return await self.call_groq_model(messages, max_tokens=max_tokens, temperature=temperature,
+                                              task="reply")
+
+    def generate_reply_stream(self, user_input: str, analysis: dict, persona_prompt=None,
+                              max_tokens=150, temperature=0.8, persona_key=None):
+        """Streaming generate_reply(): an async iterator of reply text, within the turn deadline."""
+        messages = self._persona_messages(user_input, analysis, persona_prompt, persona_key)
+        return astream_within_deadline(self.stream_groq_model(messages, max_tokens=max_tokens,
+                                                              temperature=temperature),
+                                       self.retry_policy.turn_deadline)
+
+    async def analyze_fused(self, user_input: str, context: str = "") -> dict:
+        model = self.model_for("reply")
+        result = await self.call_groq_model(self._fused_messages(user_input, context), max_tokens=250,
+                                            temperature=0.7, task="reply", json_mode=self._json_mode_for(model))
+        if result.startswith("[Groq Error]"):
+            return None
+        return self._parse_fused(result, model)
+
+    async def analyze(self, user_input: str, memory_manager=None, session_id=None) -> dict:
+        with turn_deadline(self.retry_policy.turn_deadline):
+            return await self._analyze(user_input, memory_manager, session_id)
+
+    async def _analyze(self, user_input: str, memory_manager=None, session_id=None) -> dict:
+        context = ""
+        if memory_manager:
+            context = await self._in_thread(memory_manager.get_context_text, session_id, query=user_input)
+
+        if self.fused_analysis:
+            fused = await self.analyze_fused(user_input, context)
+            if fused:
+                self.metrics.incr("fused_turns")
+                if memory_manager:
+                    await self._in_thread(memory_manager.add_memory, user_input, fused["response"], session_id)
+                return fused
+            self.metrics.incr("fused_fallbacks")
+
+        speculative = None
+        if self.speculative_reply:
+            provisional_messages = self._build_reply_messages(user_input, context)
+            speculative = asyncio.ensure_future(self.call_groq_model(provisional_messages, 150, 0.8, task="reply"))
+
+        try:
+            intent, emotion_data = await self._classify(user_input)
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+            raise
+        sentiment = emotion_data.get("sentiment", "neutral") if emotion_data else "neutral"
+
+        response = None
+        if speculative is not None:
+            if self._changes_reply_materially(intent, sentiment):
+                speculative.cancel()
+                self.metrics.incr("speculative_discards")
+            else:
+                response = await speculative
+                self.metrics.incr("speculative_hits")
+
+        if response is None:
+            messages = self._build_reply_messages(user_input, context, intent, emotion_data["emotion"], sentiment)
+            response = await self.call_groq_model(messages, max_tokens=150, temperature=0.8, task="reply")
+
+        if memory_manager:
+            await self._in_thread(memory_manager.add_memory, user_input, response, session_id)
+
+        return {
+            "intent": intent,
+            "emotion": emotion_data["emotion"],
+            "sentiment": emotion_data["sentiment"],
+            "response": response
+        }
+
+    async def analyze_stream(self, user_input: str, memory_manager=None, session_id=None):
+        """NLPEngine.analyze_stream as a coroutine; the returned chunks are an async iterator."""
+        with self.turn():
+            analysis = await self.analyze_only(user_input, memory_manager, session_id)
+            reply = self.generate_reply_stream(user_input, analysis)
+        del analysis["context"]
+
+        async def chunks():
+            parts = []
+            async for delta in reply:
+                parts.append(delta)
+                yield delta
+            analysis["response"] = "".join(parts).strip()
+            if memory_manager and analysis["response"]:
+                await self._in_thread(memory_manager.add_memory, user_input, analysis["response"], session_id)
+
+        return analysis, chunks()
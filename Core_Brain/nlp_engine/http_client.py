@@ -0,0 +1,94 @@
+# Pooled keep-alive HTTP client shared by NLP engines
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_POOL_BLOCK,
+)
+
+
+class PooledHTTPClient:
+    """Thread-safe, connection-pooled wrapper around a requests.Session.
+
+    Connections to the same host are kept alive and reused between calls,
+    so only the first request per pooled connection pays the TCP+TLS handshake.
+    """
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 pool_block=HTTP_POOL_BLOCK, keep_alive=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self.logger = logging.getLogger(__name__)
+
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0  # retries are handled by the engine
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self.session.headers["Connection"] = "keep-alive" if keep_alive else "close"
+
+    @property
+    def timeout(self):
+        """(connect, read) timeout tuple passed to every request."""
+        return (self.connect_timeout, self.read_timeout)
+
+    def post(self, url, headers=None, json=None, timeout=None, **kwargs):
+        """POST through the pooled session; `timeout` overrides the per-phase defaults."""
+        return self.session.post(url, headers=headers, json=json,
+                                 timeout=timeout or self.timeout, **kwargs)
+
+    def stats(self) -> dict:
+        """Pool reuse counters aggregated across every host pool.
+
+        A miss is a request that had to open a new connection; every other
+        request was served by an idle keep-alive connection (a hit).
+        """
+        requests_sent = 0
+        connections_opened = 0
+        container = self._adapter.poolmanager.pools
+        with container.lock:
+            pools = list(container._container.values())
+        for pool in pools:
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+
+        hits = max(requests_sent - connections_opened, 0)
+        return {
+            "requests": requests_sent,
+            "pool_hits": hits,
+            "pool_misses": connections_opened,
+            "hit_ratio": round(hits / requests_sent, 4) if requests_sent else 0.0,
+            "host_pools": len(pools),
+            "pool_maxsize": self.pool_maxsize
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client() -> PooledHTTPClient:
+    """Process-wide client used by every NLPEngine that isn't given its own."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = PooledHTTPClient()
+    return _shared_client
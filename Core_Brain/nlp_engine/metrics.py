@@ -0,0 +1,70 @@
+# Lightweight, thread-safe counters and latency timings for the NLP engine
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (pct in 0-100); 0.0 for no samples."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class EngineMetrics:
+    """Named counters plus a bounded window of recent latency samples per timer."""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timings = defaultdict(lambda: deque(maxlen=self.window))
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self._timings[name].append(seconds)
+
+    def samples(self, name):
+        with self._lock:
+            return list(self._timings.get(name, ()))
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """Copy of all counters and p50/p95/p99 (seconds) of every timer."""
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: list(samples) for name, samples in self._timings.items()}
+
+        latency = {}
+        for name, samples in timings.items():
+            latency[name] = {
+                "count": len(samples),
+                "p50": round(percentile(samples, 50), 4),
+                "p95": round(percentile(samples, 95), 4),
+                "p99": round(percentile(samples, 99), 4)
+            }
+        return {"counters": counters, "latency": latency}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
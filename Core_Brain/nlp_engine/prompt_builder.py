@@ -0,0 +1,176 @@
+# Token-budgeted assembly of reply prompts (static prefix + turn data + context + user message)
+import hashlib
+import math
+import re
+import threading
+
+from .config import PROMPT_TOKEN_BUDGET
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# "User said: ..." / "User's message: ..." lines, which only repeat the user message
+_ECHO_LINE = re.compile(r"^\s*User(?: said|'s message)\s*:\s*(.*?)\s*$", re.IGNORECASE)
+
+# Per-message overhead of the chat format (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Context lines MemoryManager.get_context_text() writes: the rolling summary, and the header of recalled turns
+SUMMARY_LABEL = "Earlier in this conversation:"
+RECALL_LABEL = "Relevant earlier turns:"
+
+CONTEXT_HEADER = "\nHere is the recent conversation:\n"
+CONTEXT_FOOTER = "\nRespond appropriately."
+
+
+def estimate_tokens(text) -> int:
+    """Cheap local token estimate: words and punctuation, long words counting one per ~4 characters."""
+    if not text:
+        return 0
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_PIECES.findall(text))
+
+
+def estimate_messages_tokens(messages) -> int:
+    return sum(estimate_tokens(m.get("content")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def turn_labels(intent=None, emotion=None, sentiment=None) -> str:
+    """Per-turn label lines that follow the static prefix; labels that are None are left out."""
+    lines = []
+    if emotion is not None:
+        lines.append(f"User's emotion: {emotion}")
+    if intent is not None:
+        lines.append(f"User's intent: {intent}")
+    if sentiment is not None:
+        lines.append(f"Sentiment: {sentiment}")
+    return "\n".join(lines)
+
+
+def split_context(context: str) -> list:
+    """Context text as blocks: one per "User: ... / Echo: ..." turn, the summary line, the recalled turns.
+
+    The recalled turns (indented under RECALL_LABEL) stay one block with their header.
+    """
+    blocks = []
+    for line in context.splitlines():
+        if not line.strip():
+            continue
+        if not blocks or line.startswith(("User:", SUMMARY_LABEL, RECALL_LABEL)):
+            blocks.append(line)
+        else:
+            blocks[-1] += "\n" + line
+    return blocks
+
+
+class PromptBuilder:
+    """Builds [system, user] messages whose estimated size stays within `budget` tokens.
+
+    The system message is laid out as: the static prefix (identical on every
+    turn so the provider can cache it), then the per-turn text, then the
+    trimmed context. The prefix, turn text and user message are always kept
+    (the budget is then best-effort). "User said: ..." lines in the prefix
+    that merely repeat the user message are dropped, as are repeated
+    context blocks; the turn text (label lines) is never filtered. Context
+    is filled newest turn first; the summary line is kept next, then the
+    recalled turns (all or none, with their header), then older turns as
+    room allows.
+
+    With a `prefix_key` (one per persona / task), a prefix that differs from
+    the previous one for that key is counted as `prompt_prefix_changes`.
+    """
+
+    def __init__(self, budget=PROMPT_TOKEN_BUDGET, metrics=None):
+        self.budget = budget
+        self.metrics = metrics
+        self._prefix_lock = threading.Lock()
+        self._prefixes = {}  # prefix_key -> digest of the last prefix seen
+
+    def check_prefix(self, prefix_key, prefix) -> bool:
+        """True if `prefix` is byte-identical to the last one built for `prefix_key` (or is the first)."""
+        digest = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+        with self._prefix_lock:
+            previous = self._prefixes.get(prefix_key)
+            self._prefixes[prefix_key] = digest
+        if previous is not None and previous != digest:
+            self._incr("prompt_prefix_changes")
+            return False
+        return True
+
+    def prefix_keys(self) -> int:
+        with self._prefix_lock:
+            return len(self._prefixes)
+
+    def _incr(self, name, amount=1):
+        if self.metrics is not None and amount:
+            self.metrics.incr(name, amount)
+
+    def _drop_repeated_input(self, system_prompt, user_input):
+        target = " ".join(user_input.split())
+        if not target:
+            return system_prompt
+        kept = []
+        for line in system_prompt.split("\n"):
+            match = _ECHO_LINE.match(line)
+            if match and " ".join(match.group(1).split()) == target:
+                self._incr("prompt_duplicates_dropped")
+                continue
+            kept.append(line)
+        return "\n".join(kept)
+
+    def _fit_context(self, blocks, available):
+        """Blocks to keep (in original order) within `available` tokens."""
+        unique = []
+        seen = set()
+        for block in blocks:
+            if block in seen:
+                self._incr("prompt_duplicates_dropped")
+                continue
+            seen.add(block)
+            unique.append(block)
+
+        # The summary line, or else a leading block that isn't a turn (e.g. a summary written by another memory)
+        extras = [block for block in unique if block.startswith(SUMMARY_LABEL)][:1]
+        if not extras and unique and not unique[0].startswith(("User:", RECALL_LABEL)):
+            extras = unique[:1]
+        extras += [block for block in unique if block.startswith(RECALL_LABEL)][:1]
+        turns = [block for block in unique if block not in extras]
+        costs = {block: estimate_tokens(block) + 1 for block in unique}
+
+        keep = set()
+        # Newest turn first, then the summary and recalled turns, then older turns
+        order = turns[-1:] + extras + turns[-2::-1]
+        for block in order:
+            if costs[block] <= available:
+                keep.add(block)
+                available -= costs[block]
+            elif block not in extras:
+                # Older turns than one that didn't fit are dropped too, so the kept history stays contiguous
+                break
+        self._incr("prompt_context_blocks_dropped", len(unique) - len(keep))
+        return [block for block in unique if block in keep]
+
+    def build(self, system_prompt, user_input, context="", budget=None, turn_prompt="",
+              prefix_key=None) -> list:
+        budget = self.budget if budget is None else budget
+        system_prompt = self._drop_repeated_input(system_prompt, user_input)
+        if prefix_key is not None:
+            self.check_prefix(prefix_key, system_prompt)
+        if turn_prompt:
+            system_prompt += "\n" + turn_prompt
+
+        base = (estimate_tokens(system_prompt) + estimate_tokens(user_input) + 2 * MESSAGE_OVERHEAD_TOKENS)
+        if context:
+            available = budget - base - estimate_tokens(CONTEXT_HEADER + CONTEXT_FOOTER)
+            blocks = self._fit_context(split_context(context), available)
+            if blocks:
+                system_prompt += CONTEXT_HEADER + "\n".join(blocks) + CONTEXT_FOOTER
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_input}
+        ]
+        if self.metrics is not None:
+            tokens = estimate_messages_tokens(messages)
+            self.metrics.incr("prompt_builds")
+            self.metrics.incr("prompt_tokens_estimated", tokens)
+            if tokens > budget:
+                self.metrics.incr("prompt_over_budget")
+        return messages
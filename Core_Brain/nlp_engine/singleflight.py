@@ -0,0 +1,92 @@
+# Single-flight: concurrent callers with the same key share one execution
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates identical in-flight work.
+
+    The first caller for a key runs `fn`; callers arriving while it runs wait
+    and receive the same result (or exception). Nothing is cached afterwards.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Return (result, shared) where `shared` is True for callers that piggybacked."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop.
+
+    The shared call runs as its own task, so one caller being cancelled
+    doesn't fail the others; it is cancelled once every caller waiting on it
+    has been.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> [task, waiters]
+
+    async def do(self, key, make_coro):
+        """Return (result, shared) like SingleFlight.do; `make_coro()` is only called by the first caller."""
+        entry = self._calls.get(key)
+        shared = entry is not None
+        if entry is None:
+            task = asyncio.ensure_future(make_coro())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _task: self._forget(key, entry))
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0]), shared
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                entry[0].cancel()
+
+    def _forget(self, key, entry):
+        if self._calls.get(key) is entry:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
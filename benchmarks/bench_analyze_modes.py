@@ -0,0 +1,57 @@
+"""Compare NLPEngine.analyze modes: sequential, concurrent, speculative and fused.
+
+Usage:
+    python benchmarks/bench_analyze_modes.py --turns 200 --malformed-rate 0.05
+"""
+import argparse
+import time
+
+from common import FakeGroqClient, SAMPLE_MESSAGES, summarize
+from nlp_engine.nlp_engine import NLPEngine
+
+MODES = {
+    "sequential": dict(concurrent_detection=False),
+    "concurrent": dict(concurrent_detection=True),
+    "speculative": dict(concurrent_detection=True, speculative_reply=True),
+    "fused": dict(fused_analysis=True),
+}
+
+
+def run_mode(mode, turns, malformed_rate):
+    client = FakeGroqClient(malformed_rate=malformed_rate)
+    engine = NLPEngine(http_client=client, **MODES[mode])
+
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        engine.analyze(SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)])
+        latencies.append(time.perf_counter() - start)
+
+    counters = engine.get_stats()["counters"]
+    result = summarize(latencies)
+    result.update({
+        "mode": mode,
+        "calls_per_turn": round(counters.get("llm_calls", 0) / turns, 2),
+        "prompt_tokens_per_turn": round(counters.get("prompt_tokens", 0) / turns, 1),
+        "completion_tokens_per_turn": round(counters.get("completion_tokens", 0) / turns, 1),
+        "fused_fallbacks": counters.get("fused_fallbacks", 0),
+        "speculative_hits": counters.get("speculative_hits", 0),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--modes", default=",".join(MODES),
+                        help="comma-separated subset of: " + ", ".join(MODES))
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="fraction of fused replies that fail to parse")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        print(run_mode(mode.strip(), args.turns, args.malformed_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Throughput of intent/emotion classification with and without micro-batching.
+
+Many concurrent sessions each classify distinct messages (the label cache is
+disabled so every message reaches the upstream). --rpm applies a client-side
+requests/min budget, which is where per-request overhead hurts most.
+
+Usage:
+    python benchmarks/bench_batching.py --sessions 32 --turns 10 --windows 0.01,0.02,0.03 --batch-sizes 8,16
+    python benchmarks/bench_batching.py --rpm 1200
+"""
+import argparse
+import threading
+import time
+
+from common import FakeGroqClient, SAMPLE_MESSAGES, summarize
+from nlp_engine.nlp_engine import NLPEngine
+from nlp_engine.rate_limiter import RateLimiter
+
+
+def run(sessions, turns, batching, window=None, batch_size=None, rpm=0):
+    client = FakeGroqClient()
+    options = dict(http_client=client, classification_cache=False, max_workers=sessions)
+    if rpm:
+        options["rate_limiter"] = RateLimiter(rpm=rpm, tpm=10 ** 9, background_reserve=0.0)
+    if batching:
+        options.update(batch_classification=True, batch_window=window, batch_size=batch_size)
+    engine = NLPEngine(**options)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def session(sid):
+        for turn in range(turns):
+            text = f"{SAMPLE_MESSAGES[(sid + turn) % len(SAMPLE_MESSAGES)]} (session {sid}, turn {turn})"
+            start = time.perf_counter()
+            engine.classify(text)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=session, args=(sid,)) for sid in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    stats = engine.get_stats()
+    result = {"mode": "batched" if batching else "individual"}
+    if batching:
+        result.update(window_ms=window * 1000, batch_size=batch_size,
+                      avg_batch=stats["batching"]["intent"]["avg_batch_size"],
+                      fallbacks=stats["counters"].get("batch_intent_fallbacks", 0)
+                      + stats["counters"].get("batch_emotion_fallbacks", 0))
+    result.update(summarize(latencies))
+    result.update({
+        "classifications_per_s": round(sessions * turns / wall, 1),
+        "upstream_calls": client.calls,
+        "prompt_tokens": stats["counters"].get("prompt_tokens", 0),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--windows", default="0.01,0.02,0.03", help="batch windows in seconds")
+    parser.add_argument("--batch-sizes", default="8,16")
+    parser.add_argument("--rpm", type=int, default=0, help="client-side requests/min budget (0 = unlimited)")
+    args = parser.parse_args()
+
+    print(run(args.sessions, args.turns, batching=False, rpm=args.rpm))
+    for window in (float(w) for w in args.windows.split(",")):
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            print(run(args.sessions, args.turns, True, window, batch_size, rpm=args.rpm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""End-to-end latency/throughput against the local mock Groq server.
+
+Drives NLPEngine.analyze, PersonalityRouter.get_response and the Flask chat
+routes over real HTTP at a given concurrency, and reports p50/p95/p99
+latency, turns/s and upstream calls per turn (counted by the mock server).
+
+Usage:
+    python benchmarks/bench_end_to_end.py --turns 200 --concurrency 16
+    python benchmarks/bench_end_to_end.py --targets flask,flask-stream --error-rate-5xx 0.05 --rpm 600
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ROOT_DIR, SAMPLE_MESSAGES, summarize
+from mock_groq_server import add_server_arguments, server_from_args
+
+ZEN_FLASK_DIR = os.path.join(ROOT_DIR, 'zen_flask')
+
+TARGETS = ("analyze", "router", "flask", "flask-stream")
+
+
+class NullMemory:
+    def add_memory(self, user, echo, session_id=None):
+        pass
+
+    def get_context_text(self, session_id=None, query=None):
+        return ""
+
+
+def make_turn(target, url):
+    """A callable running one turn for `target`; returns (reply_text, first_chunk_seconds or None)."""
+    if target == "analyze":
+        from nlp_engine.nlp_engine import NLPEngine
+        engine = NLPEngine(api_url=url)
+        return lambda message: (engine.analyze(message)["response"], None)
+
+    # The Flask app and its router import `ai_integration.*` from zen_flask/
+    if ZEN_FLASK_DIR not in sys.path:
+        sys.path.insert(0, ZEN_FLASK_DIR)
+
+    if target == "router":
+        from ai_integration.personality_router import PersonalityRouter
+        router = PersonalityRouter()
+        memory = NullMemory()
+        return lambda message: (router.get_response(message, memory), None)
+
+    import app as flask_app
+    client_local = threading.local()
+
+    def client():
+        if not hasattr(client_local, "client"):
+            client_local.client = flask_app.app.test_client()
+        return client_local.client
+
+    if target == "flask":
+        def turn(message):
+            response = client().post("/get_ai_response", json={"message": message})
+            return response.get_json()["response"], None
+        return turn
+
+    def stream_turn(message):
+        start = time.perf_counter()
+        response = client().post("/get_ai_response/stream", json={"message": message}, buffered=False)
+        first_chunk = None
+        parts = []
+        for chunk in response.response:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            parts.append(chunk.decode() if isinstance(chunk, bytes) else chunk)
+        response.close()
+        return "".join(parts), first_chunk
+    return stream_turn
+
+
+def run_target(target, server, turns, concurrency):
+    turn = make_turn(target, server.url)
+    server.reset()
+    latencies = []
+    first_chunks = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            reply, first_chunk = turn(SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)])
+            failed = not reply or "[Groq Error]" in reply
+        except Exception:
+            reply, first_chunk, failed = None, None, True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if first_chunk is not None:
+                first_chunks.append(first_chunk)
+            errors += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(turns)))
+    wall = time.perf_counter() - start
+
+    upstream = server.stats()
+    result = {"target": target, "concurrency": concurrency}
+    result.update(summarize(latencies))
+    if first_chunks:
+        result["first_chunk_p50_ms"] = summarize(first_chunks)["p50_ms"]
+    result.update({
+        "turns_per_s": round(turns / wall, 1),
+        "upstream_calls_per_turn": round(upstream["requests"] / turns, 2),
+        "upstream_errors": upstream["injected_429"] + upstream["injected_5xx"] + upstream["rate_limited"],
+        "failed_turns": errors,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", default=",".join(TARGETS),
+                        help="comma-separated subset of: " + ", ".join(TARGETS))
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args).start()
+    # The Flask app's engines are imported later and pick the mock up from the environment
+    os.environ["GROQ_API_URL"] = server.url
+    try:
+        for target in args.targets.split(","):
+            print(run_target(target.strip(), server, args.turns, args.concurrency))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Turn latency with and without hedged requests against a heavy-tailed upstream.
+
+Runs NLPEngine.analyze turns at a given concurrency against the mock Groq
+server with pareto round-trip noise (the label cache is disabled, so every
+turn reaches the upstream). Reports p50/p95/p99, upstream requests per turn
+and the engine's hedge rate / wins. --rpm adds a client-side budget to show
+hedges being skipped when there's no room for them.
+
+Usage:
+    python benchmarks/bench_hedging.py --turns 300 --concurrency 8
+    python benchmarks/bench_hedging.py --percentiles 90,95 --rpm 1200
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import LatencyModel, SAMPLE_MESSAGES, summarize
+from mock_groq_server import MockGroqServer
+from nlp_engine.nlp_engine import NLPEngine
+from nlp_engine.rate_limiter import RateLimiter
+
+
+def run(turns, concurrency, percentile=None, rpm=0, jitter=0.5, seed=7):
+    latency = LatencyModel(distribution="pareto", jitter=jitter, seed=seed)
+    server = MockGroqServer(latency=latency).start()
+    try:
+        options = dict(api_url=server.url, classification_cache=False)
+        if percentile is not None:
+            options.update(hedge_requests=True, hedge_percentile=percentile)
+        if rpm:
+            options["rate_limiter"] = RateLimiter(rpm=rpm, tpm=10 ** 9)
+        engine = NLPEngine(**options)
+
+        latencies = []
+        lock = threading.Lock()
+
+        def turn(i):
+            message = f"{SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]} ({i})"
+            start = time.perf_counter()
+            engine.analyze(message)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(turn, range(turns)))
+        upstream = server.stats()
+        stats = engine.get_stats()
+    finally:
+        server.stop()
+
+    result = {"hedging": f"p{percentile}" if percentile is not None else "off"}
+    result.update(summarize(latencies))
+    result["upstream_calls_per_turn"] = round(upstream["requests"] / turns, 2)
+    if "hedging" in stats:
+        hedging = stats["hedging"]
+        result.update(hedge_rate=hedging["hedge_rate"], hedges=hedging["fired"], wins=hedging["wins"],
+                      skipped=hedging["skipped"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--percentiles", default="90,95", help="hedge percentiles to compare")
+    parser.add_argument("--jitter", type=float, default=0.5, help="pareto alpha = 1 / jitter")
+    parser.add_argument("--rpm", type=int, default=0, help="client-side requests/min budget (0 = unlimited)")
+    args = parser.parse_args()
+
+    print(run(args.turns, args.concurrency, rpm=args.rpm, jitter=args.jitter))
+    for pct in (float(p) for p in args.percentiles.split(",")):
+        print(run(args.turns, args.concurrency, pct, rpm=args.rpm, jitter=args.jitter))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""MemoryManager add/fetch latency and footprint with many active sessions.
+
+Fills --sessions sessions with --turns turns each (interleaved, as concurrent
+users would), then times turns on random sessions: get_context_text followed
+by add_memory, a few turns in a row per session as in a conversation.
+"indexed" is the current layout with its plaintext context cache,
+"uncached" the same with context_cache_size=0 (decrypts every fetch),
+"sqlite" the same with a write-behind SQLiteMemoryStore in a temp directory
+(then reopened to check every session survives a restart), and
+"global-list" rebuilds the old layout (one list of every turn, scanned per
+fetch) at the same total size. --max-mb caps MemoryManager's resident
+turns (least recently used sessions are evicted) to size worker memory.
+
+Usage:
+    python benchmarks/bench_memory.py --sessions 10000 --turns 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from cryptography.fernet import Fernet
+
+from common import SAMPLE_MESSAGES, REPLY, summarize
+from memory_manager import MemoryManager
+from memory_store import SQLiteMemoryStore
+
+
+class GlobalListMemory(MemoryManager):
+    """The pre-index layout: every session's turns in one list of dicts, filtered on each fetch."""
+
+    def __init__(self, capacity):
+        super().__init__()
+        self.capacity = capacity
+        self.turns = []
+
+    def add_memory(self, user, echo, session_id=None):
+        self.turns.append({
+            "session": session_id,
+            "user": self.fernet.encrypt(user.encode()).decode(),
+            "echo": self.fernet.encrypt(echo.encode()).decode(),
+            "timestamp": datetime.now().isoformat()
+        })
+        if len(self.turns) > self.capacity:
+            self.turns.pop(0)
+
+    def get_context_text(self, session_id=None, query=None):
+        return "\n".join(
+            f"User: {self.fernet.decrypt(msg['user'].encode()).decode()}\n"
+            f"Echo: {self.fernet.decrypt(msg['echo'].encode()).decode()}"
+            for msg in self.turns if msg["session"] == session_id
+        )
+
+
+def make_memory(layout, sessions, turns, key=None, store_path=None, max_bytes=None):
+    if layout == "indexed":
+        return MemoryManager(max_turns=turns, max_bytes=max_bytes)
+    if layout == "uncached":
+        return MemoryManager(max_turns=turns, context_cache_size=0, max_bytes=max_bytes)
+    if layout == "sqlite":
+        return MemoryManager(key, max_turns=turns, store=SQLiteMemoryStore(store_path, keep_turns=turns),
+                             max_bytes=max_bytes)
+    return GlobalListMemory(sessions * turns)
+
+
+def dict_turn_bytes(memory):
+    """Resident bytes per turn of the global list's dict records, for comparison with TurnRecord."""
+    turns = memory.turns
+    total = sum(sys.getsizeof(msg) + sum(sys.getsizeof(value) for value in msg.values()) for msg in turns)
+    return round(total / len(turns), 1) if turns else 0.0
+
+
+def check_reload(memory, key, store_path, session_ids, turns):
+    """Close the store, reopen it in a fresh MemoryManager and compare every session's context."""
+    expected = {session_id: memory.get_context_text(session_id) for session_id in session_ids}
+    memory.close()
+    start = time.perf_counter()
+    reopened = MemoryManager(key, max_turns=turns, store=SQLiteMemoryStore(store_path, keep_turns=turns))
+    same = all(reopened.get_context_text(session_id) == text for session_id, text in expected.items())
+    reload_s = time.perf_counter() - start
+    reopened.close()
+    return {"reload_ok": same, "reload_s": round(reload_s, 2), "db_mb": round(os.path.getsize(store_path) / 2 ** 20, 1)}
+
+
+def run(layout, sessions, turns, samples, burst=4, seed=7, max_bytes=None):
+    key = Fernet.generate_key()
+    store_path = os.path.join(tempfile.mkdtemp(), "memory.db") if layout == "sqlite" else None
+    memory = make_memory(layout, sessions, turns, key, store_path, max_bytes)
+    session_ids = [f"session-{i}" for i in range(sessions)]
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        for i, session_id in enumerate(session_ids):
+            memory.add_memory(SAMPLE_MESSAGES[(i + turn) % len(SAMPLE_MESSAGES)], REPLY, session_id)
+    fill_s = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    add_latencies, get_latencies = [], []
+    decrypts_before = getattr(memory, "decrypts", 0)
+    for i in range(samples):
+        if i % burst == 0:
+            session_id = rng.choice(session_ids)
+        start = time.perf_counter()
+        context = memory.get_context_text(session_id)
+        get_latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        memory.add_memory("one more message", REPLY, session_id)
+        add_latencies.append(time.perf_counter() - start)
+    result = {"layout": layout, "sessions": sessions, "fill_s": round(fill_s, 2), "context_chars": len(context)}
+    result.update({f"get_{k}": v for k, v in summarize(get_latencies).items()})
+    result.update({f"add_{k}": v for k, v in summarize(add_latencies).items()})
+    if layout == "global-list":
+        result.update(avg_turn_bytes=dict_turn_bytes(memory))
+    else:
+        stats = memory.stats()
+        result.update(resident_mb=round(stats["bytes"] / 2 ** 20, 1), avg_session_bytes=stats["avg_session_bytes"],
+                      avg_turn_bytes=stats["avg_turn_bytes"], resident_sessions=stats["sessions"],
+                      evicted_sessions=stats["eviction"]["lru"] + stats["eviction"]["idle"],
+                      decrypts_per_turn=round((memory.decrypts - decrypts_before) / samples, 2),
+                      context_hit_ratio=stats["context_cache"]["hit_ratio"])
+    if layout == "sqlite":
+        memory.store.flush()
+        store = memory.store.stats()
+        result.update(store_batches=store["batches"], store_avg_batch=store["avg_batch"],
+                      store_flush_ms=store["flush_ms"], store_dropped=store["dropped"])
+        result.update(check_reload(memory, key, store_path, session_ids, turns))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=5, help="turns per session (and per-session depth)")
+    parser.add_argument("--samples", type=int, default=200, help="timed turns (fetch + append)")
+    parser.add_argument("--burst", type=int, default=4, help="consecutive turns per picked session")
+    parser.add_argument("--layouts", default="indexed,uncached,sqlite,global-list")
+    parser.add_argument("--max-mb", type=float, default=None, help="MemoryManager max_bytes, in MiB")
+    args = parser.parse_args()
+
+    max_bytes = int(args.max_mb * 2 ** 20) if args.max_mb else None
+    for layout in args.layouts.split(","):
+        print(run(layout, args.sessions, args.turns, args.samples, args.burst, max_bytes=max_bytes))
+
+
+if __name__ == "__main__":
+    main()
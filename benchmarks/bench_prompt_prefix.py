@@ -0,0 +1,100 @@
+"""Processed prompt tokens with the stable prefix layout vs. per-turn data interleaved in the persona text.
+
+Runs persona reply calls (with rotating labels) against the mock Groq
+server, which prefix-caches prompts in fixed-size blocks. "interleaved"
+rebuilds the old layout (labels and the user message spliced into the
+persona text); "stable" is the current one (static persona prefix, then
+the turn's labels).
+
+Usage:
+    python benchmarks/bench_prompt_prefix.py --turns 100
+"""
+import argparse
+import os
+import sys
+import time
+
+from common import ROOT_DIR, SAMPLE_MESSAGES, summarize
+from mock_groq_server import MockGroqServer
+from nlp_engine.nlp_engine import NLPEngine
+
+ZEN_FLASK_DIR = os.path.join(ROOT_DIR, 'zen_flask')
+if ZEN_FLASK_DIR not in sys.path:
+    sys.path.insert(0, ZEN_FLASK_DIR)
+
+from ai_integration.personalities.EchoPersonality import EchoPersonality  # noqa: E402
+from ai_integration.personalities.Suzi import Suzi  # noqa: E402
+
+# Labels rotate per turn as they would with real traffic
+LABELS = [
+    ("greeting", "happy", "positive"),
+    ("question", "curious", "neutral"),
+    ("emotional_support", "sad", "negative"),
+    ("request", "calm", "neutral"),
+    ("emotional_support", "anxious", "negative"),
+]
+
+
+def interleaved_prompt(persona, user_input, analysis):
+    """The pre-split layout: per-turn lines right after the persona's goals, static text after them."""
+    head, tail = persona.persona_prompt().split(f"Your goals: {persona.goals}. ", 1)
+    return (
+        f"{head}Your goals: {persona.goals}. "
+        f"User's emotion: {analysis['emotion']}\n"
+        f"User's intent: {analysis['intent']}\n"
+        f"Sentiment: {analysis['sentiment']}\n"
+        f"User said: {user_input}\n"
+        f"{tail}"
+    )
+
+
+def run_layout(layout, turns):
+    server = MockGroqServer().start()
+    try:
+        engine = NLPEngine(api_url=server.url)
+        personas = [EchoPersonality(nlp=engine), Suzi(nlp=engine)]
+
+        latencies = []
+        for i in range(turns):
+            persona = personas[i % len(personas)]
+            # Unique messages, so whole prompts never repeat and only shared prefixes can hit the cache
+            message = f"{SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]} ({i})"
+            intent, emotion, sentiment = LABELS[i % len(LABELS)]
+            analysis = {"intent": intent, "emotion": emotion, "sentiment": sentiment, "context": ""}
+            if layout == "stable":
+                prompt = persona.persona_prompt()
+            else:
+                prompt = interleaved_prompt(persona, message, analysis)
+            start = time.perf_counter()
+            engine.generate_reply(message, analysis, prompt, persona_key=persona.name)
+            latencies.append(time.perf_counter() - start)
+
+        upstream = server.stats()
+        prompt_stats = engine.get_stats()["prompt"]
+    finally:
+        server.stop()
+
+    processed = upstream["prompt_tokens"] - upstream["cached_prompt_tokens"]
+    result = {"layout": layout}
+    result.update(summarize(latencies))
+    result.update({
+        "prompt_tokens_per_turn": round(upstream["prompt_tokens"] / turns, 1),
+        "processed_prompt_tokens_per_turn": round(processed / turns, 1),
+        "cached_fraction": round(upstream["cached_prompt_tokens"] / upstream["prompt_tokens"], 3)
+        if upstream["prompt_tokens"] else 0.0,
+        "prefix_changes": prompt_stats["prefix_changes"],
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    args = parser.parse_args()
+
+    for layout in ("interleaved", "stable"):
+        print(run_layout(layout, args.turns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Recall quality, latency and footprint of MemoryManager's RecallIndex.
+
+Each session is --turns turns of everyday chatter with --facts personal
+details planted in the older half (out of the recent window). A later
+message refers back to each detail in different words; recall@k is the
+share of those messages whose planted turn is among the k recalled turns.
+Distractor turns reuse the same people and places in unrelated sentences.
+
+Usage:
+    python benchmarks/bench_recall.py --sessions 100 --turns 200
+"""
+import argparse
+import random
+import time
+
+from common import SAMPLE_MESSAGES, REPLY, summarize
+from memory_manager import MemoryManager
+from memory_recall import RECALL_DIM, RecallIndex
+
+NAMES = ["Priya", "Marco", "Aisha", "Tom", "Mei", "Jonas", "Fatima", "Lucas", "Ananya", "Oliver"]
+CITIES = ["Toronto", "Lisbon", "Nairobi", "Osaka", "Denver", "Glasgow", "Pune", "Lima"]
+PETS = ["beagle", "parrot", "tabby cat", "hamster", "golden retriever", "tortoise"]
+JOBS = ["nurse", "architect", "chef", "pilot", "teacher", "data analyst"]
+HOBBIES = ["pottery", "rock climbing", "salsa dancing", "chess", "baking sourdough", "birdwatching"]
+
+# (planted detail, later message referring to it)
+FACTS = [
+    ("My sister {name} just moved to {city} to work as a {job}.",
+     "I wonder how my sister is finding her new job."),
+    ("We adopted a {pet} last weekend and named it Biscuit.",
+     "Biscuit chewed my shoes again this morning."),
+    ("I'm allergic to peanuts, I had a bad reaction once at a wedding.",
+     "Is it safe for me to try that satay recipe with my allergy?"),
+    ("I started {hobby} classes on Tuesday evenings.",
+     "My {hobby} teacher said I'm improving a lot."),
+    ("My grandfather's surgery is scheduled for the 14th.",
+     "Grandpa's surgery went well, he's recovering now."),
+    ("I'm saving up for a trip to {city} next spring.",
+     "I booked the flights for my spring trip today!"),
+    ("My best friend {name} and I had a huge argument about money.",
+     "{name} finally texted me after that fight."),
+    ("I've been training for a half marathon in October.",
+     "My knee hurts after today's long run, worried about the marathon."),
+]
+
+CHATTER = [
+    "I had {food} for lunch today.",
+    "Work was long, {name} kept asking me for help.",
+    "It's raining again, I just stayed in and watched a show.",
+    "I saw a documentary about {city} last night.",
+    "My neighbour's {pet} was barking all night.",
+    "I'm thinking of learning {hobby} someday, maybe.",
+    "Traffic was awful this morning.",
+    "I cleaned the whole flat and feel great.",
+    "My phone battery keeps dying, so annoying.",
+    "I read a few chapters of a mystery novel.",
+]
+FOODS = ["ramen", "a salad", "pizza", "dal and rice", "tacos", "a sandwich"]
+
+
+def fill(template, rng, values):
+    return template.format(**{key: values.get(key) or rng.choice(options) for key, options in (
+        ("name", NAMES), ("city", CITIES), ("pet", PETS), ("job", JOBS), ("hobby", HOBBIES), ("food", FOODS))})
+
+
+def build_session(rng, turns, facts, window):
+    """(messages, {planted turn index: follow-up message}) for one session."""
+    messages = [fill(rng.choice(CHATTER), rng, {}) if rng.random() < 0.7 else rng.choice(SAMPLE_MESSAGES)
+                for _ in range(turns)]
+    slots = rng.sample(range(max(1, turns - window - facts)), facts)
+    planted = {}
+    for slot, (fact, follow_up) in zip(slots, rng.sample(FACTS, facts)):
+        values = {key: rng.choice(options) for key, options in (("name", NAMES), ("city", CITIES), ("pet", PETS),
+                                                                 ("job", JOBS), ("hobby", HOBBIES))}
+        messages[slot] = fill(fact, rng, values)
+        planted[slot] = fill(follow_up, rng, values)
+    return messages, planted
+
+
+def run(sessions, turns, facts, ks, max_turns, dim, seed=7):
+    rng = random.Random(seed)
+    recall = RecallIndex(dim=dim, max_turns=max(turns, 1))
+    memory = MemoryManager(max_turns=max_turns, recall=recall)
+    planted = {}
+    add_latencies = []
+    for s in range(sessions):
+        session_id = f"session-{s}"
+        messages, session_planted = build_session(rng, turns, facts, max_turns)
+        for i, message in enumerate(messages):
+            start = time.perf_counter()
+            memory.add_memory(message, REPLY, session_id)
+            add_latencies.append(time.perf_counter() - start)
+        planted[session_id] = {messages[i]: follow_up for i, follow_up in session_planted.items()}
+
+    hits = {k: 0 for k in ks}
+    queries = 0
+    search_latencies, context_latencies = [], []
+    for session_id, session_planted in planted.items():
+        for fact, follow_up in session_planted.items():
+            # Ranked by score (recall_turns returns conversation order), recent window excluded as in recall_turns
+            recent = {id(record) for record in memory.sessions[session_id]}
+            start = time.perf_counter()
+            ranked = recall.search(session_id, follow_up, k=max(ks), exclude=recent)
+            search_latencies.append(time.perf_counter() - start)
+            ranked_users = [memory._decrypt(record.user) for _, record in ranked]
+            for k in ks:
+                hits[k] += fact in ranked_users[:k]
+            queries += 1
+            start = time.perf_counter()
+            memory.get_context_text(session_id, query=follow_up)
+            context_latencies.append(time.perf_counter() - start)
+
+    stats = recall.stats()
+    result = {"sessions": sessions, "turns": turns, "dim": dim, "queries": queries}
+    result.update({f"recall@{k}": round(hits[k] / queries, 3) for k in ks})
+    result.update({f"search_{key}": value for key, value in summarize(search_latencies).items()})
+    result.update({f"context_{key}": value for key, value in summarize(context_latencies).items()})
+    result.update({f"add_{key}": value for key, value in summarize(add_latencies).items()})
+    result.update(index_mb=round(stats["index_bytes"] / 2 ** 20, 2), bytes_per_turn=stats["bytes_per_turn"],
+                  idf_mb=round(stats["idf_bytes"] / 2 ** 20, 1))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", default="50,200,500", help="comma-separated turns per session")
+    parser.add_argument("--facts", type=int, default=4, help="details planted per session")
+    parser.add_argument("--k", default="1,3,5", help="comma-separated k values for recall@k")
+    parser.add_argument("--max-turns", type=int, default=5, help="MemoryManager's recent window")
+    parser.add_argument("--dim", type=int, default=RECALL_DIM, help="hashed feature buckets")
+    args = parser.parse_args()
+
+    ks = [int(k) for k in args.k.split(",")]
+    for turns in args.turns.split(","):
+        print(run(args.sessions, int(turns), args.facts, ks, args.max_turns, args.dim))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Shared helpers for the offline benchmarks (no Groq API key needed)
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CORE_BRAIN_DIR = os.path.join(ROOT_DIR, 'Core_Brain')
+
+# Import the engine as `nlp_engine` so Core_Brain/__init__ (Whisper, gTTS) isn't loaded
+if CORE_BRAIN_DIR not in sys.path:
+    sys.path.insert(0, CORE_BRAIN_DIR)
+
+from nlp_engine.metrics import percentile  # noqa: E402
+
+SAMPLE_MESSAGES = [
+    "hi",
+    "hello there!",
+    "I'm feeling really stressed about my exams tomorrow.",
+    "I just got a promotion at work!",
+    "what's the weather like in Delhi today?",
+    "can you help me write an email to my manager?",
+    "nobody listens to me anymore",
+    "why is the sky blue?",
+    "thanks, that helped a lot",
+    "are you trying to trick me?",
+]
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+        self.content = json.dumps(payload).encode()
+        self.text = self.content.decode()
+
+    def json(self):
+        return self._payload
+
+
+REPLY = "Hey there! It's lovely to hear from you. How is your day going so far?"
+
+
+def fake_content(messages, malformed=False):
+    """Plausible model output for the engine's prompts, keyed off the system prompt."""
+    system_prompt = messages[0]["content"]
+    if "numbered messages" in system_prompt:
+        # Micro-batched classification: one "<n>: <label>" line per numbered message
+        count = len(messages[-1]["content"].splitlines())
+        if "intent detector" in system_prompt:
+            label = "greeting"
+        else:
+            label = '{"emotion": "happy", "sentiment": "positive"}'
+        return "\n".join(f"{i}: {label}" for i in range(1, count + 1))
+    if "intent detector" in system_prompt:
+        return "greeting"
+    if "emotion and sentiment detector" in system_prompt:
+        if malformed:
+            # A near miss the engine repairs locally (synonym + case)
+            return '{"emotion": "Joyful", "sentiment": "Positive"}'
+        return '{"emotion": "happy", "sentiment": "positive"}'
+    if '"response"' in system_prompt:
+        if malformed:
+            return "Sure! Here is my analysis: intent is greeting"
+        return json.dumps({
+            "intent": "greeting",
+            "emotion": "happy",
+            "sentiment": "positive",
+            "response": REPLY
+        })
+    return REPLY
+
+
+class LatencyModel:
+    """latency = rtt * noise + prompt_tokens * prefill + completion_tokens * decode.
+
+    `distribution` shapes the round-trip noise: "fixed" (none), "lognormal"
+    (sigma = jitter) or "pareto" (heavy tail, alpha = 1 / jitter).
+    """
+
+    DISTRIBUTIONS = ("fixed", "lognormal", "pareto")
+
+    def __init__(self, rtt=0.08, prefill=0.0002, decode=0.0015, jitter=0.35,
+                 distribution="lognormal", seed=7):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}'")
+        self.rtt = rtt
+        self.prefill = prefill
+        self.decode = decode
+        self.jitter = jitter
+        self.distribution = distribution
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def first_token(self, prompt_tokens):
+        """Seconds until the first output token: noisy round trip plus prefill."""
+        with self._lock:
+            if self.distribution == "lognormal":
+                noise = self._random.lognormvariate(0, self.jitter)
+            elif self.distribution == "pareto":
+                noise = self._random.paretovariate(1 / max(self.jitter, 1e-6))
+            else:
+                noise = 1.0
+        return self.rtt * noise + prompt_tokens * self.prefill
+
+    def total(self, prompt_tokens, completion_tokens):
+        return self.first_token(prompt_tokens) + completion_tokens * self.decode
+
+
+def completion_payload(content, prompt_tokens, completion_tokens):
+    return {
+        "object": "chat.completion",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+class FakeGroqClient:
+    """In-process stand-in for PooledHTTPClient using LatencyModel.
+
+    `malformed_rate` makes that fraction of fused-analysis replies unparsable
+    to exercise the fallback path, and of emotion replies near misses to repair.
+    """
+
+    def __init__(self, rtt=0.08, prefill=0.0002, decode=0.0015, jitter=0.35,
+                 malformed_rate=0.0, seed=7):
+        self.latency = LatencyModel(rtt, prefill, decode, jitter, seed=seed)
+        self.malformed_rate = malformed_rate
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeout = (3.05, 30)
+
+    def _content_for(self, messages):
+        return fake_content(messages, malformed=self.latency.random() < self.malformed_rate)
+
+    def post(self, url, headers=None, json=None, timeout=None, **kwargs):
+        messages = json["messages"]
+        prompt_text = "".join(m["content"] for m in messages)
+        content = self._content_for(messages)
+        prompt_tokens = estimate_tokens(prompt_text)
+        completion_tokens = estimate_tokens(content)
+
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency.total(prompt_tokens, completion_tokens))
+
+        return FakeResponse(completion_payload(content, prompt_tokens, completion_tokens))
+
+    def stats(self):
+        return {"requests": self.calls}
+
+
+def summarize(latencies):
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
@@ -0,0 +1,294 @@
+"""Local stand-in for Groq's OpenAI-compatible /chat/completions endpoint.
+
+Serves plain and streamed (SSE) completions with a configurable latency
+model, injected 429 / 5xx errors and requests/tokens-per-minute limits that
+answer with Groq-style x-ratelimit-* headers. Prompts are prefix-cached in
+fixed-size blocks like hosted providers do: cached tokens skip the prefill
+cost and are reported as usage.prompt_tokens_details.cached_tokens.
+GET /stats returns counters.
+
+Usage:
+    python benchmarks/mock_groq_server.py --port 8765 --error-rate-5xx 0.02 --rpm 600
+    GROQ_API_URL=http://127.0.0.1:8765/openai/v1/chat/completions python zen_flask/app.py
+"""
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import LatencyModel, completion_payload, estimate_tokens, fake_content
+from nlp_engine.rate_limiter import MemoryBucketStore
+
+# Words per streamed SSE chunk
+STREAM_CHUNK_WORDS = 3
+# Prefix cache granularity (characters of the serialized prompt) and capacity (blocks)
+PREFIX_BLOCK_CHARS = 256
+PREFIX_CACHE_BLOCKS = 8192
+
+
+class MockGroqServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock's settings and counters."""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=None, error_rate_429=0.0,
+                 error_rate_5xx=0.0, rpm=0, tpm=0, malformed_rate=0.0, prefix_block=PREFIX_BLOCK_CHARS):
+        super().__init__((host, port), MockGroqHandler)
+        self.latency = latency or LatencyModel()
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.malformed_rate = malformed_rate
+        self.capacities = {}
+        if rpm:
+            self.capacities["requests"] = float(rpm)
+        if tpm:
+            self.capacities["tokens"] = float(tpm)
+        self.buckets = MemoryBucketStore()
+        self.prefix_block = prefix_block
+        self._prefix_cache = OrderedDict()  # digest of prompt[:n * block] -> None
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reset()
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections is routine here, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/openai/v1/chat/completions"
+
+    def start(self):
+        """Serve from a daemon thread; returns self for `server = MockGroqServer().start()`."""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {
+                "requests": 0,
+                "streamed": 0,
+                "ok": 0,
+                "injected_429": 0,
+                "injected_5xx": 0,
+                "rate_limited": 0,
+                "prompt_tokens": 0,
+                "cached_prompt_tokens": 0,
+                "completion_tokens": 0,
+            }
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def cached_tokens(self, messages):
+        """Tokens of the longest previously seen block-aligned prompt prefix; caches this prompt's blocks."""
+        if not self.prefix_block:
+            return 0
+        text = "".join(f"{m.get('role')}\n{m.get('content') or ''}\n" for m in messages)
+        digest = hashlib.sha1()
+        cached_chars = 0
+        still_cached = True
+        with self._lock:
+            for end in range(self.prefix_block, len(text) + 1, self.prefix_block):
+                digest.update(text[end - self.prefix_block:end].encode("utf-8"))
+                key = digest.hexdigest()
+                if still_cached and key in self._prefix_cache:
+                    self._prefix_cache.move_to_end(key)
+                    cached_chars = end
+                    continue
+                still_cached = False
+                self._prefix_cache[key] = None
+                if len(self._prefix_cache) > PREFIX_CACHE_BLOCKS:
+                    self._prefix_cache.popitem(last=False)
+        return estimate_tokens(text[:cached_chars]) if cached_chars else 0
+
+    def admit(self, tokens):
+        """(wait, headers): wait > 0 means the request is over the configured rate limit."""
+        if not self.capacities:
+            return 0.0, {}
+        amounts = {name: (1 if name == "requests" else tokens) for name in self.capacities}
+        wait = self.buckets.take(amounts, self.capacities)
+        levels = self.buckets.levels(self.capacities)
+        headers = {}
+        for name, capacity in self.capacities.items():
+            remaining = max(int(levels[name]), 0)
+            reset = (capacity - levels[name]) / (capacity / 60.0)
+            headers[f"x-ratelimit-limit-{name}"] = str(int(capacity))
+            headers[f"x-ratelimit-remaining-{name}"] = str(remaining)
+            headers[f"x-ratelimit-reset-{name}"] = f"{reset:.2f}s"
+        return wait, headers
+
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/stats":
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        self._send_json(200, self.server.stats())
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length))
+            messages = body["messages"]
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": {"message": f"Invalid request: {e}"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        server = self.server
+        server.count("requests")
+        prompt_tokens = estimate_tokens("".join(m.get("content") or "" for m in messages))
+        max_tokens = body.get("max_tokens") or 200
+
+        wait, limit_headers = server.admit(prompt_tokens + max_tokens)
+        if wait > 0:
+            server.count("rate_limited")
+            limit_headers["retry-after"] = f"{wait:.2f}"
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                            limit_headers)
+            return
+
+        roll = server.latency.random()
+        if roll < server.error_rate_429:
+            server.count("injected_429")
+            self._send_json(429, {"error": {"message": "Rate limit reached (injected)"}},
+                            dict(limit_headers, **{"retry-after": "1"}))
+            return
+        if roll < server.error_rate_429 + server.error_rate_5xx:
+            server.count("injected_5xx")
+            self._send_json(503, {"error": {"message": "Service unavailable (injected)"}}, limit_headers)
+            return
+
+        content = fake_content(messages, malformed=server.latency.random() < server.malformed_rate)
+        completion_tokens = estimate_tokens(content)
+        cached = min(server.cached_tokens(messages), prompt_tokens)
+        server.count("prompt_tokens", prompt_tokens)
+        server.count("cached_prompt_tokens", cached)
+        server.count("completion_tokens", completion_tokens)
+
+        if body.get("stream"):
+            server.count("streamed")
+            self._stream(content, prompt_tokens, completion_tokens, limit_headers, cached)
+        else:
+            # Only the uncached part of the prompt pays the prefill cost
+            time.sleep(server.latency.total(prompt_tokens - cached, completion_tokens))
+            payload = completion_payload(content, prompt_tokens, completion_tokens)
+            payload["usage"]["prompt_tokens_details"] = {"cached_tokens": cached}
+            self._send_json(200, payload, limit_headers)
+        server.count("ok")
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content, prompt_tokens, completion_tokens, headers, cached=0):
+        """SSE chunks paced by the latency model; usage arrives on the last chunk under x_groq."""
+        latency = self.server.latency
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        def send_event(payload):
+            data = ("data: " + (payload if isinstance(payload, str) else json.dumps(payload)) + "\n\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        time.sleep(latency.first_token(prompt_tokens - cached))
+        words = content.split(" ")
+        for i in range(0, len(words), STREAM_CHUNK_WORDS):
+            piece = " ".join(words[i:i + STREAM_CHUNK_WORDS])
+            if i + STREAM_CHUNK_WORDS < len(words):
+                piece += " "
+            send_event({"object": "chat.completion.chunk",
+                        "choices": [{"index": 0, "delta": {"content": piece}}]})
+            time.sleep(estimate_tokens(piece) * latency.decode)
+        send_event({"object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    "x_groq": {"usage": {"prompt_tokens": prompt_tokens,
+                                         "completion_tokens": completion_tokens,
+                                         "total_tokens": prompt_tokens + completion_tokens,
+                                         "prompt_tokens_details": {"cached_tokens": cached}}}})
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def add_server_arguments(parser):
+    """Mock settings shared by this script and the end-to-end benchmark."""
+    parser.add_argument("--latency", choices=LatencyModel.DISTRIBUTIONS, default="lognormal",
+                        help="round-trip noise distribution")
+    parser.add_argument("--rtt", type=float, default=0.08, help="base round trip in seconds")
+    parser.add_argument("--jitter", type=float, default=0.35)
+    parser.add_argument("--prefill", type=float, default=0.0002, help="seconds per prompt token")
+    parser.add_argument("--decode", type=float, default=0.0015, help="seconds per completion token")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0, help="requests/min limit (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens/min limit (0 = unlimited)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="fraction of fused replies that fail to parse (emotion replies: near misses)")
+    parser.add_argument("--prefix-block", type=int, default=PREFIX_BLOCK_CHARS,
+                        help="prefix cache block size in characters (0 disables prefix caching)")
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def server_from_args(args, host="127.0.0.1", port=0):
+    latency = LatencyModel(rtt=args.rtt, prefill=args.prefill, decode=args.decode, jitter=args.jitter,
+                           distribution=args.latency, seed=args.seed)
+    return MockGroqServer(host, port, latency=latency, error_rate_429=args.error_rate_429,
+                          error_rate_5xx=args.error_rate_5xx, rpm=args.rpm, tpm=args.tpm,
+                          malformed_rate=args.malformed_rate, prefix_block=args.prefix_block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, args.host, args.port)
+    print(f"Mock Groq listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -55,8 +55,8 @@ else:
     get_core_status = lambda: {}
     is_core_ready = lambda: False
 
-def pipeline(audio_file_path: str) -> dict:
-    """Process audio through the complete pipeline"""
+def pipeline(audio_file_path: str, session_id: str = None) -> dict:
+    """Process audio through the complete pipeline; `session_id` keys the conversation in memory"""
     
     if not _components:
         return {
@@ -93,7 +93,7 @@ def pipeline(audio_file_path: str) -> dict:
                 'response': 'Analysis component not available.'
             }
         else:
-            result = nlp.analyze(text, memory_manager=memory)
+            result = nlp.analyze(text, memory_manager=memory, session_id=session_id)
         
         # Generate speech response
         audio_response_path = None
@@ -3,42 +3,67 @@ from Core_Brain.nlp_engine import NLPEngine
 
 
 class EchoPersonality(BasePersonality):
-    def __init__(self):
+    def __init__(self, nlp=None):
         super().__init__(name="Echo", style="caring, empathetic", goals="help user emotionally and give supportive replies")
-        self.nlp = NLPEngine() 
+        # Engine may be shared (e.g. one per worker from the app registry)
+        self.nlp = nlp or NLPEngine()
 
-    def respond(self, user_input, memory):
-        analysis = self.nlp.analyze(user_input, memory)
-        intent = analysis.get("intent", "unknown")
-        emotion = analysis.get("emotion", "neutral")
-        sentiment = analysis.get("sentiment", "neutral")
-
-        # Personality-specific system prompt
-        system_prompt = (
+    def persona_prompt(self):
+        """Static persona text; byte-identical every turn so the provider can cache it as a prefix"""
+        return (
             f"You are {self.name}. "
             f"Your style: {self.style}. "
             f"Your goals: {self.goals}. "
-            f"User's emotion: {emotion}\n"
-            f"User's intent: {intent}\n"
-            f"Sentiment: {sentiment}\n"
-            f"User said: {user_input}\n"
             "Stay in character as a caring companion. "
             "Reply in 2–3 empathetic, supportive sentences."
         )
 
-        # Call LLM
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input}
-        ]
+    def system_prompt(self, user_input, intent, emotion, sentiment):
+        """Personality-specific system prompt: static persona text first, per-turn data after it"""
+        return (
+            self.persona_prompt() + "\n"
+            f"User's emotion: {emotion}\n"
+            f"User's intent: {intent}\n"
+            f"Sentiment: {sentiment}\n"
+            f"User said: {user_input}"
+        )
 
-        response = self.nlp.call_groq_model(messages, max_tokens=150, temperature=0.7)
+    def respond(self, user_input, memory, session_id=None):
+        # Labels and context only; the persona prompt drives the turn's single reply call.
+        # Both calls share one turn deadline.
+        with self.nlp.turn():
+            analysis = self.nlp.analyze_only(user_input, memory, session_id)
+            response = self.nlp.generate_reply(user_input, analysis, self.persona_prompt(),
+                                               max_tokens=150, temperature=0.7, persona_key=self.name)
 
         if not response:
             response = "I hear you. I'm here for you, always."
 
         # Save memory
         if memory:
-            memory.add_memory(user_input, response)
+            memory.add_memory(user_input, response, session_id)
+
+        return response
 
-        return response
\ No newline at end of file
+    def respond_stream(self, user_input, memory, session_id=None):
+        """Stream the reply as it is generated; memory is saved once the stream completes."""
+        return self.nlp.stream_turn(self._stream_reply(user_input, memory, session_id))
+
+    def _stream_reply(self, user_input, memory, session_id):
+        analysis = self.nlp.analyze_only(user_input, memory, session_id)
+
+        parts = []
+        for delta in self.nlp.generate_reply_stream(user_input, analysis, self.persona_prompt(),
+                                                    max_tokens=150, temperature=0.7,
+                                                    persona_key=self.name):
+            parts.append(delta)
+            yield delta
+
+        response = "".join(parts).strip()
+        if not response:
+            response = "I hear you. I'm here for you, always."
+            yield response
+
+        # Save memory
+        if memory:
+            memory.add_memory(user_input, response, session_id)
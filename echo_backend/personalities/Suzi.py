@@ -3,26 +3,20 @@ from Core_Brain.nlp_engine import NLPEngine
 
 
 class Suzi(BasePersonality):
-    def __init__(self):
+    def __init__(self, nlp=None):
         super().__init__(name="Suzi", style="naughty, playful, bold", goals="make conversation fun, teasing, and a little tharki but caring")
-        self.nlp = NLPEngine() 
+        # Engine may be shared (e.g. one per worker from the app registry)
+        self.nlp = nlp or NLPEngine()
 
-    def respond(self, user_input, memory):
-        analysis = self.nlp.analyze(user_input, memory)  
-        intent = analysis.get("intent", "unknown")
-        emotion = analysis.get("emotion", "neutral")
-        sentiment = analysis.get("sentiment", "neutral")
-        context = analysis.get("context", "")
+    # Tag added after every Suzi reply
+    SIGN_OFF = " 😏 (waise mujhe sunna acha lagta hai, aur bolo...)"
 
-        # Apna Suzi personality prompt banao
-        system_prompt = (
+    def persona_prompt(self):
+        # Apna Suzi personality prompt banao (static, so the provider can cache it as a prefix)
+        return (
             f"You are {self.name}. "
             f"Your style: {self.style}. "
             f"Your goals: {self.goals}. "
-            f"User's emotion: {emotion}\n"
-            f"User's intent: {intent}\n"
-            f"Sentiment: {sentiment}\n"
-            f"User said: {user_input}\n"
             "Always talk in a playful, teasing, naughty-but-caring way. "
             "Never reply in a formal or generic style. "
             "Always add a flirty or teasing twist to your replies. "
@@ -35,26 +29,63 @@ class Suzi(BasePersonality):
             "Use light flirting and double-meaning jokes where appropriate, without being vulgar."
         )
 
-        # Model call
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input}
-        ]
-        response = self.nlp.call_groq_model(messages, max_tokens=150, temperature=0.95) 
+    def system_prompt(self, user_input, intent, emotion, sentiment):
+        # Static persona text first, per-turn data after it
+        return (
+            self.persona_prompt() + "\n"
+            f"User's emotion: {emotion}\n"
+            f"User's intent: {intent}\n"
+            f"Sentiment: {sentiment}\n"
+            f"User said: {user_input}"
+        )
 
+    def fallback_reply(self):
         # Agar empty reply aaya to fallback
+        import random
+        return random.choice([
+            "uff, tum to bada naughty nikle 😏",
+            "bas bas, zyada sharmao mat 😜",
+            "badi hi mast baat keh di tumne 😉",
+            "acha lagta hai tumhe thoda tang karna 😌"
+        ])
+
+    def respond(self, user_input, memory, session_id=None):
+        # Labels and context only; the persona prompt drives the turn's single reply call.
+        # Both calls share one turn deadline.
+        with self.nlp.turn():
+            analysis = self.nlp.analyze_only(user_input, memory, session_id)
+            response = self.nlp.generate_reply(user_input, analysis, self.persona_prompt(),
+                                               max_tokens=150, temperature=0.95, persona_key=self.name)
+
         if not response:
-            import random
-            response = random.choice([
-                "uff, tum to bada naughty nikle 😏",
-                "bas bas, zyada sharmao mat 😜",
-                "badi hi mast baat keh di tumne 😉",
-                "acha lagta hai tumhe thoda tang karna 😌"
-            ])
+            response = self.fallback_reply()
 
         # Save memory
         if memory:
-            memory.add_memory(user_input, response)
+            memory.add_memory(user_input, response, session_id)
+
+        return response + self.SIGN_OFF
+
+    def respond_stream(self, user_input, memory, session_id=None):
+        """Stream Suzi's reply; memory is saved once the stream completes."""
+        return self.nlp.stream_turn(self._stream_reply(user_input, memory, session_id))
+
+    def _stream_reply(self, user_input, memory, session_id):
+        analysis = self.nlp.analyze_only(user_input, memory, session_id)
 
-        return response + " 😏 (waise mujhe sunna acha lagta hai, aur bolo...)"
+        parts = []
+        for delta in self.nlp.generate_reply_stream(user_input, analysis, self.persona_prompt(),
+                                                    max_tokens=150, temperature=0.95,
+                                                    persona_key=self.name):
+            parts.append(delta)
+            yield delta
 
+        response = "".join(parts).strip()
+        if not response:
+            response = self.fallback_reply()
+            yield response
+        yield self.SIGN_OFF
+
+        # Save memory
+        if memory:
+            memory.add_memory(user_input, response, session_id)
@@ -4,7 +4,14 @@ class BasePersonality:
         self.style = style
         self.goals = goals
 
-    def respond(self,user_input, memory):
-        """Default response if child personality doesn't override."""
+    def respond(self,user_input, memory, session_id=None):
+        """Default response if child personality doesn't override.
+
+        `session_id` is the conversation's key in `memory`; pass it to every memory call.
+        """
         return f"{self.name} says: I am still learning how to respond."
 
+    def respond_stream(self, user_input, memory, session_id=None):
+        """Yield the reply in chunks; personalities without streaming yield it whole."""
+        yield self.respond(user_input, memory, session_id)
+
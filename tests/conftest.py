@@ -0,0 +1,11 @@
+# Shared pytest setup; no Groq API key or network access is needed
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Import the engine as `nlp_engine` and the memory modules directly, as the benchmarks do,
+# so Core_Brain/__init__ (Whisper, gTTS) isn't loaded
+for path in (os.path.join(ROOT_DIR, 'Core_Brain'), os.path.join(ROOT_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
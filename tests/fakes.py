@@ -0,0 +1,122 @@
+# In-process stand-ins for the Groq endpoint used by the tests
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from nlp_engine.nlp_engine import NLPEngine
+from nlp_engine.retry import CircuitBreaker
+
+REPLY = "I'm here for you."
+
+
+class FakeResponse:
+    """The parts of a requests.Response the engine reads; `lines` makes it a streamed (SSE) response."""
+
+    def __init__(self, status_code=200, payload=None, headers=None, lines=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+        self._lines = lines or []
+        self.content = json.dumps(payload).encode() if payload is not None else b"{}"
+        self.text = self.content.decode()
+        self.closed = False
+
+    def json(self):
+        return self._payload
+
+    def iter_lines(self):
+        return iter(self._lines)
+
+    def close(self):
+        self.closed = True
+
+
+def completion(content, prompt_tokens=10, completion_tokens=5):
+    return FakeResponse(payload={
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens}
+    })
+
+
+def streamed(*deltas):
+    lines = [b"data: " + json.dumps({"choices": [{"delta": {"content": delta}}]}).encode() for delta in deltas]
+    return FakeResponse(lines=lines + [b"data: [DONE]"])
+
+
+def default_content(messages):
+    """Valid output for the engine's prompts, keyed off the system prompt."""
+    system_prompt = messages[0]["content"]
+    if "intent detector" in system_prompt:
+        return "greeting"
+    if "emotion and sentiment detector" in system_prompt:
+        return '{"emotion": "happy", "sentiment": "positive"}'
+    return REPLY
+
+
+class FakeHTTP:
+    """PooledHTTPClient stand-in: `respond(payload)` returns a FakeResponse or raises.
+
+    Every request is recorded as (payload, timeout); `delay` seconds are slept per request.
+    """
+
+    timeout = (3.05, 30)
+
+    def __init__(self, respond=None, delay=0.0):
+        self.respond = respond or self.default
+        self.delay = delay
+        self.requests = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default(payload):
+        content = default_content(payload["messages"])
+        if payload.get("stream"):
+            return streamed(*content.split(" "))
+        return completion(content)
+
+    def post(self, url, headers=None, json=None, timeout=None, **kwargs):
+        with self._lock:
+            self.requests.append((json, timeout))
+        if self.delay:
+            time.sleep(self.delay)
+        return self.respond(json)
+
+    def stats(self):
+        return {"requests": len(self.requests)}
+
+
+def make_engine(http=None, **kwargs):
+    """NLPEngine on a FakeHTTP with its own circuit breaker and (unless given) no label cache."""
+    kwargs.setdefault("circuit_breaker", CircuitBreaker())
+    kwargs.setdefault("classification_cache", False)
+    return NLPEngine(http_client=http or FakeHTTP(), api_url="http://upstream.test/chat/completions", **kwargs)
+
+
+class FakeAsyncHTTP(FakeHTTP):
+    """AsyncHTTPClient stand-in over the same `respond(payload)` callback."""
+
+    async def post(self, url, headers=None, json=None, timeout=None):
+        return super().post(url, headers=headers, json=json, timeout=timeout)
+
+    @asynccontextmanager
+    async def stream(self, url, headers=None, json=None, timeout=None):
+        yield FakeAsyncStream(super().post(url, headers=headers, json=json, timeout=timeout))
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncStream:
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    async def read(self):
+        return self._response
+
+    async def lines(self):
+        for line in self._response.iter_lines():
+            yield line
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from memory_manager import MemoryManager
+from nlp_engine.async_engine import AsyncNLPEngine
+from nlp_engine.retry import CircuitBreaker, RetryPolicy, remaining_time
+
+from fakes import FakeAsyncHTTP, FakeResponse, streamed
+
+ANALYSIS = {"intent": "greeting", "emotion": "happy", "sentiment": "positive", "context": ""}
+
+
+def make_async_engine(http=None, **kwargs):
+    kwargs.setdefault("circuit_breaker", CircuitBreaker())
+    kwargs.setdefault("classification_cache", False)
+    return AsyncNLPEngine(http_client=http or FakeAsyncHTTP(), api_url="http://upstream.test/chat/completions",
+                          **kwargs)
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_reply_stream_retries_until_first_token():
+    replies = iter([FakeResponse(503), streamed("a", "b")])
+    http = FakeAsyncHTTP(lambda payload: next(replies))
+    engine = make_async_engine(http, retry_policy=RetryPolicy(base_delay=0.01, max_delay=0.01))
+    assert asyncio.run(collect(engine.generate_reply_stream("hi", ANALYSIS))) == ["a", "b"]
+    assert len(http.requests) == 2
+
+
+def test_reply_stream_deadline_does_not_leak_to_consumer():
+    engine = make_async_engine(FakeAsyncHTTP(lambda payload: streamed("a", "b")))
+
+    async def consume():
+        seen = []
+        async for chunk in engine.generate_reply_stream("hi", ANALYSIS):
+            seen.append(remaining_time())
+        return seen
+
+    assert asyncio.run(consume()) == [None, None]
+    # ... while each upstream attempt was bounded by it
+    assert all(timeout[1] <= engine.retry_policy.turn_deadline for _, timeout in engine.http.requests)
+
+
+def test_analyze_stream_saves_turn_under_session():
+    engine = make_async_engine()
+    memory = MemoryManager()
+
+    async def turn():
+        analysis, chunks = await engine.analyze_stream("userA secret", memory, session_id="a")
+        return analysis, "".join(await collect(chunks))
+
+    analysis, reply = asyncio.run(turn())
+    assert analysis["intent"] == "greeting"
+    assert reply and reply == analysis["response"]
+    assert "userA secret" in memory.get_context_text("a")
+    assert memory.get_context_text() == ""
+
+
+def test_async_client_against_mock_server():
+    pytest.importorskip("aiohttp")
+    from mock_groq_server import MockGroqServer
+    server = MockGroqServer().start()
+
+    async def run():
+        engine = AsyncNLPEngine(api_url=server.url, circuit_breaker=CircuitBreaker(), classification_cache=False)
+        try:
+            result = await engine.analyze("I got the job!")
+            streamed_reply = "".join(await collect(engine.generate_reply_stream("I got the job!", ANALYSIS)))
+            return result, streamed_reply, engine.http.stats()
+        finally:
+            await engine.aclose()
+
+    try:
+        result, streamed_reply, stats = asyncio.run(run())
+    finally:
+        server.stop()
+    assert result["response"] and not result["response"].startswith("[Groq Error]")
+    assert streamed_reply
+    assert stats["requests"] == server.stats()["requests"]
+    assert server.stats()["streamed"] == 1
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from nlp_engine.batcher import MicroBatcher, parse_batch_reply
+from nlp_engine.retry import turn_deadline
+
+from fakes import FakeHTTP, FakeResponse, completion, default_content, make_engine
+
+
+def test_parse_batch_reply_leaves_unparsed_items_empty():
+    reply = "1: question\n[3]) greeting\n7: request\n1: request\nnot a numbered line"
+    assert parse_batch_reply("intent", reply, 3) == ["question", None, "greeting"]
+    emotions = parse_batch_reply("emotion", '2: {"emotion": "sad", "sentiment": "negative"}\n1: ???', 2)
+    assert emotions[0] is None
+    assert emotions[1]["emotion"] == "sad"
+
+
+def test_unparsed_batch_items_fall_back_to_single_calls():
+    def respond(payload):
+        messages = payload["messages"]
+        if "numbered messages" in messages[0]["content"]:
+            # The model skipped the second item
+            return completion("1: question\n3: request")
+        return completion(default_content(messages))
+
+    http = FakeHTTP(respond)
+    engine = make_engine(http)
+    assert engine._classify_batch("intent", ["how?", "hi", "do it"]) == ["question", "greeting", "request"]
+    assert len(http.requests) == 2
+    assert http.requests[1][0]["messages"][-1]["content"].endswith("hi")
+    assert engine.metrics.get("batch_intent_fallbacks") == 1
+
+
+def test_failed_batch_call_falls_back_for_every_item():
+    def respond(payload):
+        if "numbered messages" in payload["messages"][0]["content"]:
+            raise ConnectionError("reset by peer")
+        return completion(default_content(payload["messages"]))
+
+    engine = make_engine(FakeHTTP(respond))
+    assert engine._classify_batch("intent", ["a", "b"]) == ["greeting", "greeting"]
+    assert engine.metrics.get("batch_intent_fallbacks") == 2
+
+
+def test_batcher_groups_concurrent_items():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(items) or [item.upper() for item in items],
+                           window=0.2, max_batch=8)
+    futures = [batcher.submit(text) for text in ("a", "b", "c")]
+    assert [future.result(timeout=5) for future in futures] == ["A", "B", "C"]
+    assert batches == [["a", "b", "c"]]
+
+
+def test_batch_error_fails_every_caller():
+    def run_batch(items):
+        raise RuntimeError("upstream down")
+
+    batcher = MicroBatcher(run_batch, window=0.05)
+    futures = [batcher.submit(text) for text in ("a", "b")]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+
+def test_batched_call_keeps_the_turn_deadline():
+    http = FakeHTTP(lambda payload: FakeResponse(503), delay=0.05)
+    engine = make_engine(http, batch_classification=True, batch_window=0.01)
+    start = time.monotonic()
+    with turn_deadline(0.3):
+        assert engine.detect_intent("hi") == "unknown"
+    assert time.monotonic() - start < 1.0
+    # The batch's upstream attempts were bounded by the caller's deadline, not the default timeouts
+    assert http.requests and all(timeout is not None and timeout[1] <= 0.3 for _, timeout in http.requests)
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from nlp_engine.hedging import Hedger
+
+from fakes import FakeHTTP, make_engine
+
+
+def test_fast_call_is_not_hedged():
+    hedger = Hedger()
+    assert hedger.run(lambda cancelled, backup: "primary", delay=1.0) == "primary"
+    assert hedger.stats()["fired"] == 0
+
+
+def test_backup_wins_and_cancels_slow_primary():
+    hedger = Hedger()
+    events = {}
+    primary_done = threading.Event()
+
+    def call(cancelled, backup):
+        events[backup] = cancelled
+        if backup:
+            return "backup"
+        cancelled.wait(5)
+        primary_done.set()
+        return "primary"
+
+    start = time.monotonic()
+    assert hedger.run(call, delay=0.05) == "backup"
+    assert time.monotonic() - start < 1.0
+    # The loser was told to give up
+    assert events[False].is_set() and not events[True].is_set()
+    assert primary_done.wait(5)
+    stats = hedger.stats()
+    assert stats["fired"] == stats["wins"] == 1
+
+
+def test_bad_backup_waits_for_primary():
+    hedger = Hedger()
+
+    def call(cancelled, backup):
+        if backup:
+            return ""
+        time.sleep(0.1)
+        return "primary"
+
+    assert hedger.run(call, delay=0.02) == "primary"
+    assert hedger.stats()["wins"] == 0
+
+
+def test_skipped_hedge_is_counted():
+    hedger = Hedger()
+
+    def call(cancelled, backup):
+        assert not backup
+        time.sleep(0.05)
+        return "primary"
+
+    assert hedger.run(call, delay=0.01, may_hedge=lambda: "rate_limit") == "primary"
+    assert hedger.stats()["skipped"] == {"rate_limit": 1}
+
+
+def test_saturated_pool_does_not_hedge_everything():
+    hedger = Hedger(workers=4)
+    calls = []
+    lock = threading.Lock()
+
+    def call(cancelled, backup):
+        with lock:
+            calls.append(backup)
+        time.sleep(0.2)
+        return "done"
+
+    threads = [threading.Thread(target=hedger.run, args=(call, 0.05)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    # Calls beyond the pool ran on their own threads; nothing queued long enough to look slow
+    assert len(calls) == 8
+    stats = hedger.stats()
+    assert stats["calls"] == 8 and stats["fired"] == 0
+    assert stats["skipped"] == {"no_worker": 8}
+
+
+def test_cancelled_loser_sends_no_more_requests():
+    http = FakeHTTP()
+    engine = make_engine(http)
+    cancelled = threading.Event()
+    cancelled.set()
+    result = engine._request_completion([{"role": "user", "content": "hi"}], 10, 0.7, cancelled=cancelled)
+    assert result.startswith("[Groq Error]")
+    assert not http.requests
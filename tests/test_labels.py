@@ -0,0 +1,20 @@
+from nlp_engine.config import EMOTION_LABELS, EMOTION_SYNONYMS, SUPPORTED_INTENTS
+from nlp_engine.labels import normalize_label, parse_emotion_reply
+
+
+def test_single_label_in_prose_is_repaired():
+    assert normalize_label("Sad", EMOTION_LABELS) == ("sad", False)
+    assert normalize_label("very Sad.", EMOTION_LABELS) == ("sad", True)
+    assert normalize_label("I'd say they are heartbroken", EMOTION_LABELS, EMOTION_SYNONYMS) == ("sad", True)
+    assert normalize_label("get weather", SUPPORTED_INTENTS) == ("get_weather", True)
+
+
+def test_negated_or_ambiguous_answer_is_not_repaired():
+    for answer in ("not happy", "neither sad nor angry", "isn't happy", "sad or angry", "happy, not sad"):
+        assert normalize_label(answer, EMOTION_LABELS, EMOTION_SYNONYMS) == (None, False), answer
+    # A label and its own synonym still name one label
+    assert normalize_label("sad, heartbroken", EMOTION_LABELS, EMOTION_SYNONYMS) == ("sad", True)
+
+
+def test_negated_emotion_reply_is_rejected():
+    assert parse_emotion_reply("emotion: not happy, sentiment: negative") == (None, False)
@@ -0,0 +1,41 @@
+from nlp_engine.classification_cache import ClassificationCache
+
+from fakes import FakeHTTP, make_engine
+
+
+class FakeLocalTier:
+    def __init__(self, intent=None, emotion=None):
+        self.intent = intent
+        self.emotion = emotion
+
+    def predict_intent(self, text):
+        return self.intent
+
+    def predict_emotion(self, text):
+        return dict(self.emotion) if self.emotion else None
+
+
+def test_cache_hits_are_not_counted_as_local_turns():
+    http = FakeHTTP()
+    engine = make_engine(http, classification_cache=ClassificationCache(),
+                         local_classifier=FakeLocalTier(intent="greeting"))
+    engine.classify("hello there")
+    engine.classify("hello there")
+
+    # The first turn needed the LLM for emotion; the second got it from the cache
+    assert len(http.requests) == 1
+    assert engine.metrics.get("turns_served_locally") == 0
+    assert engine.metrics.get("turns_served_from_cache") == 1
+    tier = engine.get_stats()["local_classifier"]
+    assert tier["turn_local_fraction"] == 0.0
+    assert tier["turn_cache_fraction"] == 0.5
+
+
+def test_turn_is_local_when_local_tier_gives_both_labels():
+    http = FakeHTTP()
+    engine = make_engine(http, local_classifier=FakeLocalTier("greeting", {"emotion": "happy",
+                                                                           "sentiment": "positive"}))
+    assert engine.classify("hello there")["emotion"] == "happy"
+    assert not http.requests
+    assert engine.metrics.get("turns_served_locally") == 1
+    assert engine.metrics.get("turns_served_from_cache") == 0
@@ -0,0 +1,37 @@
+import time
+
+from cryptography.fernet import Fernet
+
+from memory_manager import MemoryManager
+from memory_recall import RecallIndex
+from memory_store import SQLiteMemoryStore
+
+
+def test_recalls_turn_beyond_recent_window():
+    memory = MemoryManager(max_turns=2, recall=RecallIndex(dim=2 ** 12))
+    memory.add_memory("my dog biscuit is sick", "I'm sorry to hear that.", "a")
+    for i in range(3):
+        memory.add_memory(f"filler message {i}", "ok", "a")
+    assert memory.recall_turns("a", "how is biscuit the dog") == [("my dog biscuit is sick", "I'm sorry to hear that.")]
+    assert memory.recall_turns("b", "how is biscuit the dog") == []
+
+
+def test_reload_does_not_recount_document_frequencies(tmp_path):
+    recall = RecallIndex(dim=2 ** 12)
+    memory = MemoryManager(key=Fernet.generate_key(), store=SQLiteMemoryStore(str(tmp_path / "memory.db")),
+                           recall=recall, session_ttl=0.05)
+    try:
+        for i in range(4):
+            memory.add_memory(f"message about topic {i}", "ok", "a")
+        docs, doc_freq = recall.vectorizer.docs, recall.vectorizer.doc_freq.copy()
+
+        time.sleep(0.1)
+        memory.get_context_text("b")
+        assert "a" not in memory.sessions
+        memory.store.flush()
+        assert "topic 3" in memory.get_context_text("a")
+        assert recall.stats()["turns"] == 4
+        assert recall.vectorizer.docs == docs
+        assert (recall.vectorizer.doc_freq == doc_freq).all()
+    finally:
+        memory.close()
@@ -0,0 +1,173 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+from cryptography.fernet import Fernet
+
+from memory_manager import MemoryManager
+from memory_store import SQLiteMemoryStore
+
+CORE_BRAIN_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Core_Brain'))
+
+
+def test_turns_survive_a_crash(tmp_path):
+    path, key = str(tmp_path / "memory.db"), Fernet.generate_key()
+    # The child queues turns, waits for the writer to commit them, then dies without close()
+    script = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {CORE_BRAIN_DIR!r})
+        from memory_manager import MemoryManager
+        from memory_store import SQLiteMemoryStore
+        memory = MemoryManager(key={key!r}, store=SQLiteMemoryStore({path!r}), max_turns=2)
+        for i in range(4):
+            memory.add_memory(f"question {{i}}", f"answer {{i}}", "a")
+        memory.add_memory("other question", "other answer", "b")
+        memory.store.flush()
+        os._exit(1)
+    """)
+    assert subprocess.run([sys.executable, "-c", script]).returncode == 1
+
+    memory = MemoryManager(key=key, store=SQLiteMemoryStore(path), max_turns=2)
+    try:
+        context = memory.get_context_text("a")
+        assert "question 3" in context and "question 2" in context
+        # Turns that left the window were folded into the stored summary
+        assert "question 0" in memory.get_summary("a")
+        assert "other question" in memory.get_context_text("b")
+    finally:
+        memory.close()
+
+
+def test_corrupt_file_is_moved_aside(tmp_path):
+    path = tmp_path / "memory.db"
+    path.write_bytes(b"not a database" * 100)
+    store = SQLiteMemoryStore(str(path))
+    try:
+        assert store.recovered
+        assert [p.name for p in tmp_path.iterdir() if ".corrupt-" in p.name]
+        assert store.load("a", 5) == ([], None)
+    finally:
+        store.close()
+
+
+def test_load_waits_only_for_its_own_session(tmp_path):
+    key = Fernet.generate_key()
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), flush_interval=0.5, load_wait=2.0)
+    memory = MemoryManager(key=key, store=store)
+    try:
+        memory.add_memory("hello", "hi", "b")
+        start = time.monotonic()
+        assert store.load("a", 5) == ([], None)
+        assert time.monotonic() - start < 0.3
+        rows, _ = store.load("b", 5)
+        assert len(rows) == 1
+        assert store.stale_loads == 0
+    finally:
+        memory.close()
+
+
+def test_load_wait_is_bounded(tmp_path):
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), flush_interval=2.0, load_wait=0.1)
+    memory = MemoryManager(key=Fernet.generate_key(), store=store)
+    try:
+        memory.add_memory("hello", "hi", "b")
+        start = time.monotonic()
+        store.load("b", 5)
+        assert time.monotonic() - start < 1.0
+        assert store.stale_loads == 1
+    finally:
+        memory.close()
+
+
+class BlockingStore:
+    """A store whose load() of session "slow" blocks until `release` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.loading = threading.Event()
+
+    def load(self, session_id, max_turns):
+        if session_id == "slow":
+            self.loading.set()
+            self.release.wait(5)
+        return [], None
+
+    def write(self, ops):
+        pass
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def test_slow_load_does_not_block_other_sessions():
+    store = BlockingStore()
+    memory = MemoryManager(key=Fernet.generate_key(), store=store)
+    slow = [threading.Thread(target=memory.add_memory, args=("hi", "hello", "slow")) for _ in range(2)]
+    for thread in slow:
+        thread.start()
+    try:
+        assert store.loading.wait(5)
+        start = time.monotonic()
+        memory.add_memory("hi", "hello", "fast")
+        assert "hi" in memory.get_context_text("fast")
+        assert time.monotonic() - start < 1.0
+    finally:
+        store.release.set()
+        for thread in slow:
+            thread.join(5)
+    assert memory.get_context_text("slow").count("User: hi") == 2
+
+
+class ClearableBlockingStore(BlockingStore):
+    """BlockingStore holding stored turns for every session until a clear is written."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+
+    def load(self, session_id, max_turns):
+        # Read before blocking, like a load that raced a clear still in the write queue
+        rows = list(self.rows)
+        super().load(session_id, max_turns)
+        return rows, None
+
+    def write(self, ops):
+        if any(op[0] == "clear" for op in ops):
+            self.rows = []
+
+
+def test_clear_during_load_is_not_undone():
+    store = ClearableBlockingStore()
+    memory = MemoryManager(key=Fernet.generate_key(), store=store)
+    store.rows = [(memory._encrypt("old question"), memory._encrypt("old answer"), time.time())]
+    loading = threading.Thread(target=memory.get_context_text, args=("slow",))
+    loading.start()
+    try:
+        assert store.loading.wait(5)
+        memory.clear_memory("slow")
+    finally:
+        store.release.set()
+        loading.join(5)
+    assert "old question" not in memory.get_context_text("slow")
+
+
+def test_writer_survives_a_unit_it_cannot_apply(tmp_path):
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"))
+    memory = MemoryManager(key=Fernet.generate_key(), store=store)
+    try:
+        store.write([("turn", "a", None)])
+        memory.add_memory("hello", "hi", "a")
+        assert store.flush(timeout=5)
+        memory.add_memory("still there?", "yes", "a")
+        assert store.flush(timeout=5)
+        rows, _ = store.load("a", 5)
+        assert len(rows) == 2
+        assert store.stats()["dropped"] == 1
+    finally:
+        memory.close()
@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from memory_manager import MemoryManager
+
+from fakes import FakeHTTP
+
+ZEN_FLASK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'zen_flask'))
+TURN_DEADLINE = 0.5
+CLASSIFY_DELAY = 0.15
+
+
+@pytest.fixture
+def personality(monkeypatch):
+    monkeypatch.syspath_prepend(ZEN_FLASK_DIR)
+    from ai_integration.nlp_engine.nlp_engine import NLPEngine
+    from ai_integration.nlp_engine.retry import CircuitBreaker, RetryPolicy, remaining_time
+    from ai_integration.personalities.EchoPersonality import EchoPersonality
+
+    def respond(payload):
+        system_prompt = payload["messages"][0]["content"]
+        if "detector" in system_prompt:
+            time.sleep(CLASSIFY_DELAY)
+        return FakeHTTP.default(payload)
+
+    http = FakeHTTP(respond)
+    nlp = NLPEngine(http_client=http, api_url="http://upstream.test/chat/completions",
+                    circuit_breaker=CircuitBreaker(), classification_cache=False,
+                    retry_policy=RetryPolicy(turn_deadline=TURN_DEADLINE))
+    return EchoPersonality(nlp=nlp), http, remaining_time
+
+
+def reply_timeout(http):
+    return [timeout for payload, timeout in http.requests if "detector" not in payload["messages"][0]["content"]][-1]
+
+
+def test_reply_gets_what_is_left_of_the_turn(personality):
+    echo, http, _ = personality
+    assert echo.respond("hello", MemoryManager(), session_id="a")
+    # One deadline for the turn: classification already used part of it
+    assert reply_timeout(http)[1] <= TURN_DEADLINE - CLASSIFY_DELAY + 0.05
+
+
+def test_streamed_reply_gets_what_is_left_of_the_turn(personality):
+    echo, http, remaining_time = personality
+    memory = MemoryManager()
+    chunks = echo.respond_stream("hello", memory, session_id="a")
+    assert next(chunks)
+    assert remaining_time() is None
+    "".join(chunks)
+    assert reply_timeout(http)[1] <= TURN_DEADLINE - CLASSIFY_DELAY + 0.05
+    assert "hello" in memory.get_context_text("a")
+
+
+def test_analyze_stream_shares_one_deadline(personality):
+    echo, http, _ = personality
+    analysis, chunks = echo.nlp.analyze_stream("hello", MemoryManager(), session_id="a")
+    "".join(chunks)
+    assert reply_timeout(http)[1] <= TURN_DEADLINE - CLASSIFY_DELAY + 0.05
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from nlp_engine.personality_router import PersonalityRouter
+
+SPECS = {"echo": "unused:Echo", "Suzi": "unused:Suzi"}
+
+
+def test_session_choices_are_bounded_lru():
+    router = PersonalityRouter(personalities=SPECS, session_limit=2)
+    router.set_personality("Suzi", session_id="a")
+    router.set_personality("Suzi", session_id="b")
+    assert router.personality_for("a") == "Suzi"
+    router.set_personality("Suzi", session_id="c")
+    # "b" was used least recently
+    assert router.personality_for("b") == "echo"
+    assert router.personality_for("a") == router.personality_for("c") == "Suzi"
+    assert len(router._sessions) == 2
+
+
+def test_idle_session_choice_expires():
+    router = PersonalityRouter(personalities=SPECS, session_ttl=0.05)
+    router.set_personality("Suzi", session_id="a")
+    time.sleep(0.1)
+    assert router.personality_for("a") == "echo"
+    assert not router._sessions
+
+
+def test_choosing_the_default_keeps_no_entry():
+    router = PersonalityRouter(personalities=SPECS)
+    router.set_personality("Suzi", session_id="a")
+    router.set_personality("echo", session_id="a")
+    assert router.personality_for("a") == "echo"
+    assert not router._sessions
+
+
+def test_session_choice_does_not_touch_sessionless_calls():
+    router = PersonalityRouter(personalities=SPECS)
+    router.set_personality("Suzi", session_id="a")
+    assert router.personality_for() == "echo"
+
+
+def test_slow_personality_import_blocks_only_its_own_callers(tmp_path, monkeypatch):
+    (tmp_path / "slow_persona.py").write_text(
+        "import time\ntime.sleep(0.5)\n\nclass Slow:\n    def __init__(self, nlp=None):\n        self.nlp = nlp\n")
+    # A plugin whose constructor takes no engine
+    (tmp_path / "plain_persona.py").write_text("class Plain:\n    def __init__(self):\n        pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    router = PersonalityRouter(nlp="engine", personalities={
+        "echo": "plain_persona:Plain", "slow": "slow_persona:Slow"})
+
+    loading = threading.Thread(target=router.get_personality, args=("slow",))
+    loading.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    router.set_personality("slow", session_id="a")
+    assert router.personality_for("b") == "echo"
+    assert type(router.get_personality("echo")).__name__ == "Plain"
+    assert time.monotonic() - start < 0.3
+    loading.join(5)
+    assert router.get_personality("slow").nlp == "engine"
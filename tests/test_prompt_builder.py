@@ -0,0 +1,62 @@
+from nlp_engine.prompt_builder import PromptBuilder, turn_labels
+
+
+def system_prompt(messages):
+    return messages[0]["content"]
+
+
+def test_label_lines_survive_matching_input():
+    builder = PromptBuilder()
+    for user_input, line in (("sad", "User's emotion: sad"), ("negative", "Sentiment: negative"),
+                             ("question", "User's intent: question")):
+        messages = builder.build("You are Echo.", user_input,
+                                 turn_prompt=turn_labels("question", "sad", "negative"))
+        assert line in system_prompt(messages)
+
+
+def test_prefix_lines_other_than_echoed_input_are_kept():
+    messages = PromptBuilder().build("You are Echo.\nMood: sad", "sad")
+    assert "Mood: sad" in system_prompt(messages)
+
+
+def test_echoed_input_line_is_dropped():
+    builder = PromptBuilder()
+    prompt = "You are Echo.\nUser's emotion: sad\nUser said: I feel  low"
+    messages = builder.build(prompt, "I feel low")
+    assert "User said" not in system_prompt(messages)
+    assert "User's emotion: sad" in system_prompt(messages)
+    assert "User's message: hi" not in system_prompt(builder.build("You are Echo.\nUser's message: hi", "hi"))
+
+
+def test_context_trimmed_to_budget_newest_first():
+    context = "\n".join(f"User: message {i}\nEcho: reply {i}" for i in range(50))
+    messages = PromptBuilder(budget=80).build("You are Echo.", "hi", context)
+    prompt = system_prompt(messages)
+    assert "message 49" in prompt
+    assert "message 0\n" not in prompt
+
+
+def test_recalled_turns_and_summary_share_a_tight_budget():
+    from memory_manager import MemoryManager
+    from memory_recall import RecallIndex
+
+    memory = MemoryManager(max_turns=2, recall=RecallIndex(dim=2 ** 12))
+    memory.add_memory("my dog biscuit is sick", "I'm sorry to hear that.")
+    for i in range(4):
+        memory.add_memory(f"filler message number {i}", f"filler reply {i}")
+    context = memory.get_context_text(query="is biscuit the dog better")
+    assert context.startswith("Earlier in this conversation:")
+    assert "Relevant earlier turns:\n  User: my dog biscuit is sick" in context
+
+    recalled = "Relevant earlier turns:\n  User: my dog biscuit is sick\n  Echo: I'm sorry to hear that."
+    builder = PromptBuilder()
+    for budget in range(80, 200, 5):
+        prompt = system_prompt(builder.build("You are Echo.", "is biscuit the dog better", context, budget=budget))
+        assert "filler message number 3" in prompt
+        # The header is kept or dropped together with its turns
+        assert ("Relevant earlier turns:" in prompt) == (recalled in prompt)
+        # Whichever of summary and recalled turns fits is kept ahead of older recent turns
+        assert "Earlier in this conversation:" in prompt or recalled in prompt
+        if "Earlier in this conversation:" in prompt and recalled in prompt:
+            assert prompt.index("Earlier in this conversation:") < prompt.index(recalled)
+    assert recalled in prompt and "Earlier in this conversation:" in prompt
@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+import time
+
+from fakes import FakeHTTP, REPLY, completion, make_engine
+from nlp_engine.rate_limiter import PRIORITY_CLASSIFICATION, PRIORITY_REPLY, MemoryBucketStore, RateLimiter
+
+
+def drain(limiter):
+    while limiter.try_acquire(1):
+        pass
+
+
+def wait_for_waiters(limiter, count):
+    deadline = time.monotonic() + 5
+    while len(limiter._waiters) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_queued_reply_goes_before_earlier_classification():
+    # 600 rpm refills one request every 0.1s
+    limiter = RateLimiter(rpm=600, tpm=10 ** 9, background_reserve=0.0)
+    drain(limiter)
+    granted = []
+
+    def acquire(name, priority):
+        assert limiter.acquire(1, priority, timeout=5)
+        granted.append(name)
+
+    classification = threading.Thread(target=acquire, args=("classification", PRIORITY_CLASSIFICATION))
+    classification.start()
+    wait_for_waiters(limiter, 1)
+    reply = threading.Thread(target=acquire, args=("reply", PRIORITY_REPLY))
+    reply.start()
+    classification.join(5)
+    reply.join(5)
+    assert granted == ["reply", "classification"]
+
+
+def test_nobody_jumps_the_queue():
+    limiter = RateLimiter(rpm=60, tpm=10 ** 9, background_reserve=0.0)
+    drain(limiter)
+    waiter = threading.Thread(target=limiter.acquire, args=(1, PRIORITY_REPLY, 0.2))
+    waiter.start()
+    wait_for_waiters(limiter, 1)
+    assert not limiter.try_acquire(1, PRIORITY_CLASSIFICATION)
+    waiter.join(5)
+
+
+def test_classification_leaves_reserve_for_replies():
+    limiter = RateLimiter(rpm=10, tpm=10 ** 9, background_reserve=0.3)
+    classified = 0
+    while limiter.try_acquire(1, PRIORITY_CLASSIFICATION):
+        classified += 1
+    assert classified == 7
+    assert limiter.try_acquire(1, PRIORITY_REPLY)
+
+
+def test_acquire_times_out():
+    limiter = RateLimiter(rpm=1, tpm=10 ** 9)
+    drain(limiter)
+    start = time.monotonic()
+    assert not limiter.acquire(1, PRIORITY_REPLY, timeout=0.1)
+    assert time.monotonic() - start < 1.0
+    assert limiter.timeouts == 1
+
+
+class WriteFailingStore(MemoryBucketStore):
+    """Grants every take but fails the bookkeeping writes, like a locked shared database."""
+
+    def adjust(self, name, delta, capacity, now=None):
+        raise sqlite3.OperationalError("database is locked")
+
+    def clamp(self, name, maximum, capacity, now=None):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_store_fault_after_a_good_response_is_not_retried():
+    def respond(payload):
+        response = completion(REPLY, prompt_tokens=1, completion_tokens=1)
+        response.headers = {"x-ratelimit-remaining-requests": "5", "x-ratelimit-remaining-tokens": "100"}
+        return response
+
+    http = FakeHTTP(respond)
+    engine = make_engine(http, rate_limiter=RateLimiter(store=WriteFailingStore()))
+    assert engine.call_groq_model([{"role": "user", "content": "hi"}]) == REPLY
+    assert len(http.requests) == 1
@@ -0,0 +1,101 @@
+import time
+
+from nlp_engine.retry import CircuitBreaker, RetryPolicy, remaining_time, stream_within_deadline, turn_deadline
+
+from fakes import FakeHTTP, FakeResponse, make_engine, streamed
+
+ANALYSIS = {"intent": "greeting", "emotion": "happy", "sentiment": "positive", "context": ""}
+
+
+def test_server_hint_within_max_delay_is_used():
+    policy = RetryPolicy(max_delay=8.0)
+    assert policy.delay_for(0, FakeResponse(429, headers={"retry-after": "2"})) == 2.0
+
+
+def test_server_hint_past_max_delay_gives_up():
+    policy = RetryPolicy(max_delay=8.0)
+    assert policy.delay_for(0, FakeResponse(429, headers={"retry-after": "120"})) is None
+    exhausted = {"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "2m59.5s"}
+    assert policy.delay_for(0, FakeResponse(429, headers=exhausted)) is None
+
+
+def test_stream_does_not_sleep_through_long_retry_after():
+    http = FakeHTTP(lambda payload: FakeResponse(429, headers={"retry-after": "120"}))
+    engine = make_engine(http)
+
+    start = time.monotonic()
+    assert list(engine.generate_reply_stream("hi", ANALYSIS)) == []
+    assert time.monotonic() - start < 1.0
+    assert len(http.requests) == 1
+    assert engine.metrics.get("retry_after_too_long") == 1
+
+
+def test_stream_retries_bounded_by_turn_deadline():
+    def fail(payload):
+        raise ConnectionError("reset by peer")
+
+    http = FakeHTTP(fail, delay=0.1)
+    engine = make_engine(http, retry_policy=RetryPolicy(max_attempts=20, base_delay=0.01, max_delay=0.01,
+                                                        turn_deadline=0.25))
+    start = time.monotonic()
+    assert list(engine.generate_reply_stream("hi", ANALYSIS)) == []
+    assert time.monotonic() - start < 0.5
+    assert len(http.requests) <= 3
+    # Each attempt's read timeout was cut to what was left of the deadline
+    assert all(timeout[1] <= 0.25 for _, timeout in http.requests)
+
+
+def test_stream_deadline_does_not_leak_to_consumer():
+    engine = make_engine(FakeHTTP(lambda payload: streamed("a", "b", "c")))
+    chunks = engine.generate_reply_stream("hi", ANALYSIS)
+    assert next(chunks) == "a"
+    assert remaining_time() is None
+    assert list(chunks) == ["b", "c"]
+
+
+def test_stream_keeps_enclosing_deadline():
+    seen = []
+
+    def chunks():
+        seen.append(remaining_time())
+        yield "x"
+
+    with turn_deadline(0.5):
+        stream = stream_within_deadline(chunks(), 30)
+    assert list(stream) == ["x"]
+    assert seen[0] <= 0.5
+
+
+def test_breaker_opens_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.rejected == 1
+
+
+def test_breaker_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_breaker_released_probe_can_be_retaken():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    # The probe's caller was cancelled before an outcome: the next caller probes instead
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
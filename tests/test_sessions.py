@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+from memory_manager import MemoryManager
+
+from fakes import FakeHTTP, make_engine
+
+ZEN_FLASK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'zen_flask'))
+
+
+def reply_prompts(http):
+    """System prompts of the reply calls made so far, in order."""
+    return [payload["messages"][0]["content"] for payload, _ in http.requests
+            if "detector" not in payload["messages"][0]["content"]]
+
+
+def test_analyze_keeps_sessions_apart():
+    http = FakeHTTP()
+    engine = make_engine(http)
+    memory = MemoryManager()
+
+    engine.analyze("userA secret", memory, session_id="a")
+    engine.analyze("hello", memory, session_id="b")
+
+    assert "userA secret" in memory.get_context_text("a")
+    assert "userA secret" not in memory.get_context_text("b")
+    assert "userA secret" not in reply_prompts(http)[-1]
+    assert memory.get_context_text() == ""
+
+
+def test_analyze_stream_saves_under_session():
+    engine = make_engine()
+    memory = MemoryManager()
+    analysis, chunks = engine.analyze_stream("userA secret", memory, session_id="a")
+    "".join(chunks)
+    assert "userA secret" in memory.get_context_text("a")
+    assert memory.get_context_text() == ""
+
+
+@pytest.fixture
+def zen_flask_path(monkeypatch):
+    monkeypatch.syspath_prepend(ZEN_FLASK_DIR)
+    monkeypatch.setenv("WARM_UP_COMPONENTS", "")
+
+
+def test_router_passes_session_to_personality(zen_flask_path):
+    from ai_integration.nlp_engine.nlp_engine import NLPEngine
+    from ai_integration.nlp_engine.retry import CircuitBreaker
+    from ai_integration.personality_router import PersonalityRouter
+
+    http = FakeHTTP()
+    nlp = NLPEngine(http_client=http, api_url="http://upstream.test/chat/completions",
+                    circuit_breaker=CircuitBreaker(), classification_cache=False)
+    router = PersonalityRouter(nlp=nlp)
+    memory = MemoryManager()
+
+    router.get_response("userA secret", memory, session_id="a")
+    "".join(router.get_response_stream("hello", memory, session_id="b"))
+
+    assert "userA secret" in memory.get_context_text("a")
+    assert "userA secret" not in memory.get_context_text("b")
+    assert "hello" in memory.get_context_text("b")
+    assert "userA secret" not in reply_prompts(http)[-1]
+
+
+def test_app_rejects_malformed_session_id(zen_flask_path):
+    sys.modules.pop("app", None)
+    import app
+
+    client = app.app.test_client()
+    for route in ("/get_ai_response", "/get_ai_response/stream", "/chat"):
+        response = client.post(route, json={"message": "hi", "session_id": {"id": 1}})
+        assert response.status_code == 400
+        response = client.post(route, json={"message": "hi", "session_id": "x" * 500})
+        assert response.status_code == 400
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nlp_engine.singleflight import AsyncSingleFlight, SingleFlight
+
+from fakes import FakeHTTP, make_engine
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    start = threading.Barrier(4)
+
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        return "result"
+
+    def caller():
+        start.wait()
+        return flight.do("key", work)
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: caller(), range(4)))
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert {result for result, _ in results} == {"result"}
+    assert flight.in_flight() == 0
+    # Nothing is cached once the call is done
+    flight.do("key", work)
+    assert len(calls) == 2
+
+
+def test_error_reaches_every_caller():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def work():
+        started.set()
+        time.sleep(0.1)
+        raise ConnectionError("reset by peer")
+
+    errors = []
+
+    def caller():
+        try:
+            flight.do("key", work)
+        except ConnectionError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=caller)
+    follower.start()
+    leader.join(5)
+    follower.join(5)
+    assert len(errors) == 2
+
+
+def test_async_cancelled_caller_does_not_fail_the_others():
+    async def run():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == ("result", True)
+        assert len(calls) == 1
+        assert flight.in_flight() == 0
+
+    asyncio.run(run())
+
+
+def test_async_call_cancelled_with_its_last_caller():
+    async def run():
+        flight = AsyncSingleFlight()
+        finished = []
+
+        async def work():
+            await asyncio.sleep(0.2)
+            finished.append(1)
+
+        caller = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.3)
+        assert not finished
+        assert flight.in_flight() == 0
+
+    asyncio.run(run())
+
+
+def test_identical_deterministic_calls_are_coalesced():
+    http = FakeHTTP(delay=0.1)
+    engine = make_engine(http)
+    messages = [{"role": "system", "content": "You are an intent detector."}, {"role": "user", "content": "hi"}]
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: engine.call_groq_model(messages, max_tokens=10, temperature=0),
+                                range(4)))
+    assert results == ["greeting"] * 4
+    assert len(http.requests) == 1
+    assert engine.metrics.get("coalesced_calls") == 3
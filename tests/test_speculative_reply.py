@@ -0,0 +1,20 @@
+import threading
+
+from fakes import REPLY, FakeHTTP, make_engine
+
+
+def test_speculation_is_skipped_when_its_workers_are_busy():
+    http = FakeHTTP(delay=0.2)
+    engine = make_engine(http, speculative_reply=True, speculative_workers=1)
+    replies = []
+    threads = [threading.Thread(target=lambda: replies.append(engine.analyze("hello")["response"]))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert replies == [REPLY, REPLY]
+    counters = engine.get_stats()["counters"]
+    # One turn speculated, the other went straight to the labelled reply instead of queueing
+    assert counters.get("speculative_skipped") == 1
+    assert counters.get("speculative_hits") == 1
@@ -0,0 +1,12 @@
+# Train the local intent/emotion tier from labels logged by NLPEngine(label_log_path=...)
+#   python train_local_classifier.py --log labels.jsonl --out local_classifier.npz
+import os
+import sys
+
+# Import the engine package directly so Core_Brain/__init__ (Whisper, gTTS) isn't loaded
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Core_Brain"))
+
+from nlp_engine.local_classifier import main
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,12 @@
 from .nlp_engine import NLPEngine
+from .async_engine import AsyncNLPEngine
+from .http_client import PooledHTTPClient, get_shared_client
+from .classification_cache import ClassificationCache, SQLiteClassificationCache, normalize_key
+from .retry import RetryPolicy, CircuitBreaker, turn_deadline
+from .rate_limiter import RateLimiter, SQLiteBucketStore, PRIORITY_REPLY, PRIORITY_CLASSIFICATION
+from .batcher import MicroBatcher
+from .hedging import Hedger
+from .config import DEFAULT_MODEL, SUPPORTED_INTENTS
 
 # Package metadata
 __version__ = "1.0.0"
@@ -8,18 +16,23 @@ __description__ = "NLP Engine for intent detection and emotion analysis"
 # Export main classes/functions
 __all__ = [
     'NLPEngine',
+    'AsyncNLPEngine',
+    'PooledHTTPClient',
+    'get_shared_client',
+    'ClassificationCache',
+    'SQLiteClassificationCache',
+    'normalize_key',
+    'RetryPolicy',
+    'CircuitBreaker',
+    'turn_deadline',
+    'RateLimiter',
+    'SQLiteBucketStore',
+    'PRIORITY_REPLY',
+    'PRIORITY_CLASSIFICATION',
+    'MicroBatcher',
+    'Hedger',
 ]
 
-DEFAULT_MODEL = "llama3-8b-8192"
-SUPPORTED_INTENTS = [
-    "greeting", 
-    "question", 
-    "request", 
-    "get_weather", 
-    "emotional_support", 
-    "manipulation_check", 
-    "unknown"
-]
 
 def create_nlp_engine(model_name=None):
     """
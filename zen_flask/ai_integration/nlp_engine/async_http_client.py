@@ -0,0 +1,106 @@
+# Pooled keep-alive aiohttp client for AsyncNLPEngine (aiohttp is only needed if this is used)
+import json as jsonlib
+import logging
+from contextlib import asynccontextmanager
+
+from .config import ASYNC_HTTP_LIMIT, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+
+class AsyncResponse:
+    """The parts of a requests.Response the engine reads, for a fully read aiohttp response."""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers  # lower-cased names
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+
+class AsyncStreamResponse:
+    """A streamed aiohttp response: status and headers up front, the body line by line."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status
+        self.headers = {name.lower(): value for name, value in response.headers.items()}
+
+    async def read(self):
+        """The whole body, as an AsyncResponse (for error responses)."""
+        return AsyncResponse(self.status_code, self.headers, await self._response.read())
+
+    async def lines(self):
+        """Body lines without their line endings, as they arrive."""
+        async for line in self._response.content:
+            yield line.rstrip(b"\r\n")
+
+
+class AsyncHTTPClient:
+    """One aiohttp.ClientSession with a bounded keep-alive connection pool.
+
+    The session is opened on the first request, inside the running event
+    loop, and is tied to that loop: use one client per loop and `await
+    close()` on shutdown.
+    """
+
+    def __init__(self, limit=ASYNC_HTTP_LIMIT, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT):
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError("AsyncNLPEngine needs aiohttp (pip install aiohttp)") from e
+        self._aiohttp = aiohttp
+        self.limit = limit
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.logger = logging.getLogger(__name__)
+        self._session = None
+        self.requests = 0
+
+    @property
+    def timeout(self):
+        """(connect, read) timeout tuple, as for PooledHTTPClient."""
+        return (self.connect_timeout, self.read_timeout)
+
+    def _client_timeout(self, timeout):
+        connect, read = timeout or self.timeout
+        return self._aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = self._aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit)
+            self._session = self._aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def post(self, url, headers=None, json=None, timeout=None):
+        """POST and read the whole body; `timeout` is a (connect, read) tuple overriding the defaults."""
+        self.requests += 1
+        async with self._get_session().post(url, headers=headers, json=json,
+                                            timeout=self._client_timeout(timeout)) as response:
+            content = await response.read()
+            headers = {name.lower(): value for name, value in response.headers.items()}
+            return AsyncResponse(response.status, headers, content)
+
+    @asynccontextmanager
+    async def stream(self, url, headers=None, json=None, timeout=None):
+        """POST and yield an AsyncStreamResponse; the connection is released when the block exits."""
+        self.requests += 1
+        async with self._get_session().post(url, headers=headers, json=json,
+                                            timeout=self._client_timeout(timeout)) as response:
+            yield AsyncStreamResponse(response)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "limit": self.limit,
+            "open": self._session is not None and not self._session.closed
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
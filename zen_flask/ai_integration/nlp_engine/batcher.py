@@ -0,0 +1,140 @@
+# Micro-batching of classification calls from concurrent sessions into one numbered prompt
+import contextvars
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .config import SUPPORTED_INTENTS, EMOTION_LABELS, BATCH_WINDOW, BATCH_MAX_SIZE, BATCH_WORKERS
+from .labels import normalize_label, parse_emotion_reply
+from .retry import remaining_time
+
+_NUMBERED_LINE = re.compile(r"^\s*\[?(\d+)\]?\s*[:.)\-]\s*(.+?)\s*$")
+
+# Completion budget per item, so one batch can't be truncated mid-way
+BATCH_TOKENS_PER_ITEM = {"intent": 8, "emotion": 24}
+
+
+class MicroBatcher:
+    """Collects items for up to `window` seconds (or `max_batch` items) and runs them together.
+
+    `run_batch(items)` must return one result per item; an exception fails
+    every caller in that batch. It runs in the context of the submitter
+    whose turn deadline ends first, so the batch never outlives any caller.
+    """
+
+    def __init__(self, run_batch, window=BATCH_WINDOW, max_batch=BATCH_MAX_SIZE,
+                 workers=BATCH_WORKERS, name="batch"):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._first_at = None
+        self._thread = None
+        # Own pool: batches must not queue behind callers blocked on them in the engine pool
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-batch")
+
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self._cond:
+            self._pending.append((item, future, contextvars.copy_context()))
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                while len(self._pending) < self.max_batch:
+                    remaining = self._first_at + self.window - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+                self._first_at = time.monotonic() if self._pending else None
+                self.batches += 1
+                self.items += len(batch)
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        context = min((context for _, _, context in batch), key=_time_left)
+        try:
+            results = context.run(self.run_batch, [item for item, _, _ in batch])
+        except Exception as e:
+            self.logger.error(f"[{self.name} batch] failed: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "pending": len(self._pending),
+                "window": self.window,
+                "max_batch": self.max_batch
+            }
+
+
+def _time_left(context):
+    """Seconds left in the turn deadline active in `context` (inf when there is none)."""
+    remaining = context.run(remaining_time)
+    return float("inf") if remaining is None else remaining
+
+
+def build_batch_messages(task, texts):
+    """One prompt labelling every text, answered as `<n>: <label>` lines."""
+    if task == "intent":
+        instruction = (
+            "You are an intent detector. You will get numbered messages. For EACH message reply with one line "
+            "'<number>: <intent>' where intent is one word from: " + ", ".join(SUPPORTED_INTENTS) + ". "
+            "Reply with the numbered lines only."
+        )
+    else:
+        instruction = (
+            "You are an emotion and sentiment detector. You will get numbered messages. For EACH message reply "
+            "with one line '<number>: <json>' where json looks like {\"emotion\": \"sad\", \"sentiment\": \"negative\"}; "
+            "emotion is one of: " + ", ".join(EMOTION_LABELS) + ". Reply with the numbered lines only."
+        )
+    numbered = "\n".join(f"{i}: {' '.join(text.split())}" for i, text in enumerate(texts, start=1))
+    return [
+        {"role": "system", "content": instruction},
+        {"role": "user", "content": numbered}
+    ]
+
+
+def parse_batch_reply(task, reply, count):
+    """Per-item labels from a numbered reply; None for any item that can't be parsed."""
+    results = [None] * count
+    for line in reply.splitlines():
+        match = _NUMBERED_LINE.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        if not 0 <= index < count or results[index] is not None:
+            continue
+        value = match.group(2)
+        if task == "intent":
+            results[index] = normalize_label(value, SUPPORTED_INTENTS)[0]
+        else:
+            results[index] = parse_emotion_reply(value)[0]
+    return results
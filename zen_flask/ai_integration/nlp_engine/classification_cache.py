@@ -0,0 +1,187 @@
+# Bounded TTL cache for intent / emotion labels, optionally shared between workers via SQLite
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from .config import CLASSIFICATION_CACHE_SIZE, CLASSIFICATION_CACHE_TTL
+
+# The shared SQLite cache is trimmed to max_size once every this many writes
+SQLITE_TRIM_EVERY = 64
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize_key(text: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of a message.
+
+    "Hi!!", " hi " and "HI." all map to "hi".
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return " ".join(text.split())
+
+
+class ClassificationCache:
+    """In-process LRU cache with per-entry TTL.
+
+    Keys are (task, normalized text); values must be JSON-serialisable so the
+    same API works for the SQLite backend.
+    """
+
+    def __init__(self, max_size=CLASSIFICATION_CACHE_SIZE, ttl=CLASSIFICATION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, task, text):
+        key = (task, normalize_key(text))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, task, text, value):
+        key = (task, normalize_key(text))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SQLiteClassificationCache(ClassificationCache):
+    """Same interface, backed by a SQLite file so several worker processes share labels.
+
+    Expiry uses wall-clock time (shared between processes); the size bound is
+    enforced by periodically trimming the least recently used rows on write.
+    """
+
+    def __init__(self, path, max_size=CLASSIFICATION_CACHE_SIZE, ttl=CLASSIFICATION_CACHE_TTL):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS classification_cache ("
+                " task TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_used REAL NOT NULL,"
+                " PRIMARY KEY (task, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON classification_cache (last_used)")
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers and a writer work concurrently
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, task, text):
+        key = normalize_key(text)
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM classification_cache WHERE task = ? AND key = ?",
+                (task, key)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                conn.execute(
+                    "UPDATE classification_cache SET last_used = ? WHERE task = ? AND key = ?",
+                    (now, task, key)
+                )
+                with self._lock:
+                    self.hits += 1
+                return json.loads(row[0])
+            if row is not None:
+                conn.execute("DELETE FROM classification_cache WHERE task = ? AND key = ?", (task, key))
+                with self._lock:
+                    self.evictions += 1
+        except sqlite3.Error as e:
+            self.logger.warning(f"[Classification cache] read failed: {e}")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, task, text, value):
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO classification_cache (task, key, value, expires_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (task, normalize_key(text), json.dumps(value), now + self.ttl, now)
+            )
+            with self._lock:
+                self._writes += 1
+                trim = self._writes % SQLITE_TRIM_EVERY == 0
+            if trim:
+                self._trim(conn, now)
+        except sqlite3.Error as e:
+            self.logger.warning(f"[Classification cache] write failed: {e}")
+
+    def _trim(self, conn, now):
+        """Drop expired rows, then the least recently used beyond max_size."""
+        expired = conn.execute("DELETE FROM classification_cache WHERE expires_at <= ?", (now,)).rowcount
+        overflow = conn.execute(
+            "DELETE FROM classification_cache WHERE rowid IN ("
+            " SELECT rowid FROM classification_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,)
+        ).rowcount
+        with self._lock:
+            self.evictions += max(expired, 0) + max(overflow, 0)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM classification_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM classification_cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["backend"] = "sqlite"
+        stats["size"] = len(self)
+        stats["path"] = self.path
+        return stats
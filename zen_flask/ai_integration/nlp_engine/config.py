@@ -4,3 +4,114 @@
 # import os
 # HF_API_TOKEN = os.getenv("HF_API_TOKEN")
 
+DEFAULT_MODEL = "llama3-8b-8192"
+# OpenAI-compatible chat completions endpoint; GROQ_API_URL overrides it (e.g. a local mock)
+DEFAULT_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+SUPPORTED_INTENTS = [
+    "greeting", 
+    "question", 
+    "request", 
+    "get_weather", 
+    "emotional_support", 
+    "manipulation_check", 
+    "unknown"
+]
+
+# Labels detect_emotion may return; near misses are mapped onto them (see labels.py)
+EMOTION_LABELS = [
+    "happy", "sad", "angry", "anxious", "fearful", "frustrated", "lonely", "confused",
+    "surprised", "disgusted", "grateful", "excited", "calm", "curious", "neutral"
+]
+SENTIMENT_LABELS = ["positive", "negative", "neutral"]
+EMOTION_SYNONYMS = {
+    "joy": "happy", "joyful": "happy", "happiness": "happy", "glad": "happy", "cheerful": "happy",
+    "content": "happy", "pleased": "happy", "delighted": "happy",
+    "sadness": "sad", "unhappy": "sad", "depressed": "sad", "down": "sad", "upset": "sad",
+    "grief": "sad", "heartbroken": "sad", "disappointed": "sad",
+    "anger": "angry", "mad": "angry", "furious": "angry", "irritated": "angry",
+    "anxiety": "anxious", "worried": "anxious", "worry": "anxious", "nervous": "anxious",
+    "stressed": "anxious", "stress": "anxious", "overwhelmed": "anxious",
+    "fear": "fearful", "scared": "fearful", "afraid": "fearful", "terrified": "fearful",
+    "frustration": "frustrated", "annoyed": "frustrated",
+    "loneliness": "lonely", "isolated": "lonely",
+    "confusion": "confused", "puzzled": "confused", "unsure": "confused",
+    "surprise": "surprised", "shocked": "surprised", "amazed": "surprised",
+    "disgust": "disgusted",
+    "gratitude": "grateful", "thankful": "grateful", "appreciative": "grateful",
+    "excitement": "excited", "thrilled": "excited", "enthusiastic": "excited",
+    "relaxed": "calm", "peaceful": "calm", "serene": "calm",
+    "curiosity": "curious", "interested": "curious", "inquisitive": "curious",
+    "indifferent": "neutral", "none": "neutral",
+}
+SENTIMENT_SYNONYMS = {
+    "pos": "positive", "good": "positive",
+    "neg": "negative", "bad": "negative",
+    "neu": "neutral", "mixed": "neutral", "none": "neutral",
+}
+# Model name prefixes that accept response_format={"type": "json_object"} (Groq JSON mode)
+JSON_MODE_MODELS = ("llama", "mixtral", "gemma", "qwen", "deepseek")
+
+# HTTP connection pool used for Groq calls (shared by all engines in a process)
+HTTP_POOL_CONNECTIONS = 4      # number of per-host pools to keep
+HTTP_POOL_MAXSIZE = 16         # keep-alive connections kept per host
+HTTP_POOL_BLOCK = False        # open extra (non-pooled) connections instead of waiting
+HTTP_CONNECT_TIMEOUT = 3.05    # seconds to establish TCP+TLS
+HTTP_READ_TIMEOUT = 30         # seconds to wait for the response
+
+# AsyncNLPEngine (optional, needs aiohttp): one connection pool per event loop
+ASYNC_HTTP_LIMIT = 100         # max open connections (and so concurrent upstream calls)
+ASYNC_DISCONNECT_POLL = 0.25   # seconds between client-disconnect checks (cancel_on_disconnect)
+
+# analyze(): concurrent classification and speculative replies
+ANALYSIS_WORKERS = 8           # threads per engine for concurrent upstream calls
+SPECULATIVE_WORKERS = 2        # threads per engine for speculative replies; none free means no speculation
+# A speculative (label-free) reply is discarded when the turn turns out to be one of these
+SPECULATIVE_MATERIAL_INTENTS = ("emotional_support", "manipulation_check")
+SPECULATIVE_MATERIAL_SENTIMENTS = ("negative",)
+
+# Local classification tier (answers confident intent/emotion labels without an LLM call)
+LOCAL_FEATURE_DIM = 2 ** 14           # hashed n-gram feature size
+LOCAL_CONFIDENCE_THRESHOLD = 0.9      # min softmax probability to skip Groq
+
+# Intent / emotion label cache (keys are normalized message text)
+CLASSIFICATION_CACHE_SIZE = 10000     # max cached labels per task backend
+CLASSIFICATION_CACHE_TTL = 3600       # seconds a cached label stays valid
+
+# Reply prompt assembly
+PROMPT_TOKEN_BUDGET = 1024     # max estimated tokens in one reply prompt (system + context + user)
+
+# Intent / emotion calls are deterministic so identical in-flight calls can be coalesced
+CLASSIFICATION_TEMPERATURE = 0.0
+
+# Per-task models; None uses the engine's model_name. E.g. a small model for the labels
+# ("llama-3.1-8b-instant") and a larger one for replies ("llama-3.3-70b-versatile")
+INTENT_MODEL = None
+EMOTION_MODEL = None
+REPLY_MODEL = None             # also used by the fused analysis call
+# Opt-in cascade: intent / emotion output that fails validation is re-asked of this model
+CASCADE_MODEL = None
+
+# Retries, per-turn deadline and circuit breaker for Groq calls
+RETRY_MAX_ATTEMPTS = 3         # attempts per upstream call
+RETRY_BASE_DELAY = 0.5         # seconds; backoff is uniform(0, base * 2**attempt)
+RETRY_MAX_DELAY = 8.0          # cap on a single backoff
+TURN_DEADLINE = 20.0           # seconds for all upstream calls of one user turn
+BREAKER_FAILURE_THRESHOLD = 5  # consecutive failures before the circuit opens
+BREAKER_RECOVERY_TIMEOUT = 30  # seconds before a half-open probe is allowed
+
+# Client-side rate limiter (opt-in via NLPEngine(rate_limiter=...)); match your Groq plan
+RATE_LIMIT_RPM = 30                    # requests per minute
+RATE_LIMIT_TPM = 30000                 # tokens per minute
+RATE_LIMIT_BACKGROUND_RESERVE = 0.2    # share of each budget classification calls can't use
+
+# Opt-in micro-batching of intent / emotion calls across concurrent sessions
+BATCH_WINDOW = 0.02            # seconds to wait for more items after the first
+BATCH_MAX_SIZE = 16            # items per batched prompt
+BATCH_WORKERS = 4              # batches in flight at once
+
+# Opt-in request hedging (NLPEngine(hedge_requests=True)): a call still running after the
+# HEDGE_PERCENTILE of recent latency for its task gets a backup copy; the first good one wins
+HEDGE_PERCENTILE = 95          # percentile of recent latency after which a backup is fired
+HEDGE_MIN_DELAY = 0.05         # seconds; never hedge sooner than this
+HEDGE_MIN_SAMPLES = 20         # latency samples needed before hedging starts
+HEDGE_WORKERS = 32             # threads running hedged calls (up to two per call); calls beyond run unhedged
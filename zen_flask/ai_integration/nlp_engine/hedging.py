@@ -0,0 +1,138 @@
+# Hedged upstream calls: a backup copy of a slow call is fired and the first good result wins
+import contextvars
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .config import HEDGE_PERCENTILE, HEDGE_MIN_DELAY, HEDGE_MIN_SAMPLES, HEDGE_WORKERS
+from .metrics import percentile
+
+
+class Hedger:
+    """Runs a call and, if it hasn't finished after `delay`, a backup copy of it.
+
+    The delay comes from `delay_for(samples)`: the `percentile` of recent
+    latencies of that kind of call (at least `min_delay`), or None (no
+    hedging) until `min_samples` have been seen. `run(fn, ...)` calls
+    `fn(cancelled, backup)` where `cancelled` is a threading.Event set once
+    the other copy has won; blocking HTTP can't be aborted, so the loser
+    should check it between attempts and give up.
+
+    Copies only go to the pool when one of its `workers` is idle, so a call
+    never queues there (queued calls would look slow and all be hedged):
+    with every worker busy the call runs unhedged on the caller's thread,
+    and a backup with no idle worker is skipped ("no_worker").
+    """
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, min_delay=HEDGE_MIN_DELAY,
+                 min_samples=HEDGE_MIN_SAMPLES, workers=HEDGE_WORKERS):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.logger = logging.getLogger(__name__)
+        # Own pool: both copies must start right away, not queue behind the engine's workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._idle = workers  # workers not reserved by a running copy
+
+        self.calls = 0
+        self.fired = 0
+        self.wins = 0
+        self.skipped = {}  # reason -> hedges not fired for it
+
+    def delay_for(self, samples):
+        if len(samples) < self.min_samples:
+            return None
+        return max(percentile(samples, self.percentile), self.min_delay)
+
+    def _reserve(self) -> bool:
+        """Claim an idle worker for one copy; False if all are busy."""
+        with self._lock:
+            if self._idle == 0:
+                return False
+            self._idle -= 1
+            return True
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._idle += 1
+
+    def _skip(self, reason):
+        with self._lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def _submit(self, fn, *args):
+        """Run fn on a worker reserved with _reserve(); the worker is released when it finishes."""
+        future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn, delay, is_good=bool, may_hedge=None):
+        """First good result of fn and its backup, else the last result seen.
+
+        `may_hedge()` is asked before the backup is fired; it returns None to
+        allow it or a reason string (counted in stats) to skip it.
+        """
+        with self._lock:
+            self.calls += 1
+        primary_cancelled = threading.Event()
+        if not self._reserve():
+            self._skip("no_worker")
+            return fn(primary_cancelled, False)
+
+        started = threading.Event()
+
+        def primary_call():
+            started.set()
+            return fn(primary_cancelled, False)
+
+        primary = self._submit(primary_call)
+        # The delay counts from when the primary really starts
+        started.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if not self._reserve():
+            self._skip("no_worker")
+            return primary.result()
+        reason = may_hedge() if may_hedge is not None else None
+        if reason is not None:
+            self._release()
+            self._skip(reason)
+            return primary.result()
+
+        backup_cancelled = threading.Event()
+        backup = self._submit(fn, backup_cancelled, True)
+        with self._lock:
+            self.fired += 1
+
+        pending = {primary: primary_cancelled, backup: backup_cancelled}
+        result = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                result = future.result()
+                if is_good(result):
+                    for loser, cancelled in pending.items():
+                        cancelled.set()
+                        loser.cancel()
+                    if future is backup:
+                        with self._lock:
+                            self.wins += 1
+                    return result
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "percentile": self.percentile,
+                "min_delay": self.min_delay,
+                "calls": self.calls,
+                "fired": self.fired,
+                "wins": self.wins,
+                "hedge_rate": round(self.fired / self.calls, 4) if self.calls else 0.0,
+                "win_rate": round(self.wins / self.fired, 4) if self.fired else 0.0,
+                "skipped": dict(self.skipped)
+            }
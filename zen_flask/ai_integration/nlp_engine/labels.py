@@ -0,0 +1,101 @@
+# Label vocabularies and local repair of near-miss classifier output
+import json
+import re
+
+from .config import (
+    EMOTION_LABELS,
+    SENTIMENT_LABELS,
+    EMOTION_SYNONYMS,
+    SENTIMENT_SYNONYMS,
+    JSON_MODE_MODELS,
+)
+
+# Sentiment assumed for an emotion when the model leaves it out or garbles it
+EMOTION_SENTIMENT = {
+    "happy": "positive", "grateful": "positive", "excited": "positive", "calm": "positive",
+    "curious": "neutral", "surprised": "neutral", "confused": "neutral", "neutral": "neutral",
+}
+
+_WORD = re.compile(r"[a-z]+")
+_NEGATIONS = {"not", "no", "never", "neither", "nor", "without", "hardly"}
+_FIELD = re.compile(r"[\"']?(emotion|sentiment)[\"']?\s*[:=\-]\s*[\"']?([A-Za-z ]+)", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def supports_json_mode(model) -> bool:
+    return bool(model) and model.lower().startswith(JSON_MODE_MODELS)
+
+
+def normalize_label(value, vocabulary, synonyms=None):
+    """(label, repaired): `value` mapped onto `vocabulary`, or (None, False) if it can't be.
+
+    Exact matches (after case folding and trimming) are not repairs; synonym
+    or single-word matches inside a longer answer ("very Sad.") are. A longer
+    answer is only repaired when it names exactly one label and nothing
+    negates it ("not happy", "neither sad nor angry" give None).
+    """
+    if not isinstance(value, str):
+        return None, False
+    synonyms = synonyms or {}
+    text = value.strip().lower()
+    if text in vocabulary:
+        return text, False
+    words = _WORD.findall(text)
+    if "_".join(words) in vocabulary:
+        return "_".join(words), True
+    found, negated = set(), False
+    for word in _WORD.findall(text.replace("n't", " not")):
+        if word in _NEGATIONS:
+            negated = True
+        label = word if word in vocabulary else synonyms.get(word)
+        if label is not None:
+            if negated:
+                return None, False
+            found.add(label)
+    if len(found) == 1:
+        return found.pop(), True
+    return None, False
+
+
+def _loads_lenient(text):
+    """(object, repaired) from JSON or near-JSON (single quotes, trailing commas); (None, False) if neither."""
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+    fixed = _TRAILING_COMMA.sub(r"\1", text.replace("'", '"'))
+    try:
+        return json.loads(fixed), True
+    except json.JSONDecodeError:
+        return None, False
+
+
+def parse_emotion_reply(text):
+    """({"emotion", "sentiment"}, repaired) from a model reply, or (None, False).
+
+    Accepts a bare JSON object (JSON mode), JSON inside prose, near-JSON and
+    "emotion: sad, sentiment: negative" lines; both labels are checked against
+    the vocabularies and a missing / unknown sentiment is derived from the emotion.
+    """
+    fields, repaired = None, False
+    start, end = text.find("{"), text.rfind("}") + 1
+    if start != -1 and end > start:
+        fields, repaired = _loads_lenient(text[start:end])
+    if not isinstance(fields, dict):
+        fields = {key.lower(): value for key, value in _FIELD.findall(text)}
+        repaired = True
+    if not fields:
+        return None, False
+    emotion_data, fields_repaired = validate_emotion_fields(fields)
+    return emotion_data, emotion_data is not None and (repaired or fields_repaired)
+
+
+def validate_emotion_fields(fields):
+    """({"emotion", "sentiment"}, repaired) from a dict of model output fields, or (None, False)."""
+    emotion, emotion_repaired = normalize_label(fields.get("emotion"), EMOTION_LABELS, EMOTION_SYNONYMS)
+    if emotion is None:
+        return None, False
+    sentiment, sentiment_repaired = normalize_label(fields.get("sentiment"), SENTIMENT_LABELS, SENTIMENT_SYNONYMS)
+    if sentiment is None:
+        sentiment, sentiment_repaired = EMOTION_SENTIMENT.get(emotion, "negative"), True
+    return {"emotion": emotion, "sentiment": sentiment}, emotion_repaired or sentiment_repaired
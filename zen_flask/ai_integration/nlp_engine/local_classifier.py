@@ -0,0 +1,228 @@
+# Local intent / emotion tier: hashed n-gram features + a linear softmax layer (NumPy only)
+import argparse
+import json
+import logging
+import threading
+import zlib
+
+import numpy as np
+
+from .config import LOCAL_FEATURE_DIM, LOCAL_CONFIDENCE_THRESHOLD
+
+TASKS = ("intent", "emotion", "sentiment")
+
+
+class HashedNgramVectorizer:
+    """Maps text to a fixed-size vector of signed, hashed word and character n-grams.
+
+    crc32 is used instead of hash() so features are stable across processes
+    and a saved model stays valid after a restart.
+    """
+
+    def __init__(self, dim=LOCAL_FEATURE_DIM, word_ngrams=(1, 2), char_ngrams=(3, 4)):
+        self.dim = dim
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = char_ngrams
+
+    def _grams(self, text):
+        text = " ".join(text.lower().split())
+        words = text.split(" ")
+        for n in range(self.word_ngrams[0], self.word_ngrams[1] + 1):
+            for i in range(len(words) - n + 1):
+                yield "w:" + " ".join(words[i:i + n])
+        padded = f" {text} "
+        for n in range(self.char_ngrams[0], self.char_ngrams[1] + 1):
+            for i in range(len(padded) - n + 1):
+                yield "c:" + padded[i:i + n]
+
+    def transform(self, texts) -> np.ndarray:
+        """Dense (len(texts), dim) float32 matrix with L2-normalised rows."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in self._grams(text)),
+                                 dtype=np.uint32)
+            if hashes.size == 0:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class LocalClassifier:
+    """One softmax layer per task ("intent", "emotion", "sentiment") over shared features."""
+
+    def __init__(self, dim=LOCAL_FEATURE_DIM):
+        self.vectorizer = HashedNgramVectorizer(dim=dim)
+        self.heads = {}  # task -> (labels, weights, bias)
+
+    @property
+    def tasks(self):
+        return tuple(self.heads)
+
+    def fit(self, task, texts, labels, epochs=30, lr=0.5, l2=1e-4, batch_size=256, seed=0):
+        """Train (or retrain) the head for `task` with mini-batch softmax regression."""
+        classes = sorted(set(labels))
+        index = {label: i for i, label in enumerate(classes)}
+        y = np.array([index[label] for label in labels], dtype=np.int64)
+        weights = np.zeros((self.vectorizer.dim, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        rng = np.random.default_rng(seed)
+
+        for _ in range(epochs):
+            order = rng.permutation(len(texts))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                x = self.vectorizer.transform([texts[i] for i in batch])
+                probs = _softmax(x @ weights + bias)
+                probs[np.arange(len(batch)), y[batch]] -= 1.0
+                probs /= len(batch)
+                weights -= lr * (x.T @ probs + l2 * weights)
+                bias -= lr * probs.sum(axis=0)
+
+        self.heads[task] = (classes, weights, bias)
+        return self
+
+    def predict_proba(self, task, texts) -> np.ndarray:
+        classes, weights, bias = self.heads[task]
+        return _softmax(self.vectorizer.transform(texts) @ weights + bias)
+
+    def predict(self, task, text):
+        """(label, confidence) for one text, or (None, 0.0) if the task isn't trained."""
+        if task not in self.heads:
+            return None, 0.0
+        probs = self.predict_proba(task, [text])[0]
+        best = int(np.argmax(probs))
+        return self.heads[task][0][best], float(probs[best])
+
+    def save(self, path):
+        arrays = {"dim": np.array(self.vectorizer.dim)}
+        for task, (classes, weights, bias) in self.heads.items():
+            arrays[f"{task}__labels"] = np.array(json.dumps(classes))
+            arrays[f"{task}__weights"] = weights
+            arrays[f"{task}__bias"] = bias
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        model = cls(dim=int(data["dim"]))
+        for key in data.files:
+            if key.endswith("__labels"):
+                task = key[:-len("__labels")]
+                model.heads[task] = (json.loads(str(data[key])),
+                                     data[f"{task}__weights"], data[f"{task}__bias"])
+        return model
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class LabelLogger:
+    """Appends LLM-produced labels to a JSONL file to train the local tier from.
+
+    Each line is {"task": ..., "text": ..., "label": ...}. This stores raw user
+    text, so it is only enabled when a path is configured explicitly.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def log(self, task, text, label):
+        line = json.dumps({"task": task, "text": text, "label": label}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class TieredClassifier:
+    """Answers from the local model when it is confident enough, else defers (returns None)."""
+
+    def __init__(self, model, threshold=LOCAL_CONFIDENCE_THRESHOLD):
+        self.model = model
+        self.threshold = threshold
+
+    def predict(self, task, text):
+        label, confidence = self.model.predict(task, text)
+        if label is not None and confidence >= self.threshold:
+            return label
+        return None
+
+    def predict_intent(self, text):
+        return self.predict("intent", text)
+
+    def predict_emotion(self, text):
+        """{"emotion", "sentiment"} only when both heads are confident."""
+        emotion = self.predict("emotion", text)
+        if emotion is None:
+            return None
+        sentiment = self.predict("sentiment", text)
+        if sentiment is None:
+            return None
+        return {"emotion": emotion, "sentiment": sentiment}
+
+
+def read_label_log(path):
+    """Group a label log into {task: (texts, labels)}; later duplicates win."""
+    latest = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("task") in TASKS and record.get("text") and record.get("label"):
+                latest[(record["task"], record["text"])] = record["label"]
+
+    grouped = {}
+    for (task, text), label in latest.items():
+        texts, labels = grouped.setdefault(task, ([], []))
+        texts.append(text)
+        labels.append(label)
+    return grouped
+
+
+def train_from_log(log_path, out_path, dim=LOCAL_FEATURE_DIM, epochs=30, holdout=0.1, seed=0):
+    """Train every task found in `log_path`, save to `out_path`, return holdout accuracy per task."""
+    logger = logging.getLogger(__name__)
+    model = LocalClassifier(dim=dim)
+    report = {}
+    rng = np.random.default_rng(seed)
+
+    for task, (texts, labels) in read_label_log(log_path).items():
+        order = rng.permutation(len(texts))
+        n_test = int(len(texts) * holdout)
+        test, train = order[:n_test], order[n_test:]
+        model.fit(task, [texts[i] for i in train], [labels[i] for i in train], epochs=epochs, seed=seed)
+
+        accuracy = None
+        if n_test:
+            probs = model.predict_proba(task, [texts[i] for i in test])
+            predicted = [model.heads[task][0][j] for j in probs.argmax(axis=1)]
+            accuracy = float(np.mean([p == labels[i] for p, i in zip(predicted, test)]))
+        report[task] = {"examples": len(texts), "classes": len(set(labels)), "holdout_accuracy": accuracy}
+        logger.info(f"Trained local '{task}' head: {report[task]}")
+
+    model.save(out_path)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the local intent/emotion classifier from logged LLM labels.")
+    parser.add_argument("--log", required=True, help="JSONL label log written by NLPEngine(label_log_path=...)")
+    parser.add_argument("--out", required=True, help="where to write the model (.npz)")
+    parser.add_argument("--dim", type=int, default=LOCAL_FEATURE_DIM, help="hashed feature dimension")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--holdout", type=float, default=0.1, help="fraction held out for accuracy")
+    args = parser.parse_args(argv)
+
+    report = train_from_log(args.log, args.out, dim=args.dim, epochs=args.epochs, holdout=args.holdout)
+    print(json.dumps(report, indent=2))
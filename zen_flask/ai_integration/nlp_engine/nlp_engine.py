@@ -2,85 +2,695 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import contextvars
 import json
 import time
-from functools import lru_cache
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
 from dotenv import load_dotenv
 
+from .config import (
+    DEFAULT_API_URL,
+    SUPPORTED_INTENTS,
+    EMOTION_LABELS,
+    ANALYSIS_WORKERS,
+    SPECULATIVE_WORKERS,
+    SPECULATIVE_MATERIAL_INTENTS,
+    SPECULATIVE_MATERIAL_SENTIMENTS,
+    LOCAL_CONFIDENCE_THRESHOLD,
+    CLASSIFICATION_TEMPERATURE,
+    INTENT_MODEL,
+    EMOTION_MODEL,
+    REPLY_MODEL,
+    CASCADE_MODEL,
+    BATCH_WINDOW,
+    BATCH_MAX_SIZE,
+    PROMPT_TOKEN_BUDGET,
+    HEDGE_PERCENTILE,
+)
+from .http_client import get_shared_client
+from .classification_cache import ClassificationCache, SQLiteClassificationCache
+from .metrics import EngineMetrics
+from .singleflight import SingleFlight
+from .prompt_builder import PromptBuilder, turn_labels
+from .batcher import MicroBatcher, build_batch_messages, parse_batch_reply, BATCH_TOKENS_PER_ITEM
+from .hedging import Hedger
+from .labels import normalize_label, parse_emotion_reply, supports_json_mode, validate_emotion_fields
+from .rate_limiter import (
+    RateLimiter,
+    PRIORITY_REPLY,
+    PRIORITY_CLASSIFICATION,
+    estimate_request_tokens,
+)
+from .retry import (
+    RetryPolicy,
+    RETRYABLE_STATUSES,
+    get_shared_breaker,
+    remaining_time,
+    stream_within_deadline,
+    turn_deadline,
+)
+
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", DEFAULT_API_URL)
 
 
 class NLPEngine:
-    def __init__(self, model_name="llama3-8b-8192"):
+    def __init__(self, model_name="llama3-8b-8192", http_client=None, fused_analysis=False,
+                 concurrent_detection=True, speculative_reply=False, max_workers=ANALYSIS_WORKERS,
+                 local_classifier=None, local_threshold=LOCAL_CONFIDENCE_THRESHOLD, label_log_path=None,
+                 classification_cache=None, retry_policy=None, circuit_breaker=None, rate_limiter=None,
+                 batch_classification=False, batch_window=BATCH_WINDOW, batch_size=BATCH_MAX_SIZE,
+                 api_url=None, task_models=None, cascade_model=CASCADE_MODEL,
+                 prompt_budget=PROMPT_TOKEN_BUDGET, hedge_requests=False,
+                 hedge_percentile=HEDGE_PERCENTILE, json_mode=True, speculative_workers=SPECULATIVE_WORKERS):
         self.model_name = model_name
+        # Model per task ("intent", "emotion", "reply"); tasks left unset use model_name
+        models = {"intent": INTENT_MODEL, "emotion": EMOTION_MODEL, "reply": REPLY_MODEL}
+        models.update(task_models or {})
+        self.task_models = {task: model or model_name for task, model in models.items()}
+        # Opt-in: classification output that fails validation is re-asked of this model
+        self.cascade_model = cascade_model
+        # Ask for JSON-mode output on JSON prompts when the model supports it (see JSON_MODE_MODELS)
+        self.json_mode = json_mode
+        # Opt-in: one structured call returns intent, emotion, sentiment and reply
+        self.fused_analysis = fused_analysis
+        # Run detect_intent / detect_emotion side by side instead of back to back
+        self.concurrent_detection = concurrent_detection
+        # Opt-in: start the reply alongside classification with a label-free prompt
+        self.speculative_reply = speculative_reply
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Speculative replies get their own small pool so they never hold up classification
+        self._speculative_executor = ThreadPoolExecutor(max_workers=speculative_workers,
+                                                        thread_name_prefix="nlp-speculative")
+        self._speculative_slots = threading.Semaphore(speculative_workers)
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(level=logging.INFO)
         
         # Groq API setup for cloud deployment
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.api_url = api_url or GROQ_API_URL
         self.headers = {
             "Authorization": f"Bearer {GROQ_API_KEY}",
             "Content-Type": "application/json"
         }
 
-        
+        # Keep-alive connection pool; shared process-wide unless one is passed in
+        self.http = http_client or get_shared_client()
+        self.metrics = EngineMetrics()
+        # Reply prompts are kept within prompt_budget estimated tokens
+        self.prompt_builder = PromptBuilder(prompt_budget, self.metrics)
+        # Backoff/deadline settings, and a breaker shared by all engines using this URL
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = circuit_breaker or get_shared_breaker(self.api_url)
+        # Optional client-side RPM/TPM budget; a path shares it between worker processes
+        if isinstance(rate_limiter, str):
+            rate_limiter = RateLimiter(store=rate_limiter)
+        self.rate_limiter = rate_limiter
+        # Identical deterministic calls in flight at the same time share one request
+        self.inflight = SingleFlight()
+        # Opt-in: calls slower than hedge_percentile of recent ones get a backup request
+        self.hedger = Hedger(percentile=hedge_percentile) if hedge_requests else None
+
+        # Opt-in: concurrent sessions' intent / emotion calls share one numbered prompt
+        self.intent_batcher = None
+        self.emotion_batcher = None
+        if batch_classification:
+            self.intent_batcher = MicroBatcher(lambda texts: self._classify_batch("intent", texts),
+                                               window=batch_window, max_batch=batch_size, name="intent")
+            self.emotion_batcher = MicroBatcher(lambda texts: self._classify_batch("emotion", texts),
+                                                window=batch_window, max_batch=batch_size, name="emotion")
+
+        # Label cache consulted before the local tier and Groq: in-process by default,
+        # a SQLite path shares it between workers, False disables it
+        if classification_cache is None:
+            classification_cache = ClassificationCache()
+        elif isinstance(classification_cache, str):
+            classification_cache = SQLiteClassificationCache(classification_cache)
+        self.classification_cache = classification_cache if classification_cache is not False else None
+
+        # Optional local tier in front of Groq; NumPy is only imported when it's used
+        self.local_tier = None
+        if local_classifier is not None:
+            from .local_classifier import LocalClassifier, TieredClassifier
+            if isinstance(local_classifier, str):
+                local_classifier = LocalClassifier.load(local_classifier)
+            if isinstance(local_classifier, LocalClassifier):
+                local_classifier = TieredClassifier(local_classifier, local_threshold)
+            self.local_tier = local_classifier
+
+        # Optional JSONL log of LLM labels, used to train the local tier
+        self.label_logger = None
+        if label_log_path:
+            from .local_classifier import LabelLogger
+            self.label_logger = LabelLogger(label_log_path)
+
+    def get_stats(self) -> dict:
+        """Runtime counters for this engine (HTTP pool reuse, tokens, latency, ...)."""
+        stats = self.metrics.snapshot()
+        stats["http"] = self.http.stats()
+        stats["circuit_breaker"] = self.breaker.stats()
+        if self.rate_limiter is not None:
+            stats["rate_limiter"] = self.rate_limiter.stats()
+        if self.classification_cache is not None:
+            stats["classification_cache"] = self.classification_cache.stats()
+        if self.intent_batcher is not None:
+            stats["batching"] = {
+                "intent": self.intent_batcher.stats(),
+                "emotion": self.emotion_batcher.stats()
+            }
+        if self.local_tier is not None:
+            stats["local_classifier"] = self._local_tier_stats(stats["counters"])
+        stats["tasks"] = self._task_stats(stats)
+        stats["prompt"] = self._prompt_stats(stats["counters"])
+        if self.hedger is not None:
+            stats["hedging"] = self.hedger.stats()
+        stats["parsing"] = self._parse_stats(stats["counters"])
+        return stats
+
+    def _parse_stats(self, counters) -> dict:
+        """Classification outputs per model: parsed, repaired locally, or wasted (failed to parse)."""
+        models = {}
+        for name, count in counters.items():
+            kind, sep, model = name.partition(":")
+            if sep and kind in ("parse_calls", "parse_failures", "parse_repairs"):
+                models.setdefault(model, {"calls": 0, "failures": 0, "repairs": 0})[kind[len("parse_"):]] = count
+        for entry in models.values():
+            entry["failure_rate"] = round(entry["failures"] / entry["calls"], 4) if entry["calls"] else 0.0
+        return models
+
+    def _prompt_stats(self, counters) -> dict:
+        builds = counters.get("prompt_builds", 0)
+        turns = counters.get("classified_turns", 0)
+        return {
+            "budget": self.prompt_builder.budget,
+            "avg_estimated_tokens": round(counters.get("prompt_tokens_estimated", 0) / builds, 1) if builds else 0.0,
+            "over_budget": counters.get("prompt_over_budget", 0),
+            "context_blocks_dropped": counters.get("prompt_context_blocks_dropped", 0),
+            "duplicates_dropped": counters.get("prompt_duplicates_dropped", 0),
+            "prefix_keys": self.prompt_builder.prefix_keys(),
+            "prefix_changes": counters.get("prompt_prefix_changes", 0),
+            "cached_prompt_tokens": counters.get("cached_prompt_tokens", 0),
+            # Upstream-reported prompt tokens (all calls) per classified turn
+            "prompt_tokens_per_turn": round(counters.get("prompt_tokens", 0) / turns, 1) if turns else 0.0
+        }
+
+    def _task_stats(self, stats) -> dict:
+        """Model, call count and latency per task; escalation rate for the classifiers."""
+        counters = stats["counters"]
+        tasks = {}
+        for task, model in self.task_models.items():
+            calls = counters.get(f"task_{task}_calls", 0)
+            entry = {"model": model, "calls": calls, "latency": stats["latency"].get(f"task_{task}", {})}
+            if task != "reply":
+                escalations = counters.get(f"task_{task}_escalations", 0)
+                first_tier = calls - escalations
+                entry.update({
+                    "invalid": counters.get(f"task_{task}_invalid", 0),
+                    "escalations": escalations,
+                    "escalation_rate": round(escalations / first_tier, 4) if first_tier else 0.0
+                })
+            tasks[task] = entry
+        tasks["cascade_model"] = self.cascade_model
+        return tasks
+
+    def model_for(self, task=None) -> str:
+        """Model configured for `task`, or model_name for untagged calls."""
+        return self.task_models.get(task, self.model_name)
+
+    def _local_tier_stats(self, counters) -> dict:
+        tier = {}
+        for task in ("intent", "emotion"):
+            served = counters.get(f"local_{task}_served", 0)
+            deferred = counters.get(f"local_{task}_deferred", 0)
+            total = served + deferred
+            tier[task] = {
+                "served": served,
+                "deferred": deferred,
+                "local_fraction": round(served / total, 4) if total else 0.0
+            }
+        turns = counters.get("classified_turns", 0)
+        local_turns = counters.get("turns_served_locally", 0)
+        cache_turns = counters.get("turns_served_from_cache", 0)
+        tier["turns_served_locally"] = local_turns
+        tier["turn_local_fraction"] = round(local_turns / turns, 4) if turns else 0.0
+        tier["turns_served_from_cache"] = cache_turns
+        tier["turn_cache_fraction"] = round(cache_turns / turns, 4) if turns else 0.0
+        return tier
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Worker pool for concurrent upstream calls, created on first use."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="nlp-engine")
+        return self._executor
+
+    def _submit(self, fn, *args, **kwargs):
+        """Run fn on the worker pool in a copy of the caller's context (keeps the turn deadline)."""
+        return self.executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def _speculate(self, messages):
+        """Start a speculative reply if a speculative worker is idle; None (counted) when all are busy."""
+        if not self._speculative_slots.acquire(blocking=False):
+            self.metrics.incr("speculative_skipped")
+            return None
+        future = self._speculative_executor.submit(contextvars.copy_context().run, self.call_groq_model,
+                                                   messages, 150, 0.8, task="reply")
+        future.add_done_callback(lambda _: self._speculative_slots.release())
+        return future
+
+    def _record_usage(self, result):
+        usage = result.get("usage") or {}
+        self.metrics.incr("llm_calls")
+        self.metrics.incr("prompt_tokens", usage.get("prompt_tokens", 0))
+        self.metrics.incr("completion_tokens", usage.get("completion_tokens", 0))
+        # Prompt tokens the provider served from its prefix cache, when it reports them
+        details = usage.get("prompt_tokens_details") or {}
+        self.metrics.incr("cached_prompt_tokens", details.get("cached_tokens") or 0)
+
+    def call_groq_model(self, messages, max_tokens=200, temperature=0.7, coalesce=None,
+                        priority=PRIORITY_REPLY, task=None, model=None, json_mode=False):
+        """Call Groq API - cloud-ready replacement for HF
+
+        Deterministic calls (temperature 0, unless `coalesce` says otherwise) with the
+        same model, messages and max_tokens that overlap in time share one upstream
+        request. Sampled replies are never coalesced by default. `priority` orders
+        calls waiting on the rate limiter (replies before classification). `task`
+        picks the model (see model_for) and files the latency under task_<task>;
+        `model` overrides the choice. With hedging on, slow calls are hedged
+        (see _complete). `json_mode` requests a JSON object response; only pass
+        it for models that support it (supports_json_mode).
+        """
+        model = model or self.model_for(task)
+        if coalesce is None:
+            coalesce = temperature == 0
+
+        start = time.perf_counter()
+        if not coalesce:
+            result = self._complete(messages, max_tokens, temperature, priority, model, task, json_mode)
+        else:
+            key = json.dumps([model, messages, max_tokens, temperature, json_mode], sort_keys=True)
+            result, shared = self.inflight.do(
+                key, lambda: self._complete(messages, max_tokens, temperature, priority, model, task, json_mode)
+            )
+            if shared:
+                self.metrics.incr("coalesced_calls")
+        if task is not None:
+            self.metrics.incr(f"task_{task}_calls")
+            self.metrics.observe(f"task_{task}", time.perf_counter() - start)
+        return result
+
+    def _attempt_timeout(self):
+        """Per-attempt (connect, read) timeout shrunk to what is left of the turn deadline."""
+        remaining = remaining_time()
+        if remaining is None:
+            return None
+        connect, read = self.http.timeout
+        return (min(connect, remaining), min(read, remaining))
+
+    def _before_attempt(self, tokens=0, priority=PRIORITY_REPLY, charge=True) -> bool:
+        """False when the call must stop now: turn deadline spent, no rate budget in time, or circuit open."""
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            self.metrics.incr("deadline_exceeded")
+            return False
+        if charge and self.rate_limiter is not None and not self.rate_limiter.acquire(tokens, priority, timeout=remaining):
+            self.metrics.incr("rate_limited")
+            return False
+        if not self.breaker.allow_request():
+            self.metrics.incr("circuit_rejections")
+            return False
+        return True
+
+    def _retry_delay(self, attempt, response=None):
+        """Seconds to back off before the next attempt; None if none is left or it can't fit the deadline."""
+        if attempt + 1 >= self.retry_policy.max_attempts:
+            return None
+        delay = self.retry_policy.delay_for(attempt, response)
+        if delay is None:
+            # The server asked for a longer wait than retry_policy.max_delay
+            self.metrics.incr("retry_after_too_long")
+            return None
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            self.metrics.incr("deadline_exceeded")
+            return None
+        self.metrics.incr("retries")
+        return delay
+
+    def _wait_before_retry(self, attempt, response=None) -> bool:
+        """Back off before the next attempt; False if none is left or it can't fit the deadline."""
+        delay = self._retry_delay(attempt, response)
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _after_response(self, response, estimated_tokens, usage=None):
+        """Keep the local rate budget in line with what the upstream reports."""
+        if self.rate_limiter is None:
+            return
+        self.rate_limiter.observe_headers(getattr(response, "headers", None))
+        if usage:
+            self.rate_limiter.reconcile(estimated_tokens, usage.get("total_tokens"))
+
+    def _record_health(self, response):
+        # 429s and other 4xx mean the upstream is up; only 5xx / empty replies count as failures
+        if response.status_code >= 500 or not response.content:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _complete(self, messages, max_tokens, temperature, priority, model, task=None, json_mode=False):
+        """One upstream completion; hedged once enough latency history exists for this task.
+
+        The backup only goes out if the rate limiter has budget for it right
+        now (taken at classification priority, so hedges never use the reply
+        reserve) and the circuit is closed. The loser finishes its current
+        attempt in the background without retrying; its result is dropped.
+        """
+        delay = None
+        if self.hedger is not None:
+            delay = self.hedger.delay_for(self.metrics.samples(f"task_{task}" if task else "llm_call"))
+        if delay is None:
+            return self._request_completion(messages, max_tokens, temperature, priority, model,
+                                            json_mode=json_mode)
+
+        tokens = estimate_request_tokens(messages, max_tokens)
+
+        def may_hedge():
+            if self.breaker.state != self.breaker.CLOSED:
+                return "circuit"
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                return "deadline"
+            if self.rate_limiter is not None and not self.rate_limiter.try_acquire(
+                    tokens, max(priority, PRIORITY_CLASSIFICATION)):
+                return "rate_limit"
+            return None
+
+        def attempt(cancelled, backup):
+            # The backup's budget was taken by may_hedge
+            return self._request_completion(messages, max_tokens, temperature, priority, model,
+                                            cancelled=cancelled, prepaid=backup, json_mode=json_mode)
+
+        return self.hedger.run(attempt, delay, is_good=lambda r: not r.startswith("[Groq Error]"),
+                               may_hedge=may_hedge)
+
+    def _request_completion(self, messages, max_tokens, temperature, priority=PRIORITY_REPLY, model=None,
+                            cancelled=None, prepaid=False, json_mode=False):
+        """The retry loop; stops early once `cancelled` is set. `prepaid`: budget for attempt 1 is already taken."""
+        payload = self._completion_payload(messages, max_tokens, temperature, model or self.model_name,
+                                           json_mode=json_mode)
+        estimated_tokens = estimate_request_tokens(messages, max_tokens)
+        attempts = 0
+        for attempt in range(self.retry_policy.max_attempts):
+            if cancelled is not None and cancelled.is_set():
+                return "[Groq Error]: Cancelled (hedged call already answered)"
+            if not self._before_attempt(estimated_tokens, priority, charge=not (prepaid and attempt == 0)):
+                break
+            attempts += 1
+            try:
+                with self.metrics.timer("llm_call"):
+                    response = self.http.post(self.api_url, headers=self.headers, json=payload,
+                                              timeout=self._attempt_timeout())
+            except Exception as e:
+                self.logger.error(f"[Attempt {attempt+1}] Request Error: {e}")
+                self.breaker.record_failure()
+                if not self._wait_before_retry(attempt):
+                    break
+                continue
+
+            content, retryable = self._read_completion(response, attempt, estimated_tokens)
+            if content is not None:
+                return content
+            if not retryable or not self._wait_before_retry(attempt, response):
+                break
 
-    def call_groq_model(self, messages, max_tokens=200, temperature=0.7):
-        """Call Groq API - cloud-ready replacement for HF"""
+        if attempts == 0:
+            return "[Groq Error]: Upstream unavailable (circuit open or deadline exceeded)"
+        return f"[Groq Error]: Failed after {attempts} attempts"
+
+
+    def _completion_payload(self, messages, max_tokens, temperature, model, stream=False, json_mode=False) -> dict:
         payload = {
-            "model": self.model_name,
+            "model": model,
             "messages": messages,
             "max_tokens": max_tokens,
             "temperature": temperature,
             "top_p": 1,
-            "stream": False
+            "stream": stream
         }
-        
-        for attempt in range(3):
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    def _read_completion(self, response, attempt, estimated_tokens):
+        """(content, retryable) for one attempt's response; content is None unless it holds a completion."""
+        self._record_health(response)
+        if response.status_code != 200:
+            self._after_response(response, estimated_tokens)
+
+        if not response.content:
+            self.logger.warning(f"[Attempt {attempt+1}] Empty response from model.")
+        elif response.status_code == 429:  # Rate limit
+            self.logger.warning(f"[Attempt {attempt+1}] Rate limit hit, waiting...")
+        elif response.status_code != 200:
+            self.logger.warning(f"[Attempt {attempt+1}] HTTP {response.status_code}: {response.text}")
+            if response.status_code not in RETRYABLE_STATUSES:
+                return None, False
+        else:
             try:
-                response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=30)
-                
-                if not response.content:
-                    self.logger.warning(f"[Attempt {attempt+1}] Empty response from model.")
-                    time.sleep(3)
-                    continue
-
-                if response.status_code == 429:  # Rate limit
-                    self.logger.warning(f"[Attempt {attempt+1}] Rate limit hit, waiting...")
-                    time.sleep(5)
-                    continue
-
-                if response.status_code != 200:
-                    self.logger.warning(f"[Attempt {attempt+1}] HTTP {response.status_code}: {response.text}")
-                    time.sleep(3)
-                    continue
-
-                try:
-                    result = response.json()
-                    return result["choices"][0]["message"]["content"].strip()
-                
-                except Exception as e:
-                    self.logger.error(f"[Attempt {attempt+1}] JSON parsing error: {e}")
-                    time.sleep(3)
-                    continue
+                result = response.json()
+                content = result["choices"][0]["message"]["content"].strip()
+            except Exception as e:
+                self.logger.error(f"[Attempt {attempt+1}] JSON parsing error: {e}")
+                return None, True
+            # Outside the parse try: limiter bookkeeping must never turn a good reply into a retry
+            self._record_usage(result)
+            self._after_response(response, estimated_tokens, result.get("usage"))
+            return content, False
+        return None, True
+
+    def stream_groq_model(self, messages, max_tokens=200, temperature=0.7, model=None):
+        """Yield reply text incrementally from a streamed (SSE) Groq completion.
 
+        Retries only happen before the first token is received; if every attempt
+        fails nothing is yielded and the caller applies its own fallback. Uses
+        the reply model unless `model` is given.
+        """
+        payload = self._completion_payload(messages, max_tokens, temperature, model or self.model_for("reply"),
+                                           stream=True)
+        estimated_tokens = estimate_request_tokens(messages, max_tokens)
+        for attempt in range(self.retry_policy.max_attempts):
+            if not self._before_attempt(estimated_tokens, PRIORITY_REPLY):
+                break
+            start = time.perf_counter()
+            try:
+                response = self.http.post(self.api_url, headers=self.headers, json=payload, stream=True,
+                                          timeout=self._attempt_timeout())
             except Exception as e:
-                self.logger.error(f"[Attempt {attempt+1}] Request Error: {e}")
-                time.sleep(3)
+                self.logger.error(f"[Stream attempt {attempt+1}] Request Error: {e}")
+                self.breaker.record_failure()
+                if not self._wait_before_retry(attempt):
+                    break
+                continue
+
+            if response.status_code != 200:
+                self.logger.warning(f"[Stream attempt {attempt+1}] HTTP {response.status_code}: {response.text}")
+                self._record_health(response)
+                self._after_response(response, estimated_tokens)
+                response.close()
+                if response.status_code not in RETRYABLE_STATUSES or not self._wait_before_retry(attempt, response):
+                    break
+                continue
 
-        return "[Groq Error]: Failed after 3 attempts"
+            received = False
+            try:
+                for line in response.iter_lines():
+                    delta = self._stream_delta(line, response, estimated_tokens)
+                    if delta is None:
+                        break
+                    if delta:
+                        if not received:
+                            received = True
+                            self.metrics.observe("llm_first_token", time.perf_counter() - start)
+                        yield delta
+            except Exception as e:
+                self.logger.error(f"[Stream attempt {attempt+1}] Read Error: {e}")
+            finally:
+                response.close()
+
+            if received:
+                self.breaker.record_success()
+                self.metrics.observe("llm_stream", time.perf_counter() - start)
+                return
+            self.breaker.record_failure()
+            if not self._wait_before_retry(attempt):
+                break
+
+        self.logger.error("[Stream] No reply received from model")
+
+    def _stream_delta(self, line, response, estimated_tokens):
+        """Reply text carried by one SSE line ("" if none); None once the stream says [DONE]."""
+        # SSE frames look like `data: {...}`; blank lines separate events
+        if not line or not line.startswith(b"data:"):
+            return ""
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            return None
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError as e:
+            self.logger.warning(f"[Stream] Skipping malformed chunk: {e}")
+            return ""
+
+        # Groq reports usage on the last chunk under x_groq
+        usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+        if usage:
+            self._record_usage({"usage": usage})
+            self._after_response(response, estimated_tokens, usage)
 
+        choices = chunk.get("choices") or [{}]
+        return (choices[0].get("delta") or {}).get("content") or ""
 
-    @lru_cache(maxsize=128)
     def detect_intent_cached(self, user_input: str) -> str:
+        # Kept for existing callers; detect_intent() now goes through classification_cache
         return self.detect_intent(user_input)
 
+    def _cache_get(self, task, user_input):
+        if self.classification_cache is None:
+            return None
+        return self.classification_cache.get(task, user_input)
+
+    def _cache_set(self, task, user_input, value):
+        if self.classification_cache is not None:
+            self.classification_cache.set(task, user_input, value)
+
+    def _lookup_intent(self, user_input: str):
+        """(intent, "cache" or "local") without an LLM call (cache, then local tier), or (None, None)."""
+        intent = self._cache_get("intent", user_input)
+        if intent is not None:
+            return intent, "cache"
+        intent = self._local_intent(user_input)
+        return intent, "local" if intent is not None else None
+
+    def _lookup_emotion(self, user_input: str):
+        """(emotion data, "cache" or "local") without an LLM call (cache, then local tier), or (None, None)."""
+        emotion_data = self._cache_get("emotion", user_input)
+        if emotion_data is not None:
+            return dict(emotion_data), "cache"
+        emotion_data = self._local_emotion(user_input)
+        return emotion_data, "local" if emotion_data is not None else None
+
+    def _count_turn_without_llm(self, intent_source, emotion_source):
+        # Local only when the local tier produced both labels; any cache hit makes it a cache-served turn
+        if intent_source == emotion_source == "local":
+            self.metrics.incr("turns_served_locally")
+        else:
+            self.metrics.incr("turns_served_from_cache")
+
+    def _local_intent(self, user_input: str):
+        """Intent from the local tier, or None when it's absent or not confident."""
+        if self.local_tier is None:
+            return None
+        intent = self.local_tier.predict_intent(user_input)
+        if intent not in SUPPORTED_INTENTS:
+            intent = None
+        self.metrics.incr("local_intent_served" if intent else "local_intent_deferred")
+        return intent
+
+    def _local_emotion(self, user_input: str):
+        """{"emotion", "sentiment"} from the local tier, or None to defer to Groq."""
+        if self.local_tier is None:
+            return None
+        emotion_data = self.local_tier.predict_emotion(user_input)
+        self.metrics.incr("local_emotion_served" if emotion_data else "local_emotion_deferred")
+        return emotion_data
+
+    def _log_label(self, task, user_input, label):
+        if self.label_logger is None:
+            return
+        try:
+            self.label_logger.log(task, user_input, label)
+        except OSError as e:
+            self.logger.warning(f"Could not write label log: {e}")
+
+    def _remember_intent(self, user_input, intent):
+        self._cache_set("intent", user_input, intent)
+        self._log_label("intent", user_input, intent)
+
+    def _remember_emotion(self, user_input, emotion_data):
+        self._cache_set("emotion", user_input, emotion_data)
+        self._log_label("emotion", user_input, emotion_data["emotion"])
+        self._log_label("sentiment", user_input, emotion_data["sentiment"])
+
+    def _classify_batch(self, task, texts):
+        """Label several texts with one upstream call; unparsed items fall back to single calls."""
+        if len(texts) == 1:
+            single = self._detect_intent_llm if task == "intent" else self._detect_emotion_llm
+            return [single(texts[0])]
+
+        messages = build_batch_messages(task, texts)
+        reply = self.call_groq_model(messages, max_tokens=BATCH_TOKENS_PER_ITEM[task] * len(texts),
+                                     temperature=CLASSIFICATION_TEMPERATURE, priority=PRIORITY_CLASSIFICATION,
+                                     task=task)
+        results = [None] * len(texts)
+        if not reply.startswith("[Groq Error]"):
+            results = parse_batch_reply(task, reply, len(texts))
+
+        for i, text in enumerate(texts):
+            if results[i] is not None:
+                if task == "intent":
+                    self._remember_intent(text, results[i])
+                else:
+                    self._remember_emotion(text, results[i])
+                continue
+            self.metrics.incr(f"batch_{task}_fallbacks")
+            results[i] = self._detect_intent_llm(text) if task == "intent" else self._detect_emotion_llm(text)
+        return results
+
+    def _from_batcher(self, batcher, user_input, default):
+        try:
+            return batcher.submit(user_input).result(timeout=remaining_time())
+        except Exception as e:
+            self.logger.error(f"[Batched {batcher.name}] {e}")
+            return default
+
+    def _intent_upstream(self, user_input: str) -> str:
+        """Intent from Groq, through the micro-batcher when enabled."""
+        if self.intent_batcher is not None:
+            return self._from_batcher(self.intent_batcher, user_input, "unknown")
+        return self._detect_intent_llm(user_input)
+
+    def _emotion_upstream(self, user_input: str) -> dict:
+        """Emotion data from Groq, through the micro-batcher when enabled."""
+        if self.emotion_batcher is not None:
+            return self._from_batcher(self.emotion_batcher, user_input,
+                                      {"emotion": "neutral", "sentiment": "neutral"})
+        return self._detect_emotion_llm(user_input)
 
     def detect_intent(self, user_input: str) -> str:
-        messages = [
+        intent, _ = self._lookup_intent(user_input)
+        if intent is not None:
+            return intent
+        return self._intent_upstream(user_input)
+
+    def _detect_intent_llm(self, user_input: str) -> str:
+        intent = self._classify_with_cascade("intent", self._intent_messages(user_input), 10, self._parse_intent)
+        if intent is not None:
+            self._remember_intent(user_input, intent)
+            return intent
+        return "unknown"
+
+    def _intent_messages(self, user_input: str) -> list:
+        return [
             {
                 "role": "system",
                 "content": "You are an intent detector. Respond with one word only: 'greeting', 'question', 'request', 'get_weather', 'emotional_support', 'manipulation_check', or 'unknown'."
@@ -90,51 +700,92 @@ class NLPEngine:
                 "content": user_input
             }
         ]
-        
-        result = self.call_groq_model(messages, max_tokens=10).lower().strip()
-        valid_intents = ["greeting", "question", "request", "get_weather", "emotional_support", "manipulation_check", "unknown"]
-        return result if result in valid_intents else "unknown"
+
+    def _parse_intent(self, result):
+        """(intent, repaired); intent is None if the reply names no supported intent."""
+        return normalize_label(result, SUPPORTED_INTENTS)
+
+    def _classify_with_cascade(self, task, messages, max_tokens, parse, json_mode=False):
+        """Parsed label from the task's model, re-asked of cascade_model if its output fails validation.
+
+        `parse(reply)` returns (label or None, repaired). None when no model
+        produced a valid label (or the upstream failed; errors are not
+        escalated, only invalid output). Outputs, repairs and parse failures
+        are counted per model. `json_mode` requests JSON output from models
+        that support it.
+        """
+        for tier, model in enumerate(self._cascade_models(task)):
+            if tier:
+                self.metrics.incr(f"task_{task}_escalations")
+            result = self.call_groq_model(messages, max_tokens=max_tokens, temperature=CLASSIFICATION_TEMPERATURE,
+                                          priority=PRIORITY_CLASSIFICATION, task=task, model=model,
+                                          json_mode=json_mode and self._json_mode_for(model))
+            if result.startswith("[Groq Error]"):
+                return None
+            label = self._accept_label(task, model, result, parse)
+            if label is not None:
+                return label
+        return None
+
+    def _cascade_models(self, task) -> list:
+        models = [self.model_for(task)]
+        if self.cascade_model and self.cascade_model != models[0]:
+            models.append(self.cascade_model)
+        return models
+
+    def _json_mode_for(self, model) -> bool:
+        return self.json_mode and supports_json_mode(model)
+
+    def _accept_label(self, task, model, result, parse):
+        """Label parsed from one model's reply (None if invalid), counting repairs and failures per model."""
+        self.metrics.incr(f"parse_calls:{model}")
+        label, repaired = parse(result)
+        if label is not None:
+            if repaired:
+                self.metrics.incr(f"parse_repairs:{model}")
+            return label
+        self.metrics.incr(f"parse_failures:{model}")
+        self.metrics.incr(f"task_{task}_invalid")
+        return None
 
 
     def detect_emotion(self, user_input: str) -> dict:
-        messages = [
+        emotion_data, _ = self._lookup_emotion(user_input)
+        if emotion_data is not None:
+            return emotion_data
+        return self._emotion_upstream(user_input)
+
+    def _detect_emotion_llm(self, user_input: str) -> dict:
+        emotion_data = self._classify_with_cascade("emotion", self._emotion_messages(user_input), 50,
+                                                   self._parse_emotion, json_mode=True)
+        if emotion_data is not None:
+            self._remember_emotion(user_input, emotion_data)
+            return emotion_data
+        return {"emotion": "neutral", "sentiment": "neutral"}
+
+    def _emotion_messages(self, user_input: str) -> list:
+        return [
             {
                 "role": "system", 
-                "content": "You are an emotion and sentiment detector. Reply ONLY with JSON like: {\"emotion\": \"sad\", \"sentiment\": \"negative\"}"
+                "content": (
+                    "You are an emotion and sentiment detector. Reply ONLY with JSON like: "
+                    "{\"emotion\": \"sad\", \"sentiment\": \"negative\"}\n"
+                    f"emotion must be one of: {', '.join(EMOTION_LABELS)}.\n"
+                    "sentiment must be positive, negative or neutral."
+                )
             },
             {
                 "role": "user",
                 "content": user_input
             }
         ]
-        
-        result = self.call_groq_model(messages, max_tokens=50)
-        
-        if result.startswith("[Groq Error]"):
-            return {"emotion": "neutral", "sentiment": "neutral"}
 
-        try:
-            # Extract JSON from response
-            start_idx = result.find('{')
-            end_idx = result.rfind('}') + 1
-            if start_idx != -1 and end_idx != -1:
-                json_str = result[start_idx:end_idx]
-                parsed_data = json.loads(json_str)
-                
-                # Validate required fields
-                if "emotion" in parsed_data and "sentiment" in parsed_data:
-                    return parsed_data
-                else:
-                    self.logger.warning(f"Missing required fields in emotion detection response: {parsed_data}")
-                    return {"emotion": "neutral", "sentiment": "neutral"}
-            
-        except json.JSONDecodeError as e:
-            self.logger.error(f"[JSON Parsing Error]: {e}")
-        except Exception as e:
-            self.logger.error(f"[Unexpected Error in emotion detection]: {e}")
-            
-        # Default fallback
-        return {"emotion": "neutral", "sentiment": "neutral"}
+    def _parse_emotion(self, result):
+        """(emotion data, repaired); near misses are mapped onto the emotion / sentiment vocabularies."""
+        emotion_data, repaired = parse_emotion_reply(result)
+        if emotion_data is None:
+            self.logger.warning(f"[Emotion detection] Unusable response: {result[:200]!r}")
+        return emotion_data, repaired
 
     # def generate_response(self,intent: str , emotion: str , user_input: str) -> str:
     #     system_prompt = (
@@ -144,40 +795,227 @@ class NLPEngine:
     #     return self._call_llm(system_prompt, user_input, max_tokens=300)
 
 
-    def analyze(self, user_input: str, memory_manager=None) -> dict:
-        context = ""
-        if memory_manager:
-            context = memory_manager.get_context_text()
+    def analyze_fused(self, user_input: str, context: str = "") -> dict:
+        """Single round trip: intent, emotion, sentiment and reply from one JSON reply.
 
-        intent = self.detect_intent(user_input)
-        emotion_data = self.detect_emotion(user_input)
-        sentiment = emotion_data.get("sentiment", "neutral") if emotion_data else "neutral"
-        text = user_input
+        Returns None when the output can't be parsed or validated, so the caller
+        can fall back to the three-call path.
+        """
+        model = self.model_for("reply")
+        result = self.call_groq_model(self._fused_messages(user_input, context), max_tokens=250, temperature=0.7,
+                                      task="reply", json_mode=self._json_mode_for(model))
+        if result.startswith("[Groq Error]"):
+            return None
+        return self._parse_fused(result, model)
 
-        # Inject context into system prompt for better LLM reply
+    def _fused_messages(self, user_input: str, context: str = "") -> list:
         system_prompt = (
-            f"You are Echo, a helpful AI assistant.\n"
-            f"User's emotion: {emotion_data['emotion']}\n"
-            f"User's intent: {intent}\n"
-            f"Sentiment: {sentiment}\n"
-            f"User said: {text}\n"
-            "Reply as Echo with empathy and understanding (2-3 sentences):"
+            "You are Echo, a helpful AI assistant. Read the user's message and reply ONLY with JSON like: "
+            "{\"intent\": \"question\", \"emotion\": \"sad\", \"sentiment\": \"negative\", \"response\": \"...\"}\n"
+            f"intent must be one of: {', '.join(SUPPORTED_INTENTS)}.\n"
+            f"emotion must be one of: {', '.join(EMOTION_LABELS)}.\n"
+            "sentiment must be positive, negative or neutral.\n"
+            "response is your reply as Echo with empathy and understanding (2-3 sentences)."
         )
+        return self.prompt_builder.build(system_prompt, user_input, context, prefix_key="fused")
 
-        if context:
-            system_prompt += f"\nHere is the recent conversation:\n{context}\nRespond appropriately."
+    def _parse_fused(self, result, model) -> dict:
+        """Validated fused-analysis fields from `model`'s reply, or None; counted per model like the classifiers."""
+        self.metrics.incr(f"parse_calls:{model}")
 
-        # Generate the response using chat format
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input}
-        ]
-        
-        response = self.call_groq_model(messages, max_tokens=150, temperature=0.8)
+        try:
+            start_idx = result.find('{')
+            end_idx = result.rfind('}') + 1
+            parsed_data = json.loads(result[start_idx:end_idx]) if start_idx != -1 else None
+        except json.JSONDecodeError as e:
+            self.logger.warning(f"[Fused analysis] JSON parsing error: {e}")
+            parsed_data = None
+
+        if not isinstance(parsed_data, dict):
+            self.metrics.incr(f"parse_failures:{model}")
+            return None
+
+        intent, intent_repaired = normalize_label(str(parsed_data.get("intent", "")), SUPPORTED_INTENTS)
+        emotion_data, emotion_repaired = validate_emotion_fields(parsed_data)
+        response = parsed_data.get("response")
+
+        if intent is None or emotion_data is None or not response:
+            self.logger.warning(f"[Fused analysis] Invalid fields in response: {parsed_data}")
+            self.metrics.incr(f"parse_failures:{model}")
+            return None
+        if intent_repaired or emotion_repaired:
+            self.metrics.incr(f"parse_repairs:{model}")
+
+        return {
+            "intent": intent,
+            "emotion": emotion_data["emotion"],
+            "sentiment": emotion_data["sentiment"],
+            "response": str(response).strip()
+        }
+
+
+    def _classify(self, user_input: str):
+        """Return (intent, emotion_data): cache and local tier first, then Groq for whatever is left.
+
+        When both labels need Groq they run concurrently (if enabled).
+        """
+        intent, intent_source = self._lookup_intent(user_input)
+        emotion_data, emotion_source = self._lookup_emotion(user_input)
+        self.metrics.incr("classified_turns")
+        if intent is not None and emotion_data is not None:
+            self._count_turn_without_llm(intent_source, emotion_source)
+            return intent, emotion_data
+
+        if intent is None and emotion_data is None and self.concurrent_detection:
+            # Intent goes to the pool; emotion runs on the calling thread meanwhile
+            intent_future = self._submit(self._intent_upstream, user_input)
+            emotion_data = self._emotion_upstream(user_input)
+            return intent_future.result(), emotion_data
+
+        if intent is None:
+            intent = self._intent_upstream(user_input)
+        if emotion_data is None:
+            emotion_data = self._emotion_upstream(user_input)
+        return intent, emotion_data
+
+    def classify(self, user_input: str) -> dict:
+        """Intent, emotion and sentiment for one message (no reply, no memory write)."""
+        with turn_deadline(self.retry_policy.turn_deadline):
+            intent, emotion_data = self._classify(user_input)
+        return {
+            "intent": intent,
+            "emotion": emotion_data.get("emotion", "neutral"),
+            "sentiment": emotion_data.get("sentiment", "neutral")
+        }
+
+    def _changes_reply_materially(self, intent: str, sentiment: str) -> bool:
+        """True when the labels would steer the reply away from a label-free draft."""
+        return intent in SPECULATIVE_MATERIAL_INTENTS or sentiment in SPECULATIVE_MATERIAL_SENTIMENTS
+
+    # Static part of Echo's reply prompt; labels and context follow it (see PromptBuilder)
+    ECHO_REPLY_PROMPT = (
+        "You are Echo, a helpful AI assistant.\n"
+        "Reply as Echo with empathy and understanding (2-3 sentences)."
+    )
+
+    def _build_reply_messages(self, user_input: str, context: str = "", intent=None,
+                              emotion=None, sentiment=None) -> list:
+        """Chat messages for Echo's reply; label lines are left out when labels are None."""
+        # Context goes into the system prompt, trimmed to the prompt budget
+        return self.prompt_builder.build(self.ECHO_REPLY_PROMPT, user_input, context,
+                                         turn_prompt=turn_labels(intent, emotion, sentiment),
+                                         prefix_key="reply:echo")
+
+
+    def turn(self):
+        """Context manager bounding a whole user turn by one retry_policy.turn_deadline.
+
+        classify(), generate_reply() and the other calls made inside it share
+        what is left of this deadline instead of each starting their own.
+        """
+        return turn_deadline(self.retry_policy.turn_deadline)
+
+    def stream_turn(self, chunks):
+        """turn() for a generator producing a whole streamed turn (see stream_within_deadline)."""
+        return stream_within_deadline(chunks, self.retry_policy.turn_deadline)
+
+    def analyze_only(self, user_input: str, memory_manager=None, session_id=None) -> dict:
+        """Intent, emotion, sentiment and the conversation context, without generating a reply.
+
+        Nothing is written to memory; callers that generate their own reply
+        (personalities) pass this to generate_reply() and save the turn once,
+        under the same session_id. Run both inside turn() so they share one
+        deadline.
+        """
+        context = ""
+        if memory_manager:
+            context = memory_manager.get_context_text(session_id, query=user_input)
+        analysis = self.classify(user_input)
+        analysis["context"] = context
+        return analysis
+
+    def _persona_messages(self, user_input: str, analysis: dict, persona_prompt=None, persona_key=None) -> list:
+        """Reply messages for an analyze_only() result; Echo's prompt unless a persona prompt is given.
+
+        `persona_prompt` should be static text (the cacheable prefix); this
+        turn's labels and the context are appended after it. `persona_key`
+        names the persona for the prefix stability check.
+        """
+        context = analysis.get("context", "")
+        if persona_prompt is None:
+            return self._build_reply_messages(user_input, context, analysis["intent"],
+                                              analysis["emotion"], analysis["sentiment"])
+        return self.prompt_builder.build(persona_prompt, user_input, context,
+                                         turn_prompt=turn_labels(analysis["intent"], analysis["emotion"],
+                                                                 analysis["sentiment"]),
+                                         prefix_key=f"reply:{persona_key}" if persona_key else None)
+
+    def generate_reply(self, user_input: str, analysis: dict, persona_prompt=None,
+                       max_tokens=150, temperature=0.8, persona_key=None) -> str:
+        """The one reply-generation call of a turn, steered by `persona_prompt` if given."""
+        messages = self._persona_messages(user_input, analysis, persona_prompt, persona_key)
+        with turn_deadline(self.retry_policy.turn_deadline):
+            return self.call_groq_model(messages, max_tokens=max_tokens, temperature=temperature, task="reply")
+
+    def generate_reply_stream(self, user_input: str, analysis: dict, persona_prompt=None,
+                              max_tokens=150, temperature=0.8, persona_key=None):
+        """Streaming generate_reply(): yields reply text as it arrives, within the turn deadline."""
+        messages = self._persona_messages(user_input, analysis, persona_prompt, persona_key)
+        return stream_within_deadline(self.stream_groq_model(messages, max_tokens=max_tokens,
+                                                             temperature=temperature),
+                                      self.retry_policy.turn_deadline)
+
+    def analyze(self, user_input: str, memory_manager=None, session_id=None) -> dict:
+        """Labels and reply for one turn; `session_id` picks the conversation in memory_manager.
+
+        Calls without a session_id all share memory_manager's default session,
+        so a server handling several users must pass one per conversation.
+        """
+        # Every upstream call of this turn, retries included, shares one deadline
+        with turn_deadline(self.retry_policy.turn_deadline):
+            return self._analyze(user_input, memory_manager, session_id)
+
+    def _analyze(self, user_input: str, memory_manager=None, session_id=None) -> dict:
+        context = ""
+        if memory_manager:
+            context = memory_manager.get_context_text(session_id, query=user_input)
+
+        if self.fused_analysis:
+            fused = self.analyze_fused(user_input, context)
+            if fused:
+                self.metrics.incr("fused_turns")
+                if memory_manager:
+                    memory_manager.add_memory(user_input, fused["response"], session_id)
+                return fused
+            # Fall back to separate intent / emotion / reply calls
+            self.metrics.incr("fused_fallbacks")
+
+        # Speculative reply: start generating before the labels are known
+        speculative = None
+        if self.speculative_reply:
+            speculative = self._speculate(self._build_reply_messages(user_input, context))
+
+        intent, emotion_data = self._classify(user_input)
+        sentiment = emotion_data.get("sentiment", "neutral") if emotion_data else "neutral"
+
+        response = None
+        if speculative is not None:
+            if self._changes_reply_materially(intent, sentiment):
+                # Labels matter for this turn; the provisional reply is discarded
+                speculative.cancel()
+                self.metrics.incr("speculative_discards")
+            else:
+                response = speculative.result()
+                self.metrics.incr("speculative_hits")
+
+        if response is None:
+            messages = self._build_reply_messages(user_input, context, intent,
+                                                  emotion_data["emotion"], sentiment)
+            response = self.call_groq_model(messages, max_tokens=150, temperature=0.8, task="reply")
         
         # Save memory
         if memory_manager:
-            memory_manager.add_memory(user_input, response)
+            memory_manager.add_memory(user_input, response, session_id)
 
         return {
             "intent": intent,
@@ -185,3 +1023,29 @@ class NLPEngine:
             "sentiment": emotion_data["sentiment"],
             "response": response
         }
+
+
+    def analyze_stream(self, user_input: str, memory_manager=None, session_id=None):
+        """Streaming variant of analyze() for the three-call path.
+
+        Classification runs before this returns; the reply is streamed.
+        Returns (analysis, chunks): iterate `chunks` for reply text. Once the
+        stream is exhausted analysis["response"] holds the full reply and the
+        turn is saved to memory (never earlier, so aborted streams aren't stored).
+        """
+        # The reply stream keeps what is left of the deadline classification ran under
+        with self.turn():
+            analysis = self.analyze_only(user_input, memory_manager, session_id)
+            reply = self.generate_reply_stream(user_input, analysis)
+        del analysis["context"]
+
+        def chunks():
+            parts = []
+            for delta in reply:
+                parts.append(delta)
+                yield delta
+            analysis["response"] = "".join(parts).strip()
+            if memory_manager and analysis["response"]:
+                memory_manager.add_memory(user_input, analysis["response"], session_id)
+
+        return analysis, chunks()
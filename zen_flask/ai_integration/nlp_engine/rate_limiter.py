@@ -0,0 +1,303 @@
+# Client-side requests/min + tokens/min limiter with priorities, shareable across worker processes
+import asyncio
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+
+from .config import RATE_LIMIT_RPM, RATE_LIMIT_TPM, RATE_LIMIT_BACKGROUND_RESERVE
+
+# Lower value = served first
+PRIORITY_REPLY = 0           # user-facing reply generation
+PRIORITY_CLASSIFICATION = 1  # intent / emotion labelling
+
+# Longest a waiting caller sleeps before re-checking (other processes may refill/drain the store)
+_MAX_POLL = 0.25
+
+
+def estimate_request_tokens(messages, max_tokens):
+    """Upper-bound token cost of a call: ~4 characters per prompt token plus max_tokens."""
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // 4 + len(messages) * 4 + max_tokens
+
+
+class MemoryBucketStore:
+    """Token-bucket levels for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels = {}  # name -> (level, updated_at)
+
+    def take(self, amounts, capacities, reserve=0.0, now=None):
+        """Atomically take `amounts` from every bucket, keeping `reserve` of each capacity free.
+
+        Returns 0.0 on success, else the seconds until enough would have refilled.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            levels = {name: self._refilled(name, capacities[name], now) for name in amounts}
+            wait = _shortfall(levels, amounts, capacities, reserve)
+            if wait == 0.0:
+                for name, amount in amounts.items():
+                    self._levels[name] = (levels[name] - min(amount, capacities[name]), now)
+            return wait
+
+    def adjust(self, name, delta, capacity, now=None):
+        """Add (refund) or remove (charge) tokens without waiting; may go negative."""
+        now = time.time() if now is None else now
+        with self._lock:
+            level = self._refilled(name, capacity, now)
+            self._levels[name] = (min(level + delta, capacity), now)
+
+    def clamp(self, name, maximum, capacity, now=None):
+        """Lower a bucket to `maximum` (e.g. what the upstream says is really left)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            level = self._refilled(name, capacity, now)
+            self._levels[name] = (min(level, maximum), now)
+
+    def levels(self, capacities, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return {name: self._refilled(name, cap, now) for name, cap in capacities.items()}
+
+    def _refilled(self, name, capacity, now):
+        level, updated = self._levels.get(name, (capacity, now))
+        return min(capacity, level + (now - updated) * capacity / 60.0)
+
+
+class SQLiteBucketStore(MemoryBucketStore):
+    """Bucket levels in a SQLite file so every worker process draws from one budget."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _read(self, conn, name, capacity, now):
+        row = conn.execute("SELECT level, updated FROM rate_buckets WHERE name = ?", (name,)).fetchone()
+        level, updated = row if row else (capacity, now)
+        return min(capacity, level + (now - updated) * capacity / 60.0)
+
+    def _write(self, conn, name, level, now):
+        conn.execute("INSERT OR REPLACE INTO rate_buckets (name, level, updated) VALUES (?, ?, ?)",
+                     (name, level, now))
+
+    def take(self, amounts, capacities, reserve=0.0, now=None):
+        now = time.time() if now is None else now
+
+        def txn(conn):
+            levels = {name: self._read(conn, name, capacities[name], now) for name in amounts}
+            wait = _shortfall(levels, amounts, capacities, reserve)
+            if wait == 0.0:
+                for name, amount in amounts.items():
+                    self._write(conn, name, levels[name] - min(amount, capacities[name]), now)
+            return wait
+        return self._transaction(txn)
+
+    def adjust(self, name, delta, capacity, now=None):
+        now = time.time() if now is None else now
+        self._transaction(lambda conn: self._write(
+            conn, name, min(self._read(conn, name, capacity, now) + delta, capacity), now))
+
+    def clamp(self, name, maximum, capacity, now=None):
+        now = time.time() if now is None else now
+        self._transaction(lambda conn: self._write(
+            conn, name, min(self._read(conn, name, capacity, now), maximum), now))
+
+    def levels(self, capacities, now=None):
+        now = time.time() if now is None else now
+        conn = self._connect()
+        return {name: self._read(conn, name, cap, now) for name, cap in capacities.items()}
+
+
+def _shortfall(levels, amounts, capacities, reserve):
+    """0.0 if every bucket can pay its amount above the reserve, else seconds to wait."""
+    wait = 0.0
+    for name, amount in amounts.items():
+        capacity = capacities[name]
+        needed = min(amount + reserve * capacity, capacity)
+        if levels[name] < needed:
+            wait = max(wait, (needed - levels[name]) / (capacity / 60.0))
+    return wait
+
+
+class RateLimiter:
+    """Keeps a process (or, with a shared store, a fleet) under requests/min and tokens/min.
+
+    Waiting callers are served in priority order within the process. Across
+    processes, classification calls may not dip into the last
+    `background_reserve` fraction of either bucket, which stays available to
+    replies.
+    """
+
+    def __init__(self, rpm=RATE_LIMIT_RPM, tpm=RATE_LIMIT_TPM, store=None,
+                 background_reserve=RATE_LIMIT_BACKGROUND_RESERVE):
+        self.capacities = {"requests": float(rpm), "tokens": float(tpm)}
+        if isinstance(store, str):
+            store = SQLiteBucketStore(store)
+        self.store = store or MemoryBucketStore()
+        self.background_reserve = background_reserve
+        self.logger = logging.getLogger(__name__)
+
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self.granted = 0
+        self.delayed = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+
+    def _reserve_for(self, priority):
+        return 0.0 if priority <= PRIORITY_REPLY else self.background_reserve
+
+    def _take(self, tokens, priority):
+        try:
+            return self.store.take({"requests": 1, "tokens": tokens}, self.capacities,
+                                   self._reserve_for(priority))
+        except sqlite3.Error as e:
+            # A broken shared store must not take the app down; fall back to letting the call through
+            self.logger.warning(f"[Rate limiter] store unavailable, not limiting: {e}")
+            return 0.0
+
+    def try_acquire(self, tokens, priority=PRIORITY_REPLY) -> bool:
+        """Take budget only if it is available right now and nobody is queued ahead."""
+        with self._cond:
+            if self._waiters and self._waiters[0][0] <= priority:
+                return False
+            if self._take(tokens, priority) == 0.0:
+                self.granted += 1
+                return True
+            return False
+
+    def acquire(self, tokens, priority=PRIORITY_REPLY, timeout=None) -> bool:
+        """Block until one request and `tokens` tokens are granted; False on timeout."""
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        ticket = (priority, next(self._seq))
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        wait = self._take(tokens, priority)
+                        if wait == 0.0:
+                            waited = time.monotonic() - start
+                            self.granted += 1
+                            if waited > 0.001:
+                                self.delayed += 1
+                                self.total_wait += waited
+                            return True
+                    else:
+                        wait = _MAX_POLL  # someone more urgent is ahead; wait to be notified
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timeouts += 1
+                            return False
+                        wait = min(wait, remaining)
+                    self._cond.wait(min(wait, _MAX_POLL))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    async def acquire_async(self, tokens, priority=PRIORITY_REPLY, timeout=None) -> bool:
+        """acquire() for coroutines: polls the buckets without blocking the event loop.
+
+        Async callers don't join the priority queue; they let queued threads
+        of the same or higher priority go first.
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        while True:
+            with self._cond:
+                if self._waiters and self._waiters[0][0] <= priority:
+                    wait = _MAX_POLL
+                else:
+                    wait = self._take(tokens, priority)
+                if wait == 0.0:
+                    waited = time.monotonic() - start
+                    self.granted += 1
+                    if waited > 0.001:
+                        self.delayed += 1
+                        self.total_wait += waited
+                    return True
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        return False
+                    wait = min(wait, remaining)
+            await asyncio.sleep(min(wait, _MAX_POLL))
+
+    def reconcile(self, estimated_tokens, actual_tokens):
+        """Refund (or charge) the difference once the real usage is known."""
+        if actual_tokens is None:
+            return
+        delta = estimated_tokens - actual_tokens
+        if delta:
+            try:
+                self.store.adjust("tokens", delta, self.capacities["tokens"])
+            except sqlite3.Error as e:
+                # Bookkeeping only; the response it follows is already good
+                self.logger.warning(f"[Rate limiter] store unavailable, usage not reconciled: {e}")
+                return
+            with self._cond:
+                self._cond.notify_all()
+
+    def observe_headers(self, headers):
+        """Pull local buckets down to the upstream's x-ratelimit-remaining-* view."""
+        if not headers:
+            return
+        for name in ("requests", "tokens"):
+            try:
+                remaining = float(headers.get(f"x-ratelimit-remaining-{name}"))
+            except (TypeError, ValueError):
+                continue
+            try:
+                self.store.clamp(name, remaining, self.capacities[name])
+            except sqlite3.Error as e:
+                self.logger.warning(f"[Rate limiter] store unavailable, headers not applied: {e}")
+                return
+
+    def stats(self) -> dict:
+        levels = self.store.levels(self.capacities)
+        with self._cond:
+            return {
+                "rpm": self.capacities["requests"],
+                "tpm": self.capacities["tokens"],
+                "requests_available": round(levels["requests"], 2),
+                "tokens_available": round(levels["tokens"], 1),
+                "granted": self.granted,
+                "delayed": self.delayed,
+                "timeouts": self.timeouts,
+                "avg_wait": round(self.total_wait / self.delayed, 4) if self.delayed else 0.0,
+                "queued": len(self._waiters),
+                "shared": isinstance(self.store, SQLiteBucketStore)
+            }
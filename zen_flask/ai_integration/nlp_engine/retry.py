@@ -0,0 +1,277 @@
+# Retry policy (jittered exponential backoff, Retry-After aware), per-turn deadlines and a circuit breaker
+import asyncio
+import contextvars
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+from .config import (
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    TURN_DEADLINE,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RECOVERY_TIMEOUT,
+)
+
+# Statuses worth retrying; other 4xx are caller errors and fail immediately
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value):
+    """Seconds from "7.66s", "2m59.56s", "120ms" or a bare number; None if unparsable."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(value):
+    """Retry-After as seconds: either delta-seconds or an HTTP date."""
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return seconds
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """How often and how long to wait between attempts of one upstream call.
+
+    A server asking for a longer wait than max_delay (Retry-After or an
+    exhausted x-ratelimit-* budget) ends the call instead: retrying sooner
+    would be rejected again, and waiting would hold the caller that long.
+    """
+
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, turn_deadline=TURN_DEADLINE, seed=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.turn_deadline = turn_deadline
+        self._random = random.Random(seed)
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for the given (0-based) attempt."""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def server_delay(self, headers):
+        """Wait requested by the server via Retry-After or exhausted x-ratelimit-* budgets."""
+        if not headers:
+            return None
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        if retry_after is not None:
+            return retry_after
+
+        waits = []
+        for budget in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{budget}")
+            if remaining is not None and remaining.strip() in ("0", "0.0"):
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{budget}"))
+                if reset is not None:
+                    waits.append(reset)
+        return max(waits) if waits else None
+
+    def delay_for(self, attempt, response=None):
+        """Seconds to wait before the next attempt; the server's hint wins over backoff.
+
+        None when the hint is longer than max_delay (don't retry).
+        """
+        hinted = self.server_delay(getattr(response, "headers", None))
+        if hinted is not None:
+            return hinted if hinted <= self.max_delay else None
+        return self.backoff(attempt)
+
+
+# Absolute (monotonic) deadline of the current user turn, if one is active
+_turn_deadline = contextvars.ContextVar("nlp_turn_deadline", default=None)
+
+
+@contextmanager
+def turn_deadline(seconds):
+    """Bound every upstream call made inside the block (including retries) to `seconds`.
+
+    Nested blocks keep the earlier deadline. Worker threads only see it when
+    they run in a copied context (see NLPEngine._submit).
+    """
+    if seconds is None:
+        yield
+        return
+    token = _set_deadline(seconds)
+    try:
+        yield
+    finally:
+        _turn_deadline.reset(token)
+
+
+def _set_deadline(seconds):
+    deadline = time.monotonic() + seconds
+    current = _turn_deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    return _turn_deadline.set(deadline)
+
+
+def stream_within_deadline(chunks, seconds):
+    """Iterate the generator `chunks` with every step bounded by one turn deadline starting now.
+
+    Each step runs in a copy of the caller's context holding the deadline, so
+    the deadline doesn't leak into whoever consumes the stream between chunks
+    (as a `with turn_deadline()` inside a generator would). An enclosing
+    deadline that ends sooner is kept.
+    """
+    context = contextvars.copy_context()
+    if seconds is not None:
+        context.run(_set_deadline, seconds)
+    return _iterate_in(context, chunks)
+
+
+def _iterate_in(context, chunks):
+    try:
+        while True:
+            try:
+                chunk = context.run(next, chunks)
+            except StopIteration:
+                return
+            yield chunk
+    finally:
+        context.run(chunks.close)
+
+
+def astream_within_deadline(chunks, seconds):
+    """stream_within_deadline() for an async generator; iterate the result with `async for`."""
+    context = contextvars.copy_context()
+    if seconds is not None:
+        context.run(_set_deadline, seconds)
+    return _aiterate_in(context, chunks)
+
+
+async def _aiterate_in(context, chunks):
+    try:
+        while True:
+            try:
+                # A task runs in a copy of the context it is created in
+                chunk = await context.run(asyncio.ensure_future, chunks.__anext__())
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+
+def remaining_time():
+    """Seconds left in the current turn, or None when no deadline is active."""
+    deadline = _turn_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Fails fast while the upstream looks unhealthy.
+
+    closed -> open after `failure_threshold` consecutive failures; open ->
+    half_open after `recovery_timeout` seconds, letting one probe through;
+    the probe's outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout=BREAKER_RECOVERY_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give back a half-open probe that ended without an outcome (its caller was cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                self.times_opened += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            retry_in = 0.0
+            if state == self.OPEN:
+                retry_in = max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0.0)
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_in": round(retry_in, 2)
+            }
+
+
+_shared_breakers = {}
+_shared_breakers_lock = threading.Lock()
+
+
+def get_shared_breaker(key) -> CircuitBreaker:
+    """One breaker per upstream URL, shared by every engine in the process."""
+    with _shared_breakers_lock:
+        breaker = _shared_breakers.get(key)
+        if breaker is None:
+            breaker = _shared_breakers[key] = CircuitBreaker()
+        return breaker
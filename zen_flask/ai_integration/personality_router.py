@@ -1,24 +1,171 @@
-from .personalities.Suzi import Suzi
-from .personalities.EchoPersonality import EchoPersonality
+import importlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Personalities by name as "module:Class"; modules are only imported when first used.
+# More can be declared in a JSON file ({"mentor": "my_pkg.mentor:MentorPersonality"})
+# named by PERSONALITY_CONFIG, or by packages exposing "echo.personalities" entry points.
+DEFAULT_PERSONALITIES = {
+    "echo": ".personalities.EchoPersonality:EchoPersonality",
+    "Suzi": ".personalities.Suzi:Suzi",
+    # "mentor": ".personalities.Mentor:MentorPersonality",
+    # "therapist": ".personalities.Therapist:TherapistPersonality",
+    # "coach": ".personalities.Coach:CoachPersonality",
+}
+DEFAULT_PERSONALITY = "echo"
+ENTRY_POINT_GROUP = "echo.personalities"
+# Per-session personality choices; least recently used ones go first past the limit (None disables either)
+SESSION_LIMIT = 10000
+SESSION_TTL = 6 * 3600     # seconds without a call before a session falls back to the default
+
+logger = logging.getLogger(__name__)
+
+
+def load_personality_specs(config_path=None) -> dict:
+    """Built-in personalities, then entry points, then the JSON config (later ones win)."""
+    specs = dict(DEFAULT_PERSONALITIES)
+    try:
+        from importlib.metadata import entry_points
+        eps = entry_points()
+        group = eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps, "select") else eps.get(ENTRY_POINT_GROUP, [])
+        specs.update({ep.name: ep.value for ep in group})
+    except Exception as e:
+        logger.warning(f"[Personalities] could not read entry points: {e}")
+
+    config_path = config_path or os.getenv("PERSONALITY_CONFIG")
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            specs.update(json.load(f))
+    return specs
+
 
 class PersonalityRouter:
-    def __init__(self):
-        self.personalities = {
-            "echo": EchoPersonality(),
-            "Suzi": Suzi(),
-            # "mentor": MentorPersonality(),
-            # "therapist": TherapistPersonality(),
-            # "coach": CoachPersonality()
-            # Add other personalities here as needed
-        }
-
-        self.active = "echo"  # default
-
-    def set_personality(self, personality_name):
-        if personality_name in self.personalities:
-            self.active = personality_name
-        else:
+    """Routes each session to its chosen personality, importing personalities on first use.
+
+    Personalities are built once per router and shared across sessions, so
+    they must not keep per-user state; the session_id is passed on to them
+    as the conversation's key in memory. Calls without a session_id use the
+    router-wide `active` personality.
+
+    Session choices are kept for at most `session_limit` sessions, and
+    forgotten after `session_ttl` idle seconds; a forgotten session gets the
+    default personality again.
+
+    Personality classes get the router's engine as `nlp=`; classes whose
+    constructor takes no `nlp` argument are built with no arguments.
+    """
+
+    def __init__(self, nlp=None, personalities=None, default=DEFAULT_PERSONALITY, config_path=None,
+                 session_limit=SESSION_LIMIT, session_ttl=SESSION_TTL):
+        # Pass one NLPEngine to share it between personalities
+        self.nlp = nlp
+        self.specs = dict(personalities) if personalities is not None else load_personality_specs(config_path)
+        if default not in self.specs:
+            raise ValueError(f"Personality '{default}' not found.")
+        self.default = default
+        self.active = default
+        self.personalities = {}   # name -> instance, filled on first use
+        self.load_times = {}      # name -> milliseconds spent importing and constructing
+        self.session_limit = session_limit
+        self.session_ttl = session_ttl
+        # session_id -> (personality name, time.monotonic() of last use), least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        # name -> lock held while that personality loads, so a slow import only blocks its own callers
+        self._load_locks = {}
+
+    def available(self) -> list:
+        return sorted(self.specs)
+
+    def get_personality(self, personality_name):
+        """The personality instance, imported and constructed the first time it is asked for."""
+        personality = self.personalities.get(personality_name)
+        if personality is not None:
+            return personality
+        if personality_name not in self.specs:
+            raise ValueError(f"Personality '{personality_name}' not found.")
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(personality_name, threading.Lock())
+        with load_lock:
+            personality = self.personalities.get(personality_name)
+            if personality is None:
+                start = time.perf_counter()
+                module_name, _, class_name = self.specs[personality_name].partition(":")
+                module = importlib.import_module(module_name, package=__package__)
+                personality = self._construct(getattr(module, class_name))
+                self.load_times[personality_name] = round((time.perf_counter() - start) * 1000, 3)
+                self.personalities[personality_name] = personality
+                logger.info(f"[Personalities] loaded '{personality_name}' in {self.load_times[personality_name]}ms")
+        return personality
+
+    def _construct(self, cls):
+        """cls(nlp=self.nlp), or cls() when its constructor has no `nlp` parameter."""
+        try:
+            parameters = inspect.signature(cls).parameters.values()
+        except (TypeError, ValueError):
+            return cls(nlp=self.nlp)
+        if any(p.name == "nlp" or p.kind is p.VAR_KEYWORD for p in parameters):
+            return cls(nlp=self.nlp)
+        return cls()
+
+    def set_personality(self, personality_name, session_id=None):
+        """Pick the session's personality; without a session_id, the router-wide one.
+
+        The router-wide switch changes every sessionless call at once, so it
+        is for admin tooling only; servers must pass the user's session_id.
+        """
+        if personality_name not in self.specs:
             raise ValueError(f"Personality '{personality_name}' not found.")
+        if session_id is None:
+            self.active = personality_name
+            return
+        with self._lock:
+            if personality_name == self.default:
+                self._sessions.pop(session_id, None)
+                return
+            self._sessions[session_id] = (personality_name, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            self._trim_sessions()
+
+    def _trim_sessions(self):
+        """Drop idle session choices, then the least recently used past session_limit (call under the lock)."""
+        if self.session_ttl is not None:
+            cutoff = time.monotonic() - self.session_ttl
+            while self._sessions and next(iter(self._sessions.values()))[1] <= cutoff:
+                self._sessions.popitem(last=False)
+        if self.session_limit is not None:
+            while len(self._sessions) > self.session_limit:
+                self._sessions.popitem(last=False)
+
+    def personality_for(self, session_id=None) -> str:
+        if session_id is None:
+            return self.active
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return self.default
+            now = time.monotonic()
+            if self.session_ttl is not None and now - entry[1] > self.session_ttl:
+                del self._sessions[session_id]
+                return self.default
+            self._sessions[session_id] = (entry[0], now)
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def end_session(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def get_response(self, user_input, memory, session_id=None):
+        personality = self.get_personality(self.personality_for(session_id))
+        return personality.respond(user_input, memory, session_id=session_id)
 
-    def get_response(self, user_input, memory):
-        return self.personalities[self.active].respond(user_input, memory)
\ No newline at end of file
+    def get_response_stream(self, user_input, memory, session_id=None):
+        personality = self.get_personality(self.personality_for(session_id))
+        return personality.respond_stream(user_input, memory, session_id=session_id)
@@ -1,10 +1,50 @@
-from flask import Flask, render_template, request, jsonify
+import os
+
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from ai_integration.nlp_engine.nlp_engine import NLPEngine
 from ai_integration.personalities.EchoPersonality import EchoPersonality
 from ai_integration.personality_router import PersonalityRouter
+from components import ComponentRegistry
 
 app = Flask(__name__)
 
+
+def _speech_to_text():
+    # Imported lazily: loading Whisper is only worth it once audio actually arrives
+    from Core_Brain.speech_to_text import SpeechToText
+    return SpeechToText()
+
+
+# Built once per worker and shared by all requests; personalities share one engine
+components = ComponentRegistry()
+components.register('nlp', NLPEngine)
+components.register('router', lambda: PersonalityRouter(nlp=components.get('nlp')))
+components.register('echo', lambda: EchoPersonality(nlp=components.get('nlp')))
+components.register('stt', _speech_to_text, exclusive=True)
+
+# Comma-separated components to build at import time (e.g. "nlp,router,stt"); empty to stay lazy
+components.warm_up(*[name.strip() for name in os.getenv('WARM_UP_COMPONENTS', 'nlp,router').split(',') if name.strip()])
+
+
+# Longest session_id accepted from clients (chat.html sends a random UUID per browser tab)
+MAX_SESSION_ID_LENGTH = 128
+SESSION_ID_ERROR = f'session_id must be a non-empty string of at most {MAX_SESSION_ID_LENGTH} characters'
+
+
+def _valid_session_id(session_id):
+    """Requests without a session_id share one conversation; one sent must be a short string."""
+    return session_id is None or (isinstance(session_id, str) and 0 < len(session_id) <= MAX_SESSION_ID_LENGTH)
+
+
+# A dummy memory object, as MemoryManager is not integrated yet
+class DummyMemory:
+    def __init__(self):
+        pass
+    def add_memory(self, user, echo, session_id=None):
+        pass
+    def get_context_text(self, session_id=None, query=None):
+        return ""
+
 @app.route('/')
 def landing():
     return render_template('landing.html')
@@ -31,30 +71,66 @@ def get_ai_response():
     if not user_input:
         return jsonify({'error': 'No message provided'}), 400
 
-    # A dummy memory object, as MemoryManager is not integrated yet
-    class DummyMemory:
-        def __init__(self):
-            pass
-        def add_message(self, role, content):
-            pass
-        def get_history(self):
-            return []
+    session_id = request.json.get('session_id')
+    if not _valid_session_id(session_id):
+        return jsonify({'error': SESSION_ID_ERROR}), 400
 
     dummy_memory = DummyMemory()
-    router = PersonalityRouter()
-    ai_response = router.get_response(user_input, dummy_memory)
+    router = components.get('router')
+    ai_response = router.get_response(user_input, dummy_memory, session_id=session_id)
     return jsonify({'response': ai_response})
 
+@app.route('/get_ai_response/stream', methods=['POST'])
+def get_ai_response_stream():
+    """Stream the reply as plain-text chunks so the first token reaches the user early."""
+    user_input = request.json.get('message')
+    if not user_input:
+        return jsonify({'error': 'No message provided'}), 400
+
+    session_id = request.json.get('session_id')
+    if not _valid_session_id(session_id):
+        return jsonify({'error': SESSION_ID_ERROR}), 400
+
+    dummy_memory = DummyMemory()
+    router = components.get('router')
+    chunks = router.get_response_stream(user_input, dummy_memory, session_id=session_id)
+    return Response(
+        stream_with_context(chunks),
+        mimetype='text/plain',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/personality', methods=['GET', 'POST'])
+def personality():
+    """GET lists personalities; POST {"session_id", "personality"} picks one for that session."""
+    router = components.get('router')
+    if request.method == 'GET':
+        return jsonify({'personalities': router.available(), 'default': router.default})
+
+    session_id = request.json.get('session_id')
+    name = request.json.get('personality')
+    if not session_id or not name:
+        return jsonify({'error': 'session_id and personality are required'}), 400
+    if not _valid_session_id(session_id):
+        return jsonify({'error': SESSION_ID_ERROR}), 400
+    try:
+        router.set_personality(name, session_id=session_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    return jsonify({'session_id': session_id, 'personality': name})
+
 @app.route('/chat', methods=['POST'])
 def chat():
     user_message = request.json.get('message')
     if not user_message:
         return jsonify({'error': 'No message provided'}), 400
+    session_id = request.json.get('session_id')
+    if not _valid_session_id(session_id):
+        return jsonify({'error': SESSION_ID_ERROR}), 400
 
-    # Process the message using NLPEngine and EchoPersonality
-    nlp_engine = NLPEngine()
-    personality = EchoPersonality()
-    ai_response = nlp_engine.process_message(user_message, personality)
+    # Process the message with the shared EchoPersonality (and its NLPEngine)
+    personality = components.get('echo')
+    ai_response = personality.respond(user_message, DummyMemory(), session_id=session_id)
 
     return jsonify({'response': ai_response})
 
@@ -64,11 +140,19 @@ def speech_to_text():
         return jsonify({'error': 'No audio file provided'}), 400
     audio_file = request.files['audio']
     audio_bytes = audio_file.read()
-    # Import and use SpeechToText
-    from Core_Brain.speech_to_text import SpeechToText
-    stt = SpeechToText()
-    transcript = stt.process_audio_bytes(audio_bytes)
+    # The Whisper model is loaded once per worker and used by one request at a time
+    with components.use('stt') as stt:
+        transcript = stt.process_audio_bytes(audio_bytes)
     return jsonify({'transcript': transcript})
 
+@app.route('/status')
+def status():
+    """Component construction timings and NLP engine counters for this worker."""
+    return jsonify({
+        'components': components.stats(),
+        'personality_load_ms': components.get('router').load_times,
+        'nlp': components.get('nlp').get_stats()
+    })
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
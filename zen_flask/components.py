@@ -0,0 +1,76 @@
+# Process-wide registry of heavy app components (NLP engine, personalities, STT model)
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ComponentRegistry:
+    """Builds each registered component once per worker process and shares it across threads.
+
+    Construction is lazy (first `get`) and guarded per component, so concurrent
+    first requests build it only once. Components registered with
+    `exclusive=True` (e.g. the Whisper model) are handed out one thread at a
+    time through `use()`.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._factories = {}
+        self._build_locks = {}
+        self._use_locks = {}
+        self._instances = {}
+        self.timings = {}  # name -> milliseconds spent constructing
+
+    def register(self, name, factory, exclusive=False):
+        with self._lock:
+            self._factories[name] = factory
+            self._build_locks[name] = threading.Lock()
+            if exclusive:
+                self._use_locks[name] = threading.Lock()
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self._factories:
+            raise KeyError(f"Component '{name}' is not registered.")
+
+        with self._build_locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = self._factories[name]()
+                elapsed = time.perf_counter() - start
+                self.timings[name] = round(elapsed * 1000, 3)
+                self._instances[name] = instance
+                self.logger.info(f"[Components] built '{name}' in {elapsed:.3f}s")
+        return instance
+
+    @contextmanager
+    def use(self, name):
+        """`get()` that also holds the component's lock while in use, if it is exclusive."""
+        instance = self.get(name)
+        lock = self._use_locks.get(name)
+        if lock is None:
+            yield instance
+            return
+        with lock:
+            yield instance
+
+    def warm_up(self, *names) -> dict:
+        """Build the given components (all registered ones by default); returns their timings."""
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                self.logger.error(f"[Components] warm-up of '{name}' failed: {e}")
+        return {name: self.timings[name] for name in names or self._factories if name in self.timings}
+
+    def stats(self) -> dict:
+        return {
+            "registered": sorted(self._factories),
+            "built": sorted(self._instances),
+            "construction_ms": dict(self.timings)
+        }